@@ -1,47 +1,137 @@
 # weave_webapp/app.py
 
-from flask import Flask, render_template, request, jsonify, g, session
+from flask import Flask, render_template, request, g, session, make_response, send_from_directory
 import os
+import sqlite3
+import sys
 from dotenv import load_dotenv
-import pandas as pd
-import json
-from sqlite3 import Row
 
 # --- Custom Modules ---
 import db_operations
+import backup
+import compression
+import export
+import metrics
+import mutations
+import nav_sessions
+import profiling
+import query_log
+import replication
+import traffic_record
+from serialization import json_response
 # Google Sheets logging removed
 
 # Load environment variables from the .env file
 load_dotenv()
 
-# --- Custom JSON encoder to handle SQLite Row objects ---
-
-
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Row):
-            return {k: ('' if v is None else v) for k, v in dict(obj).items()}
-        return super().default(obj)
-
-
 # --- App Initialization ---
 app = Flask(__name__)
 app.secret_key = os.getenv(
     'FLASK_SECRET_KEY', 'a_default_secret_key_for_development')
-app.json_encoder = CustomJSONEncoder  # Use custom JSON encoder
 
 # Register database functions and CLI commands from the db_operations module
 db_operations.register_cli_commands(app)
 db_operations.register_teardown(app)
+backup.register_backup(app)
+replication.register_replication(app)
+metrics.register_metrics(app)
+traffic_record.register_traffic_recording(app)
+compression.register_compression(app)
+query_log.register_query_log(app)
+mutations.register_mutations(app)
+export.register_export(app)
+# Last, since it wraps the whole WSGI app
+profiling.register_profiling(app)
 
 # --- Validate essential Configuration (Runs on import) ---
+# To stderr, so they don't end up in `flask export` output
 if not os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
-    print("Error: GOOGLE_APPLICATION_CREDENTIALS environment variable not set.")
+    print("Error: GOOGLE_APPLICATION_CREDENTIALS environment variable not set.", file=sys.stderr)
 if os.getenv('GOOGLE_APPLICATION_CREDENTIALS') and not os.path.exists(os.getenv('GOOGLE_APPLICATION_CREDENTIALS')):
     print(
-        f"Error: Google Service Account file not found at {os.getenv('GOOGLE_APPLICATION_CREDENTIALS')}.")
+        f"Error: Google Service Account file not found at {os.getenv('GOOGLE_APPLICATION_CREDENTIALS')}.",
+        file=sys.stderr)
 if not os.getenv('GOOGLE_SHEET_ID'):
-    print("Error: GOOGLE_SHEET_ID environment variable not set.")
+    print("Error: GOOGLE_SHEET_ID environment variable not set.", file=sys.stderr)
+
+# --- HTTP Caching ---
+
+# Cache-Control policy per endpoint for the routes that support ETags.
+# "no-cache" still lets the browser (and static/sw.js) keep a copy, but every
+# use is revalidated with If-None-Match, so a hit costs one header exchange.
+CACHE_POLICIES = {
+    'get_all_tags': 'private, no-cache',
+    'get_all_people': 'private, no-cache',
+    'get_sujets_count': 'private, no-cache',
+    'get_sujet_by_id_route': 'private, no-cache',
+}
+
+
+def conditional_response(etag, build_response):
+    """Returns 304 if the client already holds `etag`, otherwise the built response.
+
+    `build_response` is only called on a miss, so the query behind it is skipped
+    entirely when the client's copy is still current. A None etag disables caching.
+    """
+    if etag is None:
+        return make_response(build_response())
+    # Compressed responses carry an encoding-suffixed ETag (see compression.py)
+    hit = any(request.if_none_match.contains(tag)
+              for tag in compression.representation_etags(etag))
+    metrics.count_cache(hit)
+    if hit:
+        response = app.response_class(status=304)
+    else:
+        response = make_response(build_response())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CACHE_POLICIES.get(
+        request.endpoint, 'no-cache')
+    return response
+
+
+def version_etag(kind, *parts):
+    """Builds a strong ETag from the DB change counter plus request-specific parts."""
+    token = db_operations.get_version_token(kind)
+    if token is None:
+        return None
+    return '-'.join([token, *map(str, parts)])
+
+
+# --- View Tracking ---
+
+# GET routes never write; the client reports a view through /view once a sujet
+# has been on screen this long, so prefetches and fast navigation don't count.
+VIEW_DWELL_MS = int(os.getenv('VIEW_DWELL_MS', 2000))
+# Upper bound on views accepted in one beacon
+VIEW_BATCH_MAX = 100
+
+# --- Field Projection ---
+
+
+def requested_fields():
+    """Columns requested via ?fields= (column list or preset such as 'lite'), None for all."""
+    return db_operations.parse_fields(request.args.get('fields', ''))
+
+
+@app.errorhandler(db_operations.UnknownFieldError)
+def unknown_field(error):
+    return json_response({'status': 'error', 'message': str(error)}), 400
+
+
+# --- Database Errors ---
+
+
+@app.errorhandler(sqlite3.OperationalError)
+def database_error(error):
+    """Reports SQLite failures as JSON. Lock contention is retryable, so it gets a 503."""
+    message = str(error)
+    print(f"Database error on {request.method} {request.path}: {message}")
+    if 'locked' in message or 'busy' in message:
+        response = json_response({'status': 'error', 'message': message}, 503)
+        response.headers['Retry-After'] = '1'
+        return response
+    return json_response({'status': 'error', 'message': 'Database error'}, 500)
+
 
 # --- Flask Routes ---
 
@@ -49,12 +139,21 @@ if not os.getenv('GOOGLE_SHEET_ID'):
 @app.route('/')
 def index():
     """Renders the main page."""
-    return render_template('index.html')
+    return render_template('index.html', view_dwell_ms=VIEW_DWELL_MS)
+
+
+@app.route('/sw.js')
+def service_worker():
+    """Serves static/sw.js from the root: a worker only controls pages under its
+    own path, and it has to see the API requests it revalidates."""
+    response = send_from_directory(app.static_folder, 'sw.js', max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 @app.route('/get_sujet')
 def get_sujet():
-    """Returns the next sujet based on filters and increments its view count."""
+    """Returns the next sujet based on filters. Views are recorded via /view."""
     offset = request.args.get('offset', 0, type=int)
     tags_str = request.args.get('tags', '')
     people_str = request.args.get('people', '')
@@ -67,12 +166,12 @@ def get_sujet():
     search = search_str.strip() if search_str else None
 
     sujet = db_operations.get_next_sujet_by_filter(
-        offset, tags, people, search)
+        offset, tags, people, search, fields=requested_fields())
 
     if sujet:
-        return jsonify({'status': 'ok', 'sujet': dict(sujet)})
+        return json_response({'status': 'ok', 'sujet': sujet})
     else:
-        return jsonify({'status': 'no_more_sujets'})
+        return json_response({'status': 'no_more_sujets'})
 
 
 @app.route('/get_sujets_count')
@@ -88,28 +187,38 @@ def get_sujets_count():
               if person.strip()] if people_str else []
     search = search_str.strip() if search_str else None
 
-    count = db_operations.get_sujets_count_by_filter(tags, people, search)
-    return jsonify({'status': 'ok', 'count': count})
+    def build():
+        count = db_operations.get_sujets_count_by_filter(tags, people, search)
+        return json_response({'status': 'ok', 'count': count})
+
+    # The ETag is per URL, so the filter itself doesn't need to be part of it
+    return conditional_response(version_etag('content', 'count'), build)
 
 
 @app.route('/get_sujet_by_id/<int:sujet_id>')
 def get_sujet_by_id_route(sujet_id):
     """Route to return a specific sujet by its ID."""
-    sujet = db_operations.get_sujet_by_id(sujet_id)
-    if sujet:
-        return jsonify({'status': 'ok', 'sujet': dict(sujet)})
-    else:
-        return jsonify({'status': 'error', 'message': 'Sujet not found'}), 404
+    fields = requested_fields()
+
+    def build():
+        sujet = db_operations.get_sujet_by_id(sujet_id, fields)
+        if sujet:
+            return json_response({'status': 'ok', 'sujet': sujet})
+        else:
+            return json_response({'status': 'error', 'message': 'Sujet not found'}), 404
+
+    # The payload includes view_count, so key on the full data version
+    return conditional_response(version_etag('data', 'sujet', sujet_id), build)
 
 
 @app.route('/get_random_sujet')
 def get_random_sujet():
-    """Returns a random sujet that needs enrichment and increments its view count."""
-    sujet = db_operations.get_random_sujet_from_db()
+    """Returns a random sujet. Views are recorded via /view."""
+    sujet = db_operations.get_random_sujet_from_db(fields=requested_fields())
     if sujet:
-        return jsonify({'status': 'ok', 'sujet': dict(sujet)})
+        return json_response({'status': 'ok', 'sujet': sujet})
     else:
-        return jsonify({'status': 'no_more_sujets'})
+        return json_response({'status': 'no_more_sujets'})
 
 
 @app.route('/first')
@@ -128,11 +237,11 @@ def first():
 
     # Always get chronologically first (lowest ID) regardless of sort order
     sujet = db_operations.get_first_or_last_sujet_from_db(
-        first=True, tags=tags, people=people, search=search)
+        first=True, tags=tags, people=people, search=search, fields=requested_fields())
     if sujet:
-        return jsonify({'status': 'ok', 'sujet': dict(sujet)})
+        return json_response({'status': 'ok', 'sujet': sujet})
     else:
-        return jsonify({'status': 'error', 'message': 'Sujet not found'}), 404
+        return json_response({'status': 'error', 'message': 'Sujet not found'}), 404
 
 
 @app.route('/last')
@@ -151,11 +260,11 @@ def last():
 
     # Always get chronologically last (highest ID) regardless of sort order
     sujet = db_operations.get_first_or_last_sujet_from_db(
-        first=False, tags=tags, people=people, search=search)
+        first=False, tags=tags, people=people, search=search, fields=requested_fields())
     if sujet:
-        return jsonify({'status': 'ok', 'sujet': dict(sujet)})
+        return json_response({'status': 'ok', 'sujet': sujet})
     else:
-        return jsonify({'status': 'error', 'message': 'Sujet not found'}), 404
+        return json_response({'status': 'error', 'message': 'Sujet not found'}), 404
 
 
 @app.route('/save_sujet', methods=['POST'])
@@ -169,7 +278,36 @@ def save_sujet():
 
     db_operations.update_sujet_details(sujet_id, user_notes, user_tags, person)
 
-    return jsonify({'status': 'success', 'message': 'Sujet details saved successfully.'})
+    return json_response({'status': 'success', 'message': 'Sujet details saved successfully.'})
+
+
+@app.route('/view', methods=['POST'])
+def record_views():
+    """Records a batch of dwell-qualified views. Compatible with navigator.sendBeacon.
+
+    Body (any content type, since sendBeacon can't send application/json without
+    a preflight): {"views": [{"id": 12, "dwell_ms": 2400}, ...]}
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    views = data.get('views')
+    if not isinstance(views, list) or len(views) > VIEW_BATCH_MAX:
+        return json_response({'status': 'error', 'message': f'views must be a list of at most {VIEW_BATCH_MAX} entries'}), 400
+
+    sujet_ids = []
+    for view in views:
+        if not isinstance(view, dict):
+            continue
+        sujet_id = view.get('id')
+        dwell_ms = view.get('dwell_ms', 0)
+        # Ignore anything that wasn't on screen long enough to count
+        # bool is an int subclass, but {"id": true} isn't sujet 1
+        if (isinstance(sujet_id, int) and not isinstance(sujet_id, bool)
+                and isinstance(dwell_ms, (int, float)) and not isinstance(dwell_ms, bool)
+                and dwell_ms >= VIEW_DWELL_MS):
+            sujet_ids.append(sujet_id)
+
+    recorded = db_operations.record_views(sujet_ids)
+    return json_response({'status': 'success', 'recorded': recorded})
 
 
 @app.route('/skip_sujet', methods=['POST'])
@@ -181,53 +319,54 @@ def skip_sujet():
     db_operations.update_sujet_status(sujet_id, 'skipped')
 
     # Google Sheets logging removed to fix 500 errors
-    return jsonify({'status': 'success', 'message': 'Sujet skipped successfully.'})
+    return json_response({'status': 'success', 'message': 'Sujet skipped successfully.'})
 
 
 @app.route('/delete_sujet/<int:sujet_id>', methods=['DELETE'])
 def delete_sujet(sujet_id):
     """Deletes a sujet from SQLite."""
-    sujet_to_log = db_operations.get_sujet_by_id(sujet_id)
-    if not sujet_to_log:
-        return jsonify({'status': 'error', 'message': 'Sujet not found'}), 404
-
     # Google Sheets logging removed to fix 500 errors
 
-    # Delete from the database
-    db_operations.delete_sujet_from_db(sujet_id)
-    return jsonify({'status': 'success', 'message': 'Sujet deleted successfully.'})
+    # Delete from the database; no rows deleted means it didn't exist
+    if not db_operations.delete_sujet_from_db(sujet_id):
+        return json_response({'status': 'error', 'message': 'Sujet not found'}), 404
+    return json_response({'status': 'success', 'message': 'Sujet deleted successfully.'})
 
 
 @app.route('/get_all_tags')
 def get_all_tags():
-    tags = db_operations.get_all_unique_tags()
-    return jsonify(tags)
+    return conditional_response(
+        version_etag('content', 'tags'),
+        lambda: json_response(db_operations.get_all_unique_tags()))
 
 
 @app.route('/get_all_people')
 def get_all_people():
-    people = db_operations.get_all_unique_people()
-    return jsonify(people)
+    return conditional_response(
+        version_etag('content', 'people'),
+        lambda: json_response(db_operations.get_all_unique_people()))
 
 
 @app.route('/get_first_sujet')
 def get_first_sujet():
-    """Returns the first sujet (by ID) and increments its view count."""
-    sujet = db_operations.get_first_or_last_sujet_from_db(first=True)
+    """Returns the first sujet (by ID)."""
+    sujet = db_operations.get_first_or_last_sujet_from_db(
+        first=True, fields=requested_fields())
     if sujet:
-        return jsonify({'status': 'ok', 'sujet': dict(sujet)})
+        return json_response({'status': 'ok', 'sujet': sujet})
     else:
-        return jsonify({'status': 'no_more_sujets'})
+        return json_response({'status': 'no_more_sujets'})
 
 
 @app.route('/get_last_sujet')
 def get_last_sujet():
-    """Returns the last sujet (by ID) and increments its view count."""
-    sujet = db_operations.get_first_or_last_sujet_from_db(first=False)
+    """Returns the last sujet (by ID)."""
+    sujet = db_operations.get_first_or_last_sujet_from_db(
+        first=False, fields=requested_fields())
     if sujet:
-        return jsonify({'status': 'ok', 'sujet': dict(sujet)})
+        return json_response({'status': 'ok', 'sujet': sujet})
     else:
-        return jsonify({'status': 'no_more_sujets'})
+        return json_response({'status': 'no_more_sujets'})
 
 
 @app.route('/adjacent_sujet')
@@ -239,14 +378,15 @@ def adjacent_sujet():
         tags:    optional comma-separated list
         people:  optional comma-separated list
         search:  optional search term
+        fields:  optional column list or preset ('lite' = id + title, for fast-forward)
     """
     sujet_id = request.args.get('id', type=int)
     if sujet_id is None:
-        return jsonify({'status': 'error', 'message': 'Missing id param'}), 400
+        return json_response({'status': 'error', 'message': 'Missing id param'}), 400
 
     direction = request.args.get('direction', 'next').lower()
     if direction not in ['next', 'prev']:
-        return jsonify({'status': 'error', 'message': 'direction must be next or prev'}), 400
+        return json_response({'status': 'error', 'message': 'direction must be next or prev'}), 400
 
     tags_str = request.args.get('tags', '')
     people_str = request.args.get('people', '')
@@ -259,11 +399,131 @@ def adjacent_sujet():
     search = search_str.strip() if search_str else None
 
     sujet = db_operations.get_adjacent_sujet(
-        sujet_id, tags, people, direction, search)
+        sujet_id, tags, people, direction, search, fields=requested_fields())
     if sujet:
-        return jsonify({'status': 'ok', 'sujet': dict(sujet)})
+        return json_response({'status': 'ok', 'sujet': sujet})
     else:
-        return jsonify({'status': 'no_more_sujets'})
+        return json_response({'status': 'no_more_sujets'})
+
+
+# Upper bound on a single seek, to keep one request's scan bounded
+SEEK_MAX_DELTA = 1000
+
+
+@app.route('/seek')
+def seek():
+    """Jumps N sujets forward or backward in the filtered chronological order.
+    Unlike /adjacent_sujet, the skipped sujets (and the target) don't count as viewed.
+    Query params:
+        id:      current sujet ID (int)
+        delta:   positions to move, e.g. 10 or -10 (clamped to +/-SEEK_MAX_DELTA)
+        tags, people, search, fields: as for /adjacent_sujet
+    """
+    sujet_id = request.args.get('id', type=int)
+    delta = request.args.get('delta', type=int)
+    if sujet_id is None or delta is None:
+        return json_response({'status': 'error', 'message': 'id and delta must be integers'}), 400
+    delta = max(-SEEK_MAX_DELTA, min(SEEK_MAX_DELTA, delta))
+
+    tags_str = request.args.get('tags', '')
+    people_str = request.args.get('people', '')
+    search_str = request.args.get('search', '')
+
+    tags = [t.strip() for t in tags_str.split(
+        ',') if t.strip()] if tags_str else []
+    people = [p.strip() for p in people_str.split(
+        ',') if p.strip()] if people_str else []
+    search = search_str.strip() if search_str else None
+
+    sujet, moved = db_operations.seek_sujet(
+        sujet_id, delta, tags, people, search, fields=requested_fields())
+    if sujet:
+        return json_response({'status': 'ok', 'sujet': sujet, 'moved': moved})
+    else:
+        return json_response({'status': 'no_more_sujets'})
+
+
+# --- Navigation Sessions ---
+
+
+def filter_args():
+    """(tags, people, search) from the query string, parsed like the routes above."""
+    tags_str = request.args.get('tags', '')
+    people_str = request.args.get('people', '')
+    search_str = request.args.get('search', '')
+    tags = [t.strip() for t in tags_str.split(',') if t.strip()]
+    people = [p.strip() for p in people_str.split(',') if p.strip()]
+    search = search_str.strip() or None
+    return tags, people, search
+
+
+def nav_session(rebuild=False):
+    """The navigation session named by ?token=, rebuilt if unknown, expired or for another filter."""
+    tags, people, search = filter_args()
+    return nav_sessions.open_session(request.args.get('token'), tags, people, search, rebuild=rebuild)
+
+
+@app.route('/nav/start')
+def nav_start():
+    """Materialises the filtered ID list and returns its session token.
+    Query params:
+        tags, people, search: the filter
+        id:    optional current sujet ID, to get its position
+        token: optional previous token, reused if it still matches the filter;
+               without one the filter is run again, so new sujets show up
+    """
+    session_ = nav_session(rebuild=not request.args.get('token'))
+    sujet_id = request.args.get('id', type=int)
+    return json_response({
+        'status': 'ok',
+        'token': session_.token,
+        'count': len(session_.ids),
+        'position': nav_sessions.position_of(session_, sujet_id) if sujet_id is not None else None,
+    })
+
+
+@app.route('/nav/position')
+def nav_position():
+    """0-based position of ?id= in the session (null if it doesn't match the filter) and the count."""
+    sujet_id = request.args.get('id', type=int)
+    if sujet_id is None:
+        return json_response({'status': 'error', 'message': 'Missing id param'}), 400
+    session_ = nav_session()
+    return json_response({
+        'status': 'ok',
+        'token': session_.token,
+        'count': len(session_.ids),
+        'position': nav_sessions.position_of(session_, sujet_id),
+    })
+
+
+@app.route('/nav/next', defaults={'delta': 1}, endpoint='nav_next')
+@app.route('/nav/prev', defaults={'delta': -1}, endpoint='nav_prev')
+@app.route('/nav/seek', defaults={'delta': None}, endpoint='nav_seek')
+def nav_step(delta):
+    """Steps through a navigation session: same results as /adjacent_sujet and /seek,
+    without re-running the filter. Always send the filter with the token, so
+    another worker (or an expired session) can rebuild it.
+    Query params:
+        token:  from /nav/start
+        id:     current sujet ID (int)
+        delta:  /nav/seek only, clamped to +/-SEEK_MAX_DELTA
+        tags, people, search, fields: as for /seek
+    """
+    sujet_id = request.args.get('id', type=int)
+    if delta is None:
+        delta = request.args.get('delta', type=int)
+    if sujet_id is None or delta is None:
+        return json_response({'status': 'error', 'message': 'id and delta must be integers'}), 400
+    delta = max(-SEEK_MAX_DELTA, min(SEEK_MAX_DELTA, delta))
+
+    session_ = nav_session()
+    sujet, position, moved = nav_sessions.step(session_, sujet_id, delta, fields=requested_fields())
+    if sujet:
+        return json_response({'status': 'ok', 'sujet': sujet, 'moved': moved, 'position': position,
+                              'count': len(session_.ids), 'token': session_.token})
+    else:
+        return json_response({'status': 'no_more_sujets', 'token': session_.token})
 
 
 @app.route('/update_title/<int:sujet_id>', methods=['POST'])
@@ -272,33 +532,24 @@ def update_title(sujet_id):
     data = request.get_json()
 
     if not data or 'title' not in data:
-        return jsonify({'status': 'error', 'message': 'Missing title data'}), 400
+        return json_response({'status': 'error', 'message': 'Missing title data'}), 400
 
     new_title = data['title'].strip()
     if not new_title:
-        return jsonify({'status': 'error', 'message': 'Title cannot be empty'}), 400
+        return json_response({'status': 'error', 'message': 'Title cannot be empty'}), 400
 
     success = db_operations.update_sujet_title(sujet_id, new_title)
 
     if success:
-        # Log to Google Sheets if enabled
-        try:
-            sujet = db_operations.get_sujet_by_id(sujet_id)
-            if sujet:
-                # Removed log_sujet_to_sheet call
-                pass
-        except Exception as e:
-            print(f"Error logging title change to Google Sheets: {e}")
-            # Continue even if logging fails
-
-        return jsonify({
+        # Google Sheets logging removed
+        return json_response({
             'status': 'success',
             'message': 'Title updated successfully',
             'sujet_id': sujet_id,
             'new_title': new_title
         })
     else:
-        return jsonify({'status': 'error', 'message': 'Failed to update title'}), 500
+        return json_response({'status': 'error', 'message': 'Failed to update title'}), 500
 
 
 @app.route('/add_sujet', methods=['POST'])
@@ -307,11 +558,11 @@ def add_sujet():
     data = request.get_json()
 
     if not data or 'title' not in data:
-        return jsonify({'status': 'error', 'message': 'Missing title data'}), 400
+        return json_response({'status': 'error', 'message': 'Missing title data'}), 400
 
     title = data['title'].strip()
     if not title:
-        return jsonify({'status': 'error', 'message': 'Title cannot be empty'}), 400
+        return json_response({'status': 'error', 'message': 'Title cannot be empty'}), 400
 
     # Add the new sujet to the database with empty AI suggestion and notes
     new_sujet = db_operations.add_new_sujet(title, "", "")
@@ -325,16 +576,69 @@ def add_sujet():
             print(f"Error logging new sujet to Google Sheets: {e}")
             # Continue even if logging fails
 
-        # Convert SQLite Row to dict for JSON serialization
-        sujet_dict = dict(new_sujet)
-
-        return jsonify({
+        return json_response({
             'status': 'success',
             'message': 'Sujet created successfully',
-            'sujet': sujet_dict
+            'sujet': new_sujet
         })
     else:
-        return jsonify({'status': 'error', 'message': 'Failed to create sujet'}), 500
+        return json_response({'status': 'error', 'message': 'Failed to create sujet'}), 500
+
+
+# --- Delta Sync ---
+
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+
+
+@app.route('/changes')
+def changes():
+    """Row changes since a version, for clients keeping a local mirror.
+    Query params:
+        since: last `next` value received (0 for a full sync)
+        limit: page size (default CHANGES_DEFAULT_LIMIT, max CHANGES_MAX_LIMIT)
+        resync: 1 on the later pages of a sync that started from 0 or was reset
+    Returns changes in version order as {"op": "upsert", "version", "sujet"} or
+    {"op": "delete", "version", "id"}; apply them in order. Keep calling with
+    since=next while `more` is true. If `reset` is true the client's mirror is
+    too old (tombstones were pruned or the DB was rebuilt): clear it first, the
+    page then starts from version 0.
+
+    Old rows can have versions below the sync floor, so the cursors of a full
+    sync pass through it; `resync` tells the server not to take them for a
+    stale mirror. The last page's `next` is never below the floor.
+    """
+    since = request.args.get('since', 0, type=int)
+    resync = request.args.get('resync') == '1'
+    limit = request.args.get('limit', CHANGES_DEFAULT_LIMIT, type=int)
+    if since < 0 or limit < 1:
+        return json_response({'status': 'error', 'message': 'since must be >= 0 and limit >= 1'}), 400
+    limit = min(limit, CHANGES_MAX_LIMIT)
+
+    found, state = db_operations.get_changes(since, limit + 1)
+    reset = not resync and 0 < since < state.get('sync_floor', 0)
+    if reset:
+        found, state = db_operations.get_changes(0, limit + 1)
+    more = len(found) > limit
+    found = found[:limit]
+    next_version = found[-1][0] if found else (0 if reset else since)
+    if not more:
+        # Nothing is left below the floor, so the cursor can skip up to it
+        next_version = max(next_version, state.get('sync_floor', 0))
+    payload = []
+    for version, change in found:
+        if isinstance(change, int):
+            payload.append({'op': 'delete', 'version': version, 'id': change})
+        else:
+            payload.append({'op': 'upsert', 'version': version, 'sujet': change})
+    return json_response({
+        'status': 'ok',
+        'changes': payload,
+        'next': next_version,
+        'more': more,
+        'reset': reset,
+        'version': state.get('row_version', 0),
+    })
 
 
 if __name__ == '__main__':
@@ -0,0 +1,300 @@
+# backup.py
+"""Online backups of the sujets database with the SQLite backup API.
+
+Copying the .db file while the app writes can capture a torn page or a
+half-applied journal. `flask backup` instead copies through
+sqlite3.Connection.backup a few pages at a time, sleeping between steps so
+writers only ever wait for one step, not the whole copy. Each snapshot is
+integrity-checked, optionally gzipped, and written with a .sha256 sidecar;
+old snapshots beyond BACKUP_KEEP are pruned. `flask restore` verifies a
+snapshot before copying it back over the live database.
+
+    flask backup [--gzip] [--keep 10]
+    flask restore backups/sujets-20250801-120000.db.gz --yes
+"""
+
+import glob
+import gzip
+import hashlib
+import os
+import secrets
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+
+import db_operations
+
+# --- Configuration ---
+BACKUP_DIR = os.getenv('BACKUP_DIR') or os.path.join(db_operations.APP_ROOT, 'instance', 'backups')
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '10'))
+# Pages copied per step (4 KiB each by default) and the pause between steps.
+# Smaller steps shorten the longest wait a writer can see; the sleep is the
+# writers' window to get in.
+BACKUP_STEP_PAGES = int(os.getenv('BACKUP_STEP_PAGES', '256'))
+BACKUP_STEP_SLEEP = float(os.getenv('BACKUP_STEP_SLEEP', '0.005'))
+# A write by another connection restarts the copy; after this many restarts
+# the rest is copied in one step so a busy writer can't starve the backup.
+BACKUP_MAX_RESTARTS = 3
+# How long a step or the restore waits for a writer's lock
+LOCK_TIMEOUT = 30
+
+SNAPSHOT_PREFIX = 'sujets-'
+
+
+class BackupError(Exception):
+    """A snapshot failed verification."""
+
+
+class _Restarted(Exception):
+    pass
+
+# --- Snapshots ---
+
+
+def copy_database(source_path, dest_path, pages=None, sleep=None):
+    """Copies a live database to dest_path with the online backup API.
+
+    Returns stats: pages, bytes, seconds, steps, restarts, and the longest
+    time a single step held the source's read lock (max_step_ms), which is
+    the longest a writer can have been stalled by the backup.
+    """
+    pages = BACKUP_STEP_PAGES if pages is None else pages
+    sleep = BACKUP_STEP_SLEEP if sleep is None else sleep
+    stats = {'steps': 0, 'restarts': 0, 'max_step_ms': 0.0, 'fallback': False}
+    start = time.perf_counter()
+    source = sqlite3.connect(source_path, timeout=LOCK_TIMEOUT)
+    try:
+        while True:
+            dest = sqlite3.connect(dest_path)
+            previous = {'remaining': None, 'at': time.perf_counter()}
+
+            def progress(status, remaining, total):
+                now = time.perf_counter()
+                stats['max_step_ms'] = max(stats['max_step_ms'], (now - previous['at']) * 1000)
+                stats['steps'] += 1
+                stats['pages'] = total
+                # No progress means a writer changed the source and the copy
+                # started over from the first page
+                if previous['remaining'] is not None and remaining >= previous['remaining']:
+                    stats['restarts'] += 1
+                    if stats['restarts'] > BACKUP_MAX_RESTARTS:
+                        raise _Restarted()
+                previous['remaining'] = remaining
+                if remaining and sleep:
+                    time.sleep(sleep)
+                previous['at'] = time.perf_counter()
+
+            try:
+                source.backup(dest, pages=pages, progress=progress)
+                break
+            except _Restarted:
+                # Finish in one step: a single read lock for the whole copy
+                pages = -1
+                stats['fallback'] = True
+            finally:
+                dest.close()
+    finally:
+        source.close()
+    stats['seconds'] = time.perf_counter() - start
+    stats['bytes'] = os.path.getsize(dest_path)
+    if stats['fallback']:
+        print(f"[BACKUP] Source kept changing; copied the rest in one step "
+              f"(writers stalled up to {stats['max_step_ms']:.1f} ms)")
+    return stats
+
+
+def check_integrity(path):
+    """Raises BackupError unless PRAGMA integrity_check passes on path."""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"{path} is not a readable database: {e}")
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise BackupError(f"Integrity check failed for {path}: {result}")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_checksum(path):
+    """Writes `<path>.sha256` in sha256sum format and returns the digest."""
+    digest = file_sha256(path)
+    with open(path + '.sha256', 'w') as f:
+        f.write(f"{digest}  {os.path.basename(path)}\n")
+    return digest
+
+
+def verify_checksum(path):
+    """Raises BackupError if path doesn't match its .sha256 sidecar. False if there is none."""
+    sidecar = path + '.sha256'
+    if not os.path.exists(sidecar):
+        return False
+    with open(sidecar) as f:
+        expected = f.read().split()[0]
+    if file_sha256(path) != expected:
+        raise BackupError(f"Checksum mismatch for {path}")
+    return True
+
+
+def create_snapshot(source_path=None, directory=None, compress=False, label=None):
+    """Backs up the database into `directory` and verifies the copy.
+
+    Returns (snapshot path, stats).
+    """
+    source_path = source_path or db_operations.DATABASE_PATH
+    directory = directory or BACKUP_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f"{SNAPSHOT_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+    if label:
+        name += f'-{label}'
+    path = os.path.join(directory, name + '.db')
+    # Work under temporary names so a crash never leaves a plausible-looking snapshot
+    db_partial = path + '.partial'
+    gz_partial = path + '.gz.partial'
+    try:
+        stats = copy_database(source_path, db_partial)
+        check_integrity(db_partial)
+        if compress:
+            path += '.gz'
+            with open(db_partial, 'rb') as src, gzip.open(gz_partial, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            os.replace(gz_partial, path)
+        else:
+            os.replace(db_partial, path)
+    finally:
+        for leftover in (db_partial, gz_partial):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    stats['sha256'] = write_checksum(path)
+    stats['stored_bytes'] = os.path.getsize(path)
+    return path, stats
+
+
+def list_snapshots(directory=None):
+    """Snapshot paths in `directory`, oldest first."""
+    directory = directory or BACKUP_DIR
+    paths = glob.glob(os.path.join(directory, SNAPSHOT_PREFIX + '*.db'))
+    paths += glob.glob(os.path.join(directory, SNAPSHOT_PREFIX + '*.db.gz'))
+    return sorted(paths, key=os.path.basename)
+
+
+def prune_snapshots(directory=None, keep=None):
+    """Deletes all but the newest `keep` snapshots. Returns the deleted paths."""
+    keep = BACKUP_KEEP if keep is None else keep
+    snapshots = list_snapshots(directory)
+    doomed = snapshots[:-keep] if keep > 0 else snapshots
+    for path in doomed:
+        os.remove(path)
+        if os.path.exists(path + '.sha256'):
+            os.remove(path + '.sha256')
+    return doomed
+
+
+def restore_snapshot(snapshot_path, target_path=None):
+    """Verifies a snapshot and copies it over the target database.
+
+    The copy is one backup step, so readers see either the old or the restored
+    database. Sync clients and ETags are invalidated afterwards, since the
+    restored row versions may be older than what clients already hold.
+    """
+    target_path = target_path or db_operations.DATABASE_PATH
+    verify_checksum(snapshot_path)
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = snapshot_path
+        if snapshot_path.endswith('.gz'):
+            source_path = os.path.join(tmp, 'restore.db')
+            with gzip.open(snapshot_path, 'rb') as src, open(source_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+        check_integrity(source_path)
+
+        target = sqlite3.connect(target_path, timeout=LOCK_TIMEOUT)
+        try:
+            previous_version = _row_version(target)
+            source = sqlite3.connect(source_path)
+            try:
+                source.backup(target, pages=-1)
+            finally:
+                source.close()
+            # The snapshot may predate the current schema
+            db_operations._schema_ready.discard(target_path)
+            db_operations.ensure_schema(target, target_path)
+            version = max(previous_version, _row_version(target)) + 1
+            target.execute("UPDATE sujets_meta SET value = ? WHERE key IN ('row_version', 'sync_floor')",
+                           (version,))
+            target.execute("UPDATE sujets_meta SET value = ? WHERE key = 'epoch'",
+                           (secrets.randbelow(1 << 32),))
+            target.commit()
+        finally:
+            target.close()
+
+
+def _row_version(conn):
+    try:
+        row = conn.execute("SELECT value FROM sujets_meta WHERE key = 'row_version'").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+def _mb(n):
+    return f"{n / (1 << 20):.1f} MB"
+
+# --- CLI Commands ---
+
+
+@click.command('backup')
+@click.option('--dir', 'directory', default=None, help='Snapshot directory (default: BACKUP_DIR).')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the snapshot.')
+@click.option('--keep', type=int, default=None, help='Snapshots to keep (default: BACKUP_KEEP).')
+@with_appcontext
+def backup_command(directory, compress, keep):
+    """Takes a verified online snapshot of the database."""
+    path, stats = create_snapshot(directory=directory, compress=compress)
+    rate = stats['bytes'] / stats['seconds'] / (1 << 20) if stats['seconds'] else 0
+    print(f"Backed up {_mb(stats['bytes'])} to {path} ({_mb(stats['stored_bytes'])} stored) "
+          f"in {stats['seconds']:.2f}s, {rate:.1f} MB/s, {stats['steps']} steps, "
+          f"{stats['restarts']} restarts.")
+    print(f"Longest writer stall: {stats['max_step_ms']:.1f} ms"
+          f"{' (single-step fallback)' if stats['fallback'] else ''}")
+    print(f"sha256 {stats['sha256']}")
+    for old in prune_snapshots(directory, keep):
+        print(f"Pruned {old}")
+
+
+@click.command('restore')
+@click.argument('snapshot', type=click.Path(exists=True, dir_okay=False))
+@click.option('--no-safety-backup', is_flag=True, help='Skip the snapshot of the current database.')
+@click.confirmation_option(prompt='Replace the live database with this snapshot?')
+@with_appcontext
+def restore_command(snapshot, no_safety_backup):
+    """Verifies a snapshot and restores it over the live database."""
+    try:
+        if not no_safety_backup and os.path.exists(db_operations.DATABASE_PATH):
+            path, _ = create_snapshot(label='pre-restore')
+            print(f"Saved the current database to {path}")
+        restore_snapshot(snapshot)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    print(f"Restored {snapshot} to {db_operations.DATABASE_PATH}. "
+          "Offline clients will resync; restart the app workers.")
+
+# --- Registration Functions ---
+
+
+def register_backup(app):
+    """Registers the backup and restore CLI commands."""
+    app.cli.add_command(backup_command)
+    app.cli.add_command(restore_command)
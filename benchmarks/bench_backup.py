@@ -0,0 +1,98 @@
+# benchmarks/bench_backup.py
+"""Backup throughput and writer stall time for different backup step sizes.
+
+A writer thread commits small updates in a loop while backup.copy_database
+copies the corpus. Each configuration reports MB/s and the writer's commit
+latency (the stall a user's save would see), next to a baseline run with no
+backup at all.
+
+    python -m benchmarks.bench_backup [--rows 100000] [--pages 64,256,1024,-1]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import backup
+from benchmarks.corpus import cached_corpus_path
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else 0.0
+
+
+def run_writer(db_path, stop, latencies, interval):
+    """Commits one update every `interval` seconds until stop is set."""
+    conn = sqlite3.connect(db_path, timeout=backup.LOCK_TIMEOUT)
+    row = 1
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.execute("UPDATE sujets SET view_count = view_count + 1 WHERE rowid = ?", (row,))
+        conn.commit()
+        latencies.append((time.perf_counter() - start) * 1000)
+        row += 1
+        time.sleep(interval)
+    conn.close()
+
+
+def measure(db_path, dest_path, pages, sleep, interval, duration=None):
+    """One backup (or, with pages=None, `duration` seconds of idle) under write load."""
+    latencies = []
+    stop = threading.Event()
+    writer = threading.Thread(target=run_writer, args=(db_path, stop, latencies, interval))
+    writer.start()
+    try:
+        if pages is None:
+            time.sleep(duration)
+            stats = None
+        else:
+            stats = backup.copy_database(db_path, dest_path, pages=pages, sleep=sleep)
+    finally:
+        stop.set()
+        writer.join()
+    latencies.sort()
+    return stats, latencies
+
+
+def print_row(label, stats, latencies):
+    rate = f"{stats['bytes'] / stats['seconds'] / (1 << 20):.1f}" if stats else '-'
+    seconds = f"{stats['seconds']:.2f}" if stats else '-'
+    restarts = stats['restarts'] if stats else '-'
+    print(f"{label:<14} {seconds:>8} {rate:>8} {restarts:>8} {len(latencies):>8} "
+          f"{percentile(latencies, 0.5):>8.1f} {percentile(latencies, 0.99):>8.1f} "
+          f"{(latencies[-1] if latencies else 0):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='corpus size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pages', default='64,256,1024,-1',
+                        help='comma-separated pages per step (-1 = one step)')
+    parser.add_argument('--sleep', type=float, default=backup.BACKUP_STEP_SLEEP,
+                        help='seconds between steps')
+    parser.add_argument('--write-interval', type=float, default=0.002,
+                        help='seconds between the writer\'s commits')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'sujets.db')
+        shutil.copyfile(cached_corpus_path(args.rows, args.seed), db_path)
+        print(f"{args.rows} rows, {os.path.getsize(db_path) / (1 << 20):.1f} MB; writer commit latency in ms")
+        print(f"{'config':<14} {'seconds':>8} {'MB/s':>8} {'restarts':>8} {'commits':>8} "
+              f"{'p50':>8} {'p99':>8} {'max':>8}")
+        _, baseline = measure(db_path, None, None, 0, args.write_interval, duration=2.0)
+        print_row('no backup', None, baseline)
+        for pages in [int(p) for p in args.pages.split(',')]:
+            dest = os.path.join(tmp, f'copy{pages}.db')
+            stats, latencies = measure(db_path, dest, pages, args.sleep, args.write_interval)
+            print_row(f'pages={pages}', stats, latencies)
+            os.remove(dest)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_compression.py
+"""Bytes-on-wire and CPU cost of response compression, per route and static asset.
+
+Runs against the database configured through DATABASE_PATH, like the app itself.
+
+    python -m benchmarks.bench_compression [--repeat 200]
+"""
+
+import argparse
+import os
+import time
+
+import compression
+from app import app
+
+ROUTES = [
+    '/get_all_tags',
+    '/get_all_people',
+    '/get_sujets_count',
+    '/get_sujet_by_id/1',
+    '/adjacent_sujet?id=1&direction=next',
+    '/get_sujet?offset=0',
+    '/',
+]
+
+
+def time_compression(data, encoding, repeat, static=False):
+    """Returns (compressed_size, microseconds of CPU per compression)."""
+    start = time.process_time()
+    for _ in range(repeat):
+        compressed = compression.compress_body(data, encoding, static=static)
+    elapsed = time.process_time() - start
+    return len(compressed), elapsed / repeat * 1e6
+
+
+def bench_body(label, data, repeat, static=False):
+    row = [label, len(data)]
+    for encoding in ['gzip', 'br']:
+        if encoding == 'br' and compression.brotli is None:
+            row.extend(['-', '-'])
+            continue
+        size, cpu_us = time_compression(data, encoding, repeat, static=static)
+        row.extend([size, f"{cpu_us:.1f}"])
+    print("{:<40} {:>9} {:>9} {:>9} {:>9} {:>9}".format(*row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200,
+                        help='compressions per measurement')
+    args = parser.parse_args()
+
+    print("{:<40} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+        'resource', 'identity', 'gzip B', 'gzip us', 'br B', 'br us'))
+    client = app.test_client()
+    for route in ROUTES:
+        # Ask for identity so we measure the raw body the hook would compress
+        response = client.get(route, headers={'Accept-Encoding': 'identity'})
+        bench_body(route, response.get_data(), args.repeat)
+
+    print("\nStatic assets (precompressed at build time, max level; runtime CPU is 0):")
+    for name in ['script.js', 'style.css', 'sw.js', 'manifest.json']:
+        with open(os.path.join(app.static_folder, name), 'rb') as f:
+            bench_body(f'/static/{name}', f.read(), max(1, args.repeat // 20), static=True)
+
+
+if __name__ == '__main__':
+    main()
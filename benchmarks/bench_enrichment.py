@@ -0,0 +1,90 @@
+# benchmarks/bench_enrichment.py
+"""Enrichment throughput: the old sequential loop against the async Enricher.
+
+Everything runs against benchmarks/stub_llm.py, so no API key is needed and
+the numbers depend only on the simulated latency and rate limit. A second
+table compares pack sizes: requests, tokens and time per 1,000 sujets.
+
+    python -m benchmarks.bench_enrichment [--items 200] [--latency 0.3] [--rpm 1200] [--pack-sizes 1,5,10,20]
+"""
+
+import argparse
+import time
+
+import enrichment
+from benchmarks.stub_llm import StubLLMServer
+
+# weave_batch.py's old pause between calls
+SEQUENTIAL_SLEEP = 0.5
+
+
+def sequential(transport, items, sleep):
+    """The pre-Enricher loop: one call at a time, fixed sleep, no retries."""
+    enricher = enrichment.Enricher(transport=transport)
+    start = time.perf_counter()
+    failed = 0
+    for _, text in items:
+        try:
+            transport.post(enricher.payload(enrichment.build_prompt(text)))
+        except (enrichment.RateLimited, enrichment.TransientError):
+            failed += 1
+        time.sleep(sleep)
+    return time.perf_counter() - start, failed
+
+
+def print_row(label, items, seconds, failed, rate_limited, baseline=None):
+    speedup = f"{baseline / seconds:.1f}x" if baseline else '-'
+    print(f"{label:<22} {seconds:>9.2f} {items / seconds:>9.1f} {failed:>7} {rate_limited:>6} {speedup:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.3, help='stub seconds per completion')
+    parser.add_argument('--rpm', type=int, default=1200, help='stub rate limit per minute')
+    parser.add_argument('--tpm', type=int, default=1000000, help='Enricher token budget per minute')
+    parser.add_argument('--concurrency', default='4,16,64', help='comma-separated levels')
+    parser.add_argument('--pack-sizes', default='1,5,10,20', help='comma-separated sujets per request')
+    parser.add_argument('--drop-every', type=int, default=0,
+                        help='stub leaves every n-th note out of packed answers')
+    parser.add_argument('--baseline-items', type=int, default=20,
+                        help='items for the (slow) sequential baseline, extrapolated')
+    args = parser.parse_args()
+
+    items = [(i, f'benchmark note {i}') for i in range(args.items)]
+    print(f"{args.items} items, stub latency {args.latency}s, limit {args.rpm}/min")
+    print(f"{'mode':<22} {'seconds':>9} {'items/s':>9} {'failed':>7} {'429s':>6} {'speedup':>8}")
+
+    with StubLLMServer(latency=args.latency, rpm=args.rpm, drop_every=args.drop_every) as stub:
+        transport = enrichment.OpenAIChatTransport(base_url=stub.base_url, api_key='bench')
+        sample = items[:args.baseline_items]
+        seconds, failed = sequential(transport, sample, SEQUENTIAL_SLEEP)
+        baseline = seconds * len(items) / len(sample)
+        print_row('sequential (extrap.)', len(items), baseline, failed, stub.stats['rate_limited'])
+
+        for concurrency in [int(c) for c in args.concurrency.split(',')]:
+            stub.reset_window()
+            before = stub.stats['rate_limited']
+            results, stats = enrichment.run_enrichment(
+                items, transport=transport, concurrency=concurrency, rpm=args.rpm, tpm=args.tpm)
+            failed = sum(1 for r in results if r['error'])
+            print_row(f'async x{concurrency}', len(items), stats['seconds'], failed,
+                      stub.stats['rate_limited'] - before, baseline)
+
+        concurrency = int(args.concurrency.split(',')[-1])
+        per = 1000 / len(items)
+        print(f"\nPer 1,000 sujets at concurrency {concurrency}:")
+        print(f"{'pack size':<10} {'requests':>9} {'tokens':>10} {'seconds':>9} {'re-sent':>8} {'failed':>7}")
+        for pack_size in [int(p) for p in args.pack_sizes.split(',')]:
+            stub.reset_window()
+            results, stats = enrichment.run_enrichment(
+                items, transport=transport, concurrency=concurrency, rpm=args.rpm, tpm=args.tpm,
+                pack_size=pack_size)
+            tokens = stats['prompt_tokens'] + stats['completion_tokens']
+            print(f"{pack_size:<10} {stats['requests'] * per:>9.0f} {tokens * per:>10.0f} "
+                  f"{stats['seconds'] * per:>9.2f} {stats['items_resent'] * per:>8.0f} "
+                  f"{sum(1 for r in results if r['error']) * per:>7.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_import_time.py
+"""Web-worker cold-start cost, measured with `python -X importtime -c "import app"`.
+
+Exits non-zero if the median import time exceeds --max-ms or if a module that
+belongs to the CLI/batch tooling (pandas, openai, gspread...) is imported.
+
+    python -m benchmarks.bench_import_time [--runs 5] [--max-ms 600] [--top 15]
+
+The time budget is enforced here rather than in the unit tests, since
+wall-clock limits flake on slow or loaded machines: run it as its own CI step.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy packages that must only load for CLI commands or batch scripts
+FORBIDDEN_MODULES = ('pandas', 'numpy', 'openai', 'gspread', 'googleapiclient')
+DEFAULT_MAX_MS = 600
+
+
+def measure_import(module='app'):
+    """Imports `module` in a fresh interpreter.
+
+    Returns:
+        (total_ms, {top-level package: cumulative_ms}, [all imported module names])
+    """
+    env = dict(os.environ)
+    # Point at a throwaway DB path so the measurement never touches real data
+    env.setdefault('DATABASE_PATH', os.path.join(PROJECT_ROOT, 'instance', 'bench_import.db'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True)
+
+    total_ms = None
+    packages = {}
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        modules.append(name)
+        if depth == 0 and name == module:
+            total_ms = int(cumulative_us) / 1000
+        elif depth == 1:
+            packages[name] = int(cumulative_us) / 1000
+    return total_ms, packages, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float,
+                        default=float(os.getenv('WEAVE_MAX_IMPORT_MS', DEFAULT_MAX_MS)))
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        total_ms, packages, modules = measure_import()
+        totals.append(total_ms)
+    median_ms = statistics.median(totals)
+
+    print(f"import app: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}); threshold {args.max_ms:.0f} ms")
+    print("\nSlowest direct imports (last run):")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    forbidden = sorted({m.split('.')[0] for m in modules} & set(FORBIDDEN_MODULES))
+    failed = False
+    if forbidden:
+        print(f"\nFAIL: web path imports {', '.join(forbidden)}")
+        failed = True
+    if median_ms > args.max_ms:
+        print(f"\nFAIL: import time regressed past {args.max_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/bench_serialization.py
+"""Encode cost per sujet response: jsonify(dict(row)) vs. the serialization module.
+
+    python -m benchmarks.bench_serialization [--repeat 20000]
+"""
+
+import argparse
+import sqlite3
+import time
+
+from flask import jsonify
+
+import serialization
+from app import app
+from serialization import Sujet, SUJET_COLUMNS
+
+
+def sample_row():
+    """A realistic sujet row, with the NULLs a real corpus has."""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"CREATE TABLE sujets ({', '.join(SUJET_COLUMNS)})")
+    conn.execute('INSERT INTO sujets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+        553, 'ID: 553 - Observation about a very unusual hat in a coffee shop', None, 3,
+        'Saw it twice this week. ' * 8, 'Observation, People', 'new', 'S', '2025-07-13'))
+    return conn.execute(f"SELECT {', '.join(SUJET_COLUMNS)} FROM sujets").fetchone()
+
+
+def timed(label, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {elapsed / repeat * 1e6:8.2f} us/response  {len(body):5d} B")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+    row = sample_row()
+
+    with app.test_request_context():
+        timed('jsonify(dict(row))  [previous]',
+              lambda: jsonify({'status': 'ok', 'sujet': dict(row)}).get_data(), args.repeat)
+        timed('stdlib_dumps(Sujet.from_row(row))',
+              lambda: serialization.stdlib_dumps(
+                  {'status': 'ok', 'sujet': Sujet.from_row(row)}), args.repeat)
+        if serialization.orjson is not None:
+            timed('orjson_dumps(Sujet.from_row(row))',
+                  lambda: serialization.orjson_dumps(
+                      {'status': 'ok', 'sujet': Sujet.from_row(row)}), args.repeat)
+        timed('json_response(...)  [full response object]',
+              lambda: serialization.json_response(
+                  {'status': 'ok', 'sujet': Sujet.from_row(row)}).get_data(), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/corpus.py
+"""Deterministic synthetic sujet corpus for benchmarks and load tests.
+
+The same (size, seed, options) always produces byte-identical rows, so timings
+from different commits are measured against the same data.
+
+    python -m benchmarks.corpus out.db --rows 100000 [--seed 0]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+# Generated corpora are cached here (gitignored) and reused across runs
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.corpus')
+
+# Mirrors the predefined toggles in static/script.js, so filters hit real values
+TAGS = ['AI', 'Work', 'Medical', 'Science', 'History', 'Politics', 'Culture',
+        'Sports', 'Travel', 'Food & Drink', 'Observation', 'Quote', 'People', 'Idea/Project']
+PEOPLE = ['S', 'Fam', 'Stef', 'MD', 'AK', 'ML', 'work']
+
+WORDS = ('the a of to and in is it for on with as was at by an be this that from or have '
+         'coffee hat museum book quote train meeting model debate idea project travel '
+         'weekend dinner lecture history science election match recipe garden code paper '
+         'conversation memory question answer walk city river mountain note reminder').split()
+
+DEFAULT_OPTIONS = {
+    # Probability that a sujet has any tags, and the maximum tags per sujet
+    'tagged_ratio': 0.6,
+    'max_tags': 3,
+    # Probability that a sujet names a person
+    'person_ratio': 0.35,
+    # Word counts, drawn uniformly from these ranges
+    'title_words': (3, 14),
+    'notes_words': (0, 60),
+    # Probability that notes are empty regardless of notes_words
+    'empty_notes_ratio': 0.5,
+    # Creation dates are spread uniformly over this many days before end_date
+    'date_spread_days': 5 * 365,
+    'end_date': date(2025, 8, 1),
+}
+
+
+def zipf_weights(n, exponent=1.1):
+    """Skewed weights so a few tags/people dominate, like a real corpus."""
+    return [1 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+def generate_sujets(rows, seed=0, **options):
+    """Yields sujet tuples in the sujets table's column order, with IDs 1..rows."""
+    opts = dict(DEFAULT_OPTIONS, **options)
+    rng = random.Random(seed)
+    tag_weights = zipf_weights(len(TAGS))
+    people_weights = zipf_weights(len(PEOPLE))
+    end_date = opts['end_date']
+
+    for sujet_id in range(1, rows + 1):
+        title = ' '.join(rng.choices(WORDS, k=rng.randint(*opts['title_words'])))
+        if rng.random() < opts['empty_notes_ratio']:
+            notes = ''
+        else:
+            notes = ' '.join(rng.choices(WORDS, k=rng.randint(*opts['notes_words'])))
+        tags = ''
+        if rng.random() < opts['tagged_ratio']:
+            picked = rng.choices(TAGS, weights=tag_weights, k=rng.randint(1, opts['max_tags']))
+            tags = ', '.join(dict.fromkeys(picked))  # dedupe, keep order
+        person = ''
+        if rng.random() < opts['person_ratio']:
+            person = rng.choices(PEOPLE, weights=people_weights)[0]
+        created = end_date - timedelta(days=rng.randrange(opts['date_spread_days']))
+        yield (sujet_id, f"ID: {sujet_id} - {title}", None, notes, tags,
+               'needs_enrichment', rng.randint(0, 20), person, created.isoformat())
+
+
+def create_corpus_db(path, rows, seed=0, batch_size=10000, **options):
+    """Writes a sujets table shaped like `flask init-db` output to `path`.
+
+    An existing file at `path` is replaced.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE sujets (
+        id INTEGER, original_sujet TEXT, ai_suggestion TEXT, user_notes TEXT,
+        user_tags TEXT, status TEXT, view_count INTEGER, person TEXT, date_created TEXT)""")
+    batch = []
+    for row in generate_sujets(rows, seed=seed, **options):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.executemany('INSERT INTO sujets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+            batch = []
+    if batch:
+        conn.executemany('INSERT INTO sujets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+    # Same index init-db gets from pandas, created after the load for speed
+    conn.execute('CREATE INDEX ix_sujets_id ON sujets (id)')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def cached_corpus_path(rows, seed=0):
+    """Path of a pristine default-options corpus, generated on first use and reused after.
+
+    Callers that write to the database should work on a copy.
+    """
+    path = os.path.join(CORPUS_DIR, f'sujets_{rows}_s{seed}.db')
+    if not os.path.exists(path):
+        print(f"Generating {rows} sujet corpus (seed {seed})...")
+        create_corpus_db(path, rows, seed=seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    create_corpus_db(args.path, args.rows, seed=args.seed)
+    print(f"Wrote {args.rows} sujets to {args.path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
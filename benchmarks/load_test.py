@@ -0,0 +1,294 @@
+# benchmarks/load_test.py
+"""Concurrent session load driver for the web app.
+
+Starts `gunicorn app:app` (or `flask run` when gunicorn is missing) on a copy of
+a synthetic corpus, then runs simulated users that filter, navigate, long-press
+seek, report views, save, add and delete. Reports latency percentiles,
+throughput and `database is locked` rates per endpoint.
+
+    python -m benchmarks.load_test --concurrency 8 --duration 30 [--workers 2]
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --concurrency 4
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from benchmarks.corpus import PEOPLE, TAGS, cached_corpus_path
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Probability of each action after a sujet is shown
+ACTIONS = [
+    ('next', 0.52),
+    ('prev', 0.14),
+    ('seek', 0.10),
+    ('save', 0.10),
+    ('filter', 0.06),
+    ('add', 0.05),
+    ('delete', 0.03),
+]
+# Same batch size the client uses before flushing views (static/script.js)
+VIEW_BATCH_SIZE = 10
+SEARCH_TERMS = ['coffee', 'idea', 'museum', 'train', 'history']
+
+
+def endpoint_name(method, path):
+    """'GET /get_sujet_by_id' for '/get_sujet_by_id/12?fields=lite', so IDs don't split series."""
+    return f"{method} {path.split('?')[0].rstrip('/0123456789') or '/'}"
+
+
+class Stats:
+    """Thread-safe per-endpoint latency and error tallies."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.locked = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok, locked):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+            if locked:
+                self.locked[endpoint] += 1
+
+    def report(self, elapsed):
+        """Summary dict per endpoint plus an 'ALL' total."""
+        def summarise(samples, errors, locked):
+            samples = sorted(samples)
+
+            def pct(p):
+                return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 2)
+            return {
+                'requests': len(samples),
+                'rps': round(len(samples) / elapsed, 1),
+                'p50_ms': pct(0.50),
+                'p95_ms': pct(0.95),
+                'p99_ms': pct(0.99),
+                'error_rate': round(errors / len(samples), 4),
+                'locked_rate': round(locked / len(samples), 4),
+            }
+
+        with self.lock:
+            result = {endpoint: summarise(samples, self.errors[endpoint], self.locked[endpoint])
+                      for endpoint, samples in sorted(self.latencies.items())}
+            every = [s for samples in self.latencies.values() for s in samples]
+            if every:
+                result['ALL'] = summarise(every, sum(self.errors.values()), sum(self.locked.values()))
+        return result
+
+
+class Session:
+    """One simulated user, driving the same endpoints static/script.js does."""
+
+    def __init__(self, base_url, stats, rng, think_s):
+        self.base_url = base_url
+        self.stats = stats
+        self.rng = rng
+        self.think_s = think_s
+        self.query = ''
+        self.current_id = None
+        self.pending_views = []
+        self.added_ids = []
+
+    def call(self, method, path, body=None):
+        """Sends one request and records it under 'METHOD /route'. Returns the JSON body or None."""
+        endpoint = endpoint_name(method, path)
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                payload = response.read()
+            status = response.status
+        except urllib.error.HTTPError as e:
+            payload = e.read()
+            status = e.code
+        except OSError:
+            payload, status = b'', 0
+        elapsed = time.perf_counter() - start
+        locked = status == 503 or b'database is locked' in payload
+        # A 404 from navigation means "no more sujets", which is a valid answer
+        self.stats.record(endpoint, elapsed, status in (200, 304, 404), locked)
+        try:
+            return json.loads(payload) if payload else None
+        except ValueError:
+            return None
+
+    def show(self, payload):
+        """Takes a {'status': 'ok', 'sujet': ...} response as the sujet now on screen."""
+        sujet = payload.get('sujet') if isinstance(payload, dict) else None
+        if isinstance(sujet, dict) and sujet.get('id'):
+            self.current_id = sujet['id']
+            self.pending_views.append({'id': sujet['id'], 'dwell_ms': 5000})
+            if len(self.pending_views) >= VIEW_BATCH_SIZE:
+                self.call('POST', '/view', {'views': self.pending_views})
+                self.pending_views = []
+
+    def pick_filter(self):
+        parts = []
+        roll = self.rng.random()
+        if roll < 0.4:
+            parts.append('tags=' + ','.join(self.rng.sample(TAGS[:6], self.rng.randint(1, 2))))
+        elif roll < 0.6:
+            parts.append('people=' + self.rng.choice(PEOPLE[:4]))
+        elif roll < 0.7:
+            parts.append('search=' + self.rng.choice(SEARCH_TERMS))
+        self.query = '&'.join(parts)
+        self.call('GET', f'/get_sujets_count?{self.query}')
+        self.show(self.call('GET', f'/first?{self.query}'))
+
+    def step(self):
+        action = self.rng.choices([a for a, _ in ACTIONS], weights=[w for _, w in ACTIONS])[0]
+        if self.current_id is None or action == 'filter':
+            self.pick_filter()
+        elif action in ('next', 'prev'):
+            payload = self.call('GET', f'/adjacent_sujet?id={self.current_id}&direction={action}&{self.query}')
+            if payload and payload.get('status') == 'ok':
+                self.show(payload)
+            else:
+                self.pick_filter()
+        elif action == 'seek':
+            # Long press: a burst of lite seeks with no think time, then a full fetch
+            delta = self.rng.choice([-1, 1]) * self.rng.randint(5, 20)
+            for _ in range(self.rng.randint(3, 8)):
+                payload = self.call('GET', f'/seek?id={self.current_id}&delta={delta}&fields=lite&{self.query}')
+                if payload and payload.get('status') == 'ok':
+                    self.current_id = payload['sujet']['id']
+            self.show(self.call('GET', f'/get_sujet_by_id/{self.current_id}'))
+        elif action == 'save':
+            self.call('POST', '/save_sujet', {'id': self.current_id, 'user_notes': 'load test note',
+                                              'user_tags': self.rng.choice(TAGS), 'person': ''})
+        elif action == 'add':
+            result = self.call('POST', '/add_sujet', {'title': 'Load test sujet'})
+            if result and isinstance(result.get('sujet'), dict):
+                self.added_ids.append(result['sujet']['id'])
+                self.show(result)
+        elif action == 'delete' and self.added_ids:
+            # Only delete what this session added, so the corpus keeps its shape
+            self.call('DELETE', f'/delete_sujet/{self.added_ids.pop()}')
+            self.current_id = None
+        if self.think_s:
+            time.sleep(self.rng.expovariate(1 / self.think_s))
+
+    def run_until(self, deadline):
+        while time.time() < deadline:
+            self.step()
+        if self.pending_views:
+            self.call('POST', '/view', {'views': self.pending_views})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, workers, threads, log_file, app_root=APP_ROOT):
+    """Launches the app on a free port, returns (process, base_url) once it answers.
+
+    `app_root` can point at another checkout (e.g. a git worktree) to run a different build.
+    """
+    port = free_port()
+    env = dict(os.environ, DATABASE_PATH=db_path)
+    if importlib.util.find_spec('gunicorn'):
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(workers), '--threads', str(threads)]
+    else:
+        print("gunicorn not installed, falling back to the single-process Flask server")
+        command = [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port),
+                   '--no-reload', '--with-threads']
+    process = subprocess.Popen(command, cwd=app_root, env=env, stdout=log_file,
+                               stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}, see {log_file.name}")
+        try:
+            # Also applies pending schema migrations before concurrent traffic starts
+            urllib.request.urlopen(base_url + '/get_sujets_count', timeout=5).read()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not answer within 30s, see {log_file.name}")
+
+
+def run_load(base_url, concurrency, duration, think_s, seed):
+    stats = Stats()
+    deadline = time.time() + duration
+    sessions = [Session(base_url, stats, random.Random(seed + i), think_s) for i in range(concurrency)]
+    threads = [threading.Thread(target=session.run_until, args=(deadline,)) for session in sessions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.report(time.perf_counter() - start)
+
+
+def print_report(report):
+    print(f"\n{'endpoint':<26} {'reqs':>7} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'errors':>7} {'locked':>7}")
+    for endpoint, row in report.items():
+        print(f"{endpoint:<26} {row['requests']:>7} {row['rps']:>7} {row['p50_ms']:>8} "
+              f"{row['p95_ms']:>8} {row['p99_ms']:>8} {row['error_rate']:>7.2%} {row['locked_rate']:>7.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='target an already running server instead of starting one')
+    parser.add_argument('--rows', type=int, default=10000, help='corpus size for the local server')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--concurrency', type=int, default=8, help='simultaneous sessions')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--think-ms', type=float, default=100,
+                        help='mean pause between user actions (0 for closed-loop max load)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    process = None
+    workdir = tempfile.mkdtemp(prefix='weave-load-')
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            db_path = os.path.join(workdir, 'sujets.db')
+            shutil.copyfile(cached_corpus_path(args.rows, args.seed), db_path)
+            log_file = open(os.path.join(workdir, 'server.log'), 'w')
+            process, base_url = start_server(db_path, args.workers, args.threads, log_file)
+        print(f"{args.concurrency} sessions against {base_url} for {args.duration}s...")
+        report = run_load(base_url, args.concurrency, args.duration, args.think_ms / 1000, args.seed)
+        print_report(report)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'args': vars(args), 'endpoints': report}, f, indent=2)
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+            log_file.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/replay.py
+"""Replays a recorded traffic trace (see traffic_record.py) against a server.
+
+Requests are re-issued on the trace's own timeline, scaled by --speed (2 = twice
+as fast, 0 = as fast as possible), and latencies are summarised per endpoint.
+Run it against two builds and compare the saved results:
+
+    python -m benchmarks.replay trace.jsonl --db snapshot.db --save main.json
+    python -m benchmarks.replay trace.jsonl --db snapshot.db --app-dir ../weave-branch --save branch.json
+    python -m benchmarks.replay --compare main.json branch.json
+
+The database is copied before each run, since the trace contains writes.
+"""
+
+import argparse
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+from benchmarks.load_test import APP_ROOT, Stats, endpoint_name, print_report, start_server
+
+
+def load_trace(path):
+    """Trace entries in time order; torn or foreign lines are skipped."""
+    entries = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and {'t', 'm', 'p'} <= entry.keys():
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry['t'])
+    return entries
+
+
+def request_for(entry):
+    """(method, path with query string, JSON body or None) for one trace entry."""
+    path = entry['p']
+    if entry.get('q'):
+        path += '?' + urlencode(entry['q'])
+    return entry['m'], path, entry.get('b')
+
+
+def issue(base_url, entry, stats, mismatches):
+    method, path, body = request_for(entry)
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            payload = response.read()
+        status = response.status
+    except urllib.error.HTTPError as e:
+        payload = e.read()
+        status = e.code
+    except OSError:
+        payload, status = b'', 0
+    elapsed = time.perf_counter() - start
+    if 'st' in entry and status != entry['st']:
+        mismatches.append((entry['m'], entry['p'], entry['st'], status))
+    stats.record(endpoint_name(method, path), elapsed, 0 < status < 500,
+                 status == 503 or b'database is locked' in payload)
+
+
+def replay(entries, base_url, speed=1.0, concurrency=16):
+    """Re-issues `entries` on their recorded timeline. Returns (report, run info)."""
+    stats = Stats()
+    mismatches = []
+    lags = []
+    work = queue.Queue(maxsize=concurrency * 4)
+
+    def worker():
+        while True:
+            entry = work.get()
+            if entry is None:
+                return
+            issue(base_url, entry, stats, mismatches)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    t0 = entries[0]['t'] if entries else 0
+    start = time.perf_counter()
+    for entry in entries:
+        if speed > 0:
+            due = (entry['t'] - t0) / speed
+            wait = due - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                # How far behind schedule the driver is running
+                lags.append(-wait)
+        work.put(entry)
+    for _ in threads:
+        work.put(None)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    info = {
+        'requests': len(entries),
+        'elapsed_s': round(elapsed, 2),
+        'trace_span_s': round(entries[-1]['t'] - t0, 2) if entries else 0,
+        'speed': speed,
+        'max_lag_ms': round(max(lags) * 1000, 1) if lags else 0.0,
+        'status_mismatches': len(mismatches),
+    }
+    return stats.report(elapsed), info
+
+
+def compare(old_path, new_path):
+    """Prints per-endpoint latency percentiles of two saved runs side by side."""
+    with open(old_path) as f:
+        old = json.load(f)['endpoints']
+    with open(new_path) as f:
+        new = json.load(f)['endpoints']
+    print(f"{'endpoint':<26} {'p50 old':>9} {'new':>9} {'p95 old':>9} {'new':>9} "
+          f"{'p99 old':>9} {'new':>9} {'p95 x':>6}")
+    for endpoint in sorted(set(old) & set(new)):
+        a, b = old[endpoint], new[endpoint]
+        ratio = b['p95_ms'] / a['p95_ms'] if a['p95_ms'] else float('inf')
+        flag = '  <-- slower' if ratio > 1.2 else ('  faster' if ratio < 0.8 else '')
+        print(f"{endpoint:<26} {a['p50_ms']:>9} {b['p50_ms']:>9} {a['p95_ms']:>9} {b['p95_ms']:>9} "
+              f"{a['p99_ms']:>9} {b['p99_ms']:>9} {ratio:>6.2f}{flag}")
+    for endpoint in sorted(set(old) ^ set(new)):
+        print(f"{endpoint:<26} only in {'old' if endpoint in old else 'new'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace', nargs='?', help='trace file written by TRAFFIC_RECORD_PATH')
+    parser.add_argument('--url', help='replay against a running server')
+    parser.add_argument('--db', help='database snapshot to serve (copied first)')
+    parser.add_argument('--app-dir', default=APP_ROOT, help='checkout to run the server from')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--speed', type=float, default=1.0, help='timeline multiplier, 0 = no pauses')
+    parser.add_argument('--concurrency', type=int, default=16, help='max requests in flight')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not args.trace or not (args.url or args.db):
+        parser.error('a trace and either --url or --db are required')
+
+    entries = load_trace(args.trace)
+    process = None
+    workdir = tempfile.mkdtemp(prefix='weave-replay-')
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            db_path = os.path.join(workdir, 'sujets.db')
+            shutil.copyfile(args.db, db_path)
+            log_file = open(os.path.join(workdir, 'server.log'), 'w')
+            process, base_url = start_server(db_path, args.workers, args.threads, log_file,
+                                             app_root=os.path.abspath(args.app_dir))
+        print(f"Replaying {len(entries)} requests against {base_url} at {args.speed or 'max'}x...")
+        report, info = replay(entries, base_url, args.speed, args.concurrency)
+        print_report(report)
+        print(f"\n{info['elapsed_s']}s for a {info['trace_span_s']}s trace, "
+              f"max lag {info['max_lag_ms']} ms, {info['status_mismatches']} status mismatches")
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump({'args': vars(args), 'run': info, 'endpoints': report}, f, indent=2)
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+            log_file.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+# benchmarks/run_benchmarks.py
+"""Times every db_operations function and Flask route against synthetic corpora.
+
+Results are written as JSON to benchmarks/results/, named after the current
+commit, so runs from different commits can be compared:
+
+    python -m benchmarks.run_benchmarks [--sizes 10000,100000,1000000] [--budget 1.0]
+    python -m benchmarks.run_benchmarks --compare results/old.json results/new.json
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import db_operations
+from app import app
+from benchmarks.corpus import cached_corpus_path
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+# Filter mixes exercised by every filtered function: (label, tags, people, search)
+FILTER_MIXES = [
+    ('none', [], [], None),
+    ('tag', ['AI'], [], None),
+    ('person', [], ['S'], None),
+    ('search', [], [], 'coffee'),
+    ('mixed', ['AI', 'Quote'], ['S', 'MD'], 'idea'),
+]
+
+
+def measure(fn, budget_s, min_runs=3, max_runs=500):
+    """Calls fn repeatedly within a time budget and summarises per-call latency."""
+    samples = []
+    deadline = time.perf_counter() + budget_s
+    # Debug prints in the DB layer are part of the app but not of the measurement's output
+    with contextlib.redirect_stdout(io.StringIO()):
+        while len(samples) < min_runs or (len(samples) < max_runs and time.perf_counter() < deadline):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'runs': len(samples),
+        'median_us': round(statistics.median(samples) * 1e6, 1),
+        'p95_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6, 1),
+        'mean_us': round(statistics.fmean(samples) * 1e6, 1),
+    }
+
+
+def db_cases(rows):
+    """(name, callable) pairs for db_operations, read-only ones first."""
+    mid = rows // 2
+    cases = [
+        ('get_sujet_by_id', lambda: db_operations.get_sujet_by_id(mid)),
+        ('get_random_sujet_from_db', db_operations.get_random_sujet_from_db),
+        ('get_all_unique_tags', db_operations.get_all_unique_tags),
+        ('get_all_unique_people', db_operations.get_all_unique_people),
+        ('get_version_token', db_operations.get_version_token),
+    ]
+    for label, tags, people, search in FILTER_MIXES:
+        cases += [
+            (f'get_sujets_count_by_filter[{label}]',
+             lambda t=tags, p=people, s=search: db_operations.get_sujets_count_by_filter(t, p, s)),
+            (f'get_next_sujet_by_filter[{label}]',
+             lambda t=tags, p=people, s=search: db_operations.get_next_sujet_by_filter(mid // 10, t, p, s)),
+            (f'get_adjacent_sujet[{label}]',
+             lambda t=tags, p=people, s=search: db_operations.get_adjacent_sujet(mid, t, p, 'next', s)),
+            (f'get_first_or_last_sujet_from_db[{label}]',
+             lambda t=tags, p=people, s=search: db_operations.get_first_or_last_sujet_from_db(False, t, p, s)),
+            (f'seek_sujet[{label}]',
+             lambda t=tags, p=people, s=search: db_operations.seek_sujet(mid, 50, t, p, s)),
+        ]
+
+    # Writes go last since they change the corpus; each targets a fresh ID
+    ids = iter(range(1, rows + 1))
+    added = []
+    cases += [
+        ('update_sujet_details',
+         lambda: db_operations.update_sujet_details(next(ids), 'bench notes', 'AI, Work', 'S')),
+        ('update_sujet_status', lambda: db_operations.update_sujet_status(next(ids), 'skipped')),
+        ('update_sujet_title', lambda: db_operations.update_sujet_title(next(ids), 'Bench title')),
+        ('record_views', lambda: db_operations.record_views([next(ids) for _ in range(10)])),
+        ('add_new_sujet', lambda: added.append(db_operations.add_new_sujet('Bench sujet')['id'])),
+        ('delete_sujet_from_db',
+         lambda: db_operations.delete_sujet_from_db(added.pop() if added else next(ids))),
+    ]
+    return cases
+
+
+def route_cases(rows, client):
+    """(name, callable) pairs for every route in app.py."""
+    mid = rows // 2
+    cases = [('GET /', lambda: client.get('/'))]
+    for label, tags, people, search in FILTER_MIXES:
+        query = '&'.join(part for part in [
+            f"tags={','.join(tags)}" if tags else '',
+            f"people={','.join(people)}" if people else '',
+            f"search={search}" if search else ''] if part)
+        cases += [
+            (f'GET /get_sujets_count[{label}]', lambda q=query: client.get(f'/get_sujets_count?{q}')),
+            (f'GET /get_sujet[{label}]', lambda q=query: client.get(f'/get_sujet?offset={mid // 10}&{q}')),
+            (f'GET /adjacent_sujet[{label}]',
+             lambda q=query: client.get(f'/adjacent_sujet?id={mid}&direction=next&{q}')),
+            (f'GET /adjacent_sujet[{label},lite]',
+             lambda q=query: client.get(f'/adjacent_sujet?id={mid}&direction=next&fields=lite&{q}')),
+            (f'GET /first[{label}]', lambda q=query: client.get(f'/first?{q}')),
+            (f'GET /last[{label}]', lambda q=query: client.get(f'/last?{q}')),
+            (f'GET /seek[{label}]', lambda q=query: client.get(f'/seek?id={mid}&delta=50&{q}')),
+            # Without a token /nav/start re-runs the filter; with one it reuses the snapshot
+            (f'GET /nav/start[{label}]', lambda q=query: client.get(f'/nav/start?{q}')),
+            # Streamed, so the body has to be read for the rows to be fetched
+            (f'GET /export[{label}]', lambda q=query: client.get(f'/export?fields=lite&{q}').get_data()),
+        ]
+        token = client.get(f'/nav/start?{query}').get_json()['token']
+        query = f'token={token}&{query}'
+        cases += [
+            (f'GET /nav/start[{label},token]', lambda q=query: client.get(f'/nav/start?{q}')),
+            (f'GET /nav/position[{label}]', lambda q=query: client.get(f'/nav/position?id={mid}&{q}')),
+            (f'GET /nav/next[{label}]', lambda q=query: client.get(f'/nav/next?id={mid}&{q}')),
+            (f'GET /nav/prev[{label},lite]', lambda q=query: client.get(f'/nav/prev?id={mid}&fields=lite&{q}')),
+            (f'GET /nav/seek[{label}]', lambda q=query: client.get(f'/nav/seek?id={mid}&delta=50&{q}')),
+        ]
+
+    cases += [
+        ('GET /get_random_sujet', lambda: client.get('/get_random_sujet')),
+        ('GET /get_first_sujet', lambda: client.get('/get_first_sujet')),
+        ('GET /get_last_sujet', lambda: client.get('/get_last_sujet')),
+        ('GET /export[csv]', lambda: client.get('/export?format=csv').get_data()),
+        ('GET /sw.js', lambda: client.get('/sw.js')),
+        ('GET /metrics', lambda: client.get('/metrics')),
+    ]
+    # /changes: a first sync page, and a client that is 100 changes behind
+    latest = client.get('/changes?since=0&limit=1').get_json()['next']
+    while True:
+        page = client.get(f'/changes?since={latest}').get_json()
+        latest = page['next']
+        if not page['more']:
+            break
+    cases += [
+        ('GET /changes[first page]', lambda: client.get('/changes?since=0')),
+        ('GET /changes[behind 100]', lambda: client.get(f'/changes?since={max(latest - 100, 0)}')),
+    ]
+    # ETag routes: a cold request and a revalidation that should answer 304
+    for url in ['/get_all_tags', '/get_all_people', '/get_sujets_count', f'/get_sujet_by_id/{mid}']:
+        etag = client.get(url).headers.get('ETag')
+        cases += [
+            (f'GET {url}', lambda u=url: client.get(u)),
+            (f'GET {url}[304]', lambda u=url, e=etag: client.get(u, headers={'If-None-Match': e})),
+        ]
+
+    ids = iter(range(rows, 0, -1))
+    keys = itertools.count()
+    added = []
+
+    def add():
+        added.append(client.post('/add_sujet', json={'title': 'Bench sujet'}).get_json()['sujet']['id'])
+
+    cases += [
+        ('POST /view', lambda: client.post('/view', json={
+            'views': [{'id': next(ids), 'dwell_ms': 60000} for _ in range(10)]})),
+        ('POST /save_sujet', lambda: client.post('/save_sujet', json={
+            'id': next(ids), 'user_notes': 'bench', 'user_tags': 'AI', 'person': 'S'})),
+        ('POST /skip_sujet', lambda: client.post('/skip_sujet', json={'id': next(ids)})),
+        ('POST /update_title', lambda: client.post(f'/update_title/{next(ids)}', json={'title': 'Bench'})),
+        ('POST /add_sujet', add),
+        ('POST /mutations', lambda: client.post('/mutations', json={'mutations': [
+            {'key': f'bench-{next(keys)}', 'op': 'skip', 'id': next(ids)} for _ in range(10)]})),
+        # The same keys again: answered from idempotency_keys
+        ('POST /mutations[replay]', lambda: client.post('/mutations', json={'mutations': [
+            {'key': 'bench-0', 'op': 'skip', 'id': rows}]})),
+        ('DELETE /delete_sujet', lambda: client.delete(f'/delete_sujet/{added.pop() if added else next(ids)}')),
+    ]
+    return cases
+
+
+def run_size(rows, seed, budget_s):
+    """Benchmarks one corpus size on a scratch copy, returns {'db': ..., 'routes': ...}."""
+    results = {'db': {}, 'routes': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for section in ('db', 'routes'):
+            # Fresh copy per section so route timings don't see the DB writes' effects
+            db_path = os.path.join(tmp, f'{section}.db')
+            shutil.copyfile(cached_corpus_path(rows, seed), db_path)
+            original_path = db_operations.DATABASE_PATH
+            db_operations.DATABASE_PATH = db_path
+            try:
+                if section == 'db':
+                    with app.test_request_context():
+                        cases = db_cases(rows)
+                        for name, fn in cases:
+                            results['db'][name] = measure(fn, budget_s)
+                else:
+                    client = app.test_client()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        cases = route_cases(rows, client)
+                    for name, fn in cases:
+                        results['routes'][name] = measure(fn, budget_s)
+            finally:
+                db_operations.DATABASE_PATH = original_path
+            for name in results[section]:
+                print(f"  {rows:>8} {section:<6} {name:<58} "
+                      f"{results[section][name]['median_us']:>10.1f} us")
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(old_path, new_path):
+    """Prints median latency change per benchmark between two result files."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['commit']} -> {new['commit']}  (median us, ratio < 1 is faster)")
+    for size, sections in new['sizes'].items():
+        for section, cases in sections.items():
+            for name, stats in cases.items():
+                before = old['sizes'].get(size, {}).get(section, {}).get(name)
+                if not before:
+                    continue
+                ratio = stats['median_us'] / before['median_us'] if before['median_us'] else float('inf')
+                flag = '  <-- slower' if ratio > 1.2 else ('  faster' if ratio < 0.8 else '')
+                print(f"{size:>8} {section:<6} {name:<58} {before['median_us']:>10.1f} "
+                      f"{stats['median_us']:>10.1f} {ratio:6.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated corpus sizes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--budget', type=float, default=1.0,
+                        help='seconds spent per benchmark case')
+    parser.add_argument('--output', help='result file (default: results/<time>_<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = current_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'seed': args.seed,
+        'budget_s': args.budget,
+        'sizes': {},
+    }
+    for rows in [int(size) for size in args.sizes.split(',')]:
+        report['sizes'][str(rows)] = run_size(rows, args.seed, args.budget)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == '__main__':
+    main()
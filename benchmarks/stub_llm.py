@@ -0,0 +1,168 @@
+# benchmarks/stub_llm.py
+"""A local stand-in for the OpenAI chat completions endpoint.
+
+Answers POST /v1/chat/completions after a configurable latency, with a
+deterministic suggestion for the note in the prompt (or, for packed prompts,
+a JSON answer covering every note in the pack). It enforces a
+requests-per-minute limit over a sliding window and answers 429 with
+Retry-After beyond it, like the real API. Used by the enrichment tests and
+benchmarks; point enrichment at it with OPENAI_BASE_URL or a transport.
+
+    python -m benchmarks.stub_llm --port 8089 --rpm 600 --latency 0.2
+"""
+
+import argparse
+import collections
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INPUT_RE = re.compile(r'Input: "(.*)"')
+PACKED_MARKER = 'Notes (JSON):'
+
+
+def suggestion_for(text):
+    """The stub's canned answer for one note."""
+    return f"Clarification of '{text}'. Tags: Observation, Stub"
+
+
+def count_tokens(text):
+    return len(text) // 4 + 1
+
+
+class StubLLMServer:
+    """Threaded stub server. Use as a context manager; `base_url` is set once started."""
+
+    def __init__(self, latency=0.05, rpm=None, retry_after=1.0, fail_every=0, window=60.0,
+                 drop_every=0, host='127.0.0.1', port=0):
+        self.latency = latency
+        # At most `rpm` requests per `window` seconds (a shorter window keeps tests fast)
+        self.rpm = rpm
+        self.window = window
+        self.retry_after = retry_after
+        # Every n-th request answers 500 (0 = never)
+        self.fail_every = fail_every
+        # In packed answers, every n-th note is left out (0 = never)
+        self.drop_every = drop_every
+        self.stats = collections.Counter()
+        self._window = collections.deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self.base_url = f'http://{host}:{self._server.server_address[1]}/v1'
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_window(self):
+        """Forgets recent requests, so the next run starts with the full limit."""
+        with self._lock:
+            self._window.clear()
+
+    def admit(self):
+        """Counts a request against the sliding window: 'ok', 'limited' (429) or 'error' (500)."""
+        now = time.monotonic()
+        with self._lock:
+            self.stats['requests'] += 1
+            if self.fail_every and self.stats['requests'] % self.fail_every == 0:
+                self.stats['errors'] += 1
+                return 'error'
+            if self.rpm:
+                while self._window and now - self._window[0] > self.window:
+                    self._window.popleft()
+                if len(self._window) >= self.rpm:
+                    self.stats['rate_limited'] += 1
+                    return 'limited'
+                self._window.append(now)
+            return 'ok'
+
+    def answer(self, payload):
+        """The completion content for a chat payload."""
+        prompt = payload['messages'][-1]['content']
+        if PACKED_MARKER in prompt:
+            notes = json.loads(prompt.rsplit(PACKED_MARKER, 1)[1])
+            results = []
+            for note in notes:
+                with self._lock:
+                    self.stats['notes'] += 1
+                    dropped = self.drop_every and self.stats['notes'] % self.drop_every == 0
+                if dropped:
+                    self.stats['dropped'] += 1
+                else:
+                    results.append({'id': note['id'], 'suggestion': suggestion_for(note['text'])})
+            return json.dumps({'results': results})
+        found = INPUT_RE.findall(prompt)
+        return suggestion_for(found[-1] if found else prompt.strip())
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=()):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                verdict = stub.admit()
+                if verdict == 'limited':
+                    self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                               [('Retry-After', str(stub.retry_after))])
+                    return
+                if verdict == 'error':
+                    self._send(500, {'error': {'message': 'Stub server error'}})
+                    return
+                time.sleep(stub.latency)
+                content = stub.answer(payload)
+                prompt_tokens = sum(count_tokens(m['content']) for m in payload['messages'])
+                completion_tokens = count_tokens(content)
+                with stub._lock:
+                    stub.stats['completed'] += 1
+                    stub.stats['prompt_tokens'] += prompt_tokens
+                    stub.stats['completion_tokens'] += completion_tokens
+                self._send(200, {
+                    'id': 'stub', 'object': 'chat.completion', 'model': payload.get('model'),
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': content}}],
+                    'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                              'total_tokens': prompt_tokens + completion_tokens},
+                })
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per completion')
+    parser.add_argument('--rpm', type=int, default=None, help='requests per minute before 429s')
+    args = parser.parse_args()
+    with StubLLMServer(latency=args.latency, rpm=args.rpm, port=args.port) as stub:
+        print(f"Stub LLM at {stub.base_url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+# compression.py
+"""Response compression for JSON routes and precompressed static assets."""
+
+import gzip
+import mimetypes
+import os
+import zlib
+
+import click
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip alone covers every browser
+    brotli = None
+
+# --- Configuration ---
+# Bodies smaller than this go out as-is: headers and CPU would outweigh the saving
+MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 512))
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+# Quality 4-5 is the usual sweet spot for on-the-fly brotli; static files get 11
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+STATIC_BROTLI_QUALITY = 11
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'application/manifest+json',
+    'application/x-ndjson',
+    'image/svg+xml',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+}
+STATIC_EXTENSIONS = ('.js', '.css', '.html', '.json', '.svg', '.txt')
+# Suffix appended to a precompressed static file, per content-coding
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings():
+    """Content-codings this process can produce, in order of preference."""
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+
+def choose_encoding(candidates=None):
+    """Picks the best content-coding the current request accepts, or None."""
+    for encoding in candidates or available_encodings():
+        if request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def representation_etags(etag):
+    """All ETags a client may hold for `etag`, one per content-coding we emit."""
+    return [etag] + [f'{etag}-{encoding}' for encoding in ENCODING_SUFFIXES]
+
+
+def compress_body(data, encoding, static=False):
+    """Compresses a complete body in one call."""
+    if encoding == 'br':
+        quality = STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY
+        return brotli.compress(data, quality=quality)
+    # mtime=0 keeps the output deterministic, which matters for static builds
+    return gzip.compress(data, compresslevel=9 if static else GZIP_LEVEL, mtime=0)
+
+
+def stream_compress(chunks, encoding):
+    """Compresses an iterable of chunks lazily, flushing after each one.
+
+    Flushing keeps streamed responses (e.g. exports) arriving incrementally at
+    the cost of a slightly worse ratio than compressing the whole body.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        # wbits=31 selects the gzip container
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def compress_response(response):
+    """after_request hook: compresses eligible dynamic responses."""
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.direct_passthrough):
+        # direct_passthrough means send_file; static assets are precompressed instead
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = stream_compress(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(compress_body(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    # Strong ETags must differ between representations of the same resource
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+
+def send_static(filename):
+    """Replacement for Flask's static view that prefers precompressed variants."""
+    static_folder = current_app.static_folder
+    source_path = safe_join(static_folder, filename)
+    if source_path and os.path.isfile(source_path):
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            if request.accept_encodings.quality(encoding) <= 0:
+                continue
+            variant_path = safe_join(static_folder, filename + suffix)
+            # A stale variant (older than its source) is ignored, never served
+            if (variant_path and os.path.isfile(variant_path)
+                    and os.path.getmtime(variant_path) >= os.path.getmtime(source_path)):
+                response = send_from_directory(
+                    static_folder, filename + suffix,
+                    mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                    max_age=current_app.get_send_file_max_age(filename))
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+    return current_app.send_static_file(filename)
+
+
+def precompress_static(static_folder):
+    """Writes .gz (and .br when available) siblings for compressible static files.
+
+    Returns:
+        list: (path, original_size, {encoding: compressed_size}) for each file written.
+    """
+    written = []
+    for root, _dirs, files in os.walk(static_folder):
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            sizes = {}
+            for encoding in available_encodings():
+                compressed = compress_body(data, encoding, static=True)
+                # Not worth serving a variant that doesn't save anything
+                if len(compressed) >= len(data):
+                    continue
+                with open(path + ENCODING_SUFFIXES[encoding], 'wb') as f:
+                    f.write(compressed)
+                sizes[encoding] = len(compressed)
+            written.append((path, len(data), sizes))
+    return written
+
+# --- CLI Commands ---
+
+
+@click.command('compress-static')
+def compress_static_command():
+    """Precompresses static assets so they are served without per-request CPU."""
+    for path, size, sizes in precompress_static(current_app.static_folder):
+        summary = ', '.join(f"{enc} {n} B" for enc, n in sizes.items()) or 'skipped'
+        print(f"{os.path.relpath(path, current_app.static_folder)}: {size} B -> {summary}")
+
+# --- Registration Functions ---
+
+
+def register_compression(app):
+    """Installs dynamic compression, the precompressed static view and its CLI command."""
+    app.after_request(compress_response)
+    app.view_functions['static'] = send_static
+    app.cli.add_command(compress_static_command)
@@ -1,12 +1,17 @@
 # db_operations.py
 import sqlite3
 import os
-import pandas as pd
 import click
+import contextlib
+import json
 import sys
 from flask import g
+from flask.cli import with_appcontext
 from datetime import datetime
 
+import metrics
+from serialization import Sujet, SUJET_COLUMNS, stdlib_dumps
+
 # --- Constants ---
 APP_ROOT = os.path.dirname(os.path.abspath(__file__))
 # Allow deployment platforms to override DB location via env var (e.g., /var/data/sujets.db on Render)
@@ -20,13 +25,20 @@ INITIAL_CSV_PATH = os.path.join(APP_ROOT, 'initial_sujets.csv')
 def get_db():
     """Connects to the specific database or returns the existing connection."""
     print(f"[DEBUG] Connecting to database at: {DATABASE_PATH}")
+    if 'replica_db' in g:
+        # Set by replication.route_reads for read-only routes
+        return g.replica_db
     if 'db' not in g:
         os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
         g.db = sqlite3.connect(
             DATABASE_PATH,
-            detect_types=sqlite3.PARSE_DECLTYPES
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            factory=metrics.InstrumentedConnection if _active_budgets else metrics.connection_class()
         )
         g.db.row_factory = sqlite3.Row
+        ensure_schema(g.db)
+        if _active_budgets:
+            g.db.statement_listener = _count_statement
     return g.db
 
 
@@ -37,14 +49,273 @@ def close_connection(exception):
         db.close()
 
 
-def get_sujet_by_id(sujet_id):
+# --- Statement Budgets ---
+
+# Budgets currently being measured. Only tests and debugging open these, so
+# production connections never carry a statement listener.
+_active_budgets = []
+
+
+class StatementBudgetExceeded(AssertionError):
+    """Raised when a block issues more SQL statements than its budget allows."""
+
+
+def _count_statement(sql):
+    for budget in _active_budgets:
+        budget.statements.append(sql)
+
+
+class statement_budget(contextlib.ContextDecorator):
+    """Counts the SQL statements issued inside the block and fails if there are too many.
+
+    Counts execute()/executemany() calls, i.e. round trips to SQLite; statements
+    run by triggers are not counted. Only connections opened inside the block are
+    counted (each request opens its own), and schema checks on first connect are
+    excluded. Usable as a decorator.
+
+        with statement_budget(1):
+            client.delete('/delete_sujet/3')
+    """
+
+    def __init__(self, limit, label='block'):
+        self.limit = limit
+        self.label = label
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        self.statements = []
+        _active_budgets.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active_budgets.remove(self)
+        if exc_type is None and self.count > self.limit:
+            listing = '\n'.join(f'  {i + 1}. {" ".join(sql.split())}' for i, sql in enumerate(self.statements))
+            raise StatementBudgetExceeded(
+                f"{self.label} issued {self.count} statements, budget is {self.limit}:\n{listing}")
+        return False
+
+
+# --- Schema Maintenance ---
+
+# The sujets table itself is created by `flask init-db`; these migrations only
+# layer bookkeeping on top of it. Each entry is applied once, tracked through
+# PRAGMA user_version. Append new entries, never edit old ones.
+SCHEMA_MIGRATIONS = [
+    (1, [
+        # Change counters used for ETags. 'content_version' moves on any edit that
+        # affects what a user sees in lists and counts, 'data_version' on any change
+        # at all (including view counts). 'epoch' keeps tokens unique per DB file.
+        "CREATE TABLE IF NOT EXISTS sujets_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)",
+        "INSERT OR IGNORE INTO sujets_meta (key, value) VALUES ('data_version', 0), ('content_version', 0)",
+        "INSERT OR IGNORE INTO sujets_meta (key, value) VALUES ('epoch', abs(random() % 4294967296))",
+        """CREATE TRIGGER IF NOT EXISTS sujets_version_insert AFTER INSERT ON sujets BEGIN
+               UPDATE sujets_meta SET value = value + 1 WHERE key IN ('data_version', 'content_version');
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS sujets_version_delete AFTER DELETE ON sujets BEGIN
+               UPDATE sujets_meta SET value = value + 1 WHERE key IN ('data_version', 'content_version');
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS sujets_version_content
+           AFTER UPDATE OF id, original_sujet, ai_suggestion, user_notes, user_tags, status, person, date_created ON sujets BEGIN
+               UPDATE sujets_meta SET value = value + 1 WHERE key IN ('data_version', 'content_version');
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS sujets_version_views AFTER UPDATE OF view_count ON sujets BEGIN
+               UPDATE sujets_meta SET value = value + 1 WHERE key = 'data_version';
+           END""",
+    ]),
+    (2, [
+        # Change tracking for /changes. Every insert, update and delete takes the
+        # next value of the 'row_version' counter: live rows keep it in
+        # sujets.rowversion, deleted ones leave a tombstone. Clients that synced
+        # before 'sync_floor' may have missed tombstones and must resync from 0.
+        # Runs outside the migration's transaction (see add_column), hence the check
+        lambda db: add_column(db, 'sujets', 'rowversion', "INTEGER NOT NULL DEFAULT 0"),
+        "CREATE TABLE IF NOT EXISTS sujets_tombstones (rowversion INTEGER PRIMARY KEY, id INTEGER NOT NULL,"
+        " deleted_at TEXT NOT NULL DEFAULT (datetime('now')))",
+        # Re-running after `flask init-db`: the old versions mean nothing any more
+        """INSERT OR REPLACE INTO sujets_meta (key, value)
+           SELECT 'sync_floor', COALESCE((SELECT value + 1 FROM sujets_meta WHERE key = 'row_version'), 0)""",
+        "DELETE FROM sujets_tombstones",
+        # Existing rows get distinct versions, so paging through them by version
+        # works, and all above the floor, so a client resyncing after
+        # `flask init-db` ends up with a cursor the floor check accepts
+        "UPDATE sujets SET rowversion = (SELECT value FROM sujets_meta WHERE key = 'sync_floor') + rowid",
+        """INSERT OR REPLACE INTO sujets_meta (key, value)
+           SELECT 'row_version', MAX(COALESCE((SELECT value FROM sujets_meta WHERE key = 'row_version'), 0),
+                                     COALESCE((SELECT MAX(rowversion) FROM sujets), 0))""",
+        "CREATE INDEX IF NOT EXISTS ix_sujets_rowversion ON sujets (rowversion)",
+        """CREATE TRIGGER IF NOT EXISTS sujets_rowversion_insert AFTER INSERT ON sujets BEGIN
+               UPDATE sujets_meta SET value = value + 1 WHERE key = 'row_version';
+               UPDATE sujets SET rowversion = (SELECT value FROM sujets_meta WHERE key = 'row_version')
+               WHERE rowid = NEW.rowid;
+           END""",
+        # Lists every column but rowversion, so its own UPDATE doesn't fire it again
+        """CREATE TRIGGER IF NOT EXISTS sujets_rowversion_update
+           AFTER UPDATE OF id, original_sujet, ai_suggestion, view_count, user_notes, user_tags, status, person, date_created
+           ON sujets BEGIN
+               UPDATE sujets_meta SET value = value + 1 WHERE key = 'row_version';
+               UPDATE sujets SET rowversion = (SELECT value FROM sujets_meta WHERE key = 'row_version')
+               WHERE rowid = NEW.rowid;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS sujets_rowversion_delete AFTER DELETE ON sujets BEGIN
+               UPDATE sujets_meta SET value = value + 1 WHERE key = 'row_version';
+               INSERT INTO sujets_tombstones (rowversion, id)
+               SELECT value, OLD.id FROM sujets_meta WHERE key = 'row_version';
+           END""",
+    ]),
+    (3, [
+        # Responses of applied /mutations entries, so a replayed key isn't applied twice
+        "CREATE TABLE IF NOT EXISTS idempotency_keys (key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+        " created_at TEXT NOT NULL DEFAULT (datetime('now')))",
+    ]),
+    (4, [
+        # Tags parsed out of ai_suggestion by the enrichment sink (enrichment_sink.py)
+        lambda db: add_column(db, 'sujets', 'ai_tags', "TEXT NOT NULL DEFAULT ''"),
+        # The update triggers list their columns, so they are recreated to include it
+        "DROP TRIGGER IF EXISTS sujets_version_content",
+        """CREATE TRIGGER sujets_version_content
+           AFTER UPDATE OF id, original_sujet, ai_suggestion, ai_tags, user_notes, user_tags, status, person,
+                           date_created ON sujets BEGIN
+               UPDATE sujets_meta SET value = value + 1 WHERE key IN ('data_version', 'content_version');
+           END""",
+        "DROP TRIGGER IF EXISTS sujets_rowversion_update",
+        """CREATE TRIGGER sujets_rowversion_update
+           AFTER UPDATE OF id, original_sujet, ai_suggestion, ai_tags, view_count, user_notes, user_tags, status,
+                           person, date_created
+           ON sujets BEGIN
+               UPDATE sujets_meta SET value = value + 1 WHERE key = 'row_version';
+               UPDATE sujets SET rowversion = (SELECT value FROM sujets_meta WHERE key = 'row_version')
+               WHERE rowid = NEW.rowid;
+           END""",
+    ]),
+    (5, [
+        # Enrichment work queue (enrichment_queue.py): one job per sujet,
+        # pending -> leased -> done, or failed after too many attempts
+        "CREATE TABLE IF NOT EXISTS enrichment_jobs (sujet_id INTEGER PRIMARY KEY,"
+        " state TEXT NOT NULL DEFAULT 'pending', lease_owner TEXT, lease_expires_at REAL,"
+        " attempts INTEGER NOT NULL DEFAULT 0, error TEXT, updated_at REAL)",
+        "CREATE INDEX IF NOT EXISTS ix_enrichment_jobs_state ON enrichment_jobs (state, sujet_id)",
+    ]),
+]
+
+
+def add_column(db, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN that is a no-op if the column exists.
+
+    sqlite3 only opens a transaction before DML, so an ALTER that starts a
+    migration commits on its own; if the migration then fails, the re-run
+    must not trip over the column it already added.
+    """
+    columns = [row[1] for row in db.execute(f'PRAGMA table_info({table})')]
+    if column not in columns:
+        db.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+# Database paths whose schema has already been checked by this process
+_schema_ready = set()
+
+
+def ensure_schema(db, path=None):
+    """Applies any pending SCHEMA_MIGRATIONS. Cheap after the first call per process.
+
+    `path` names the database `db` is connected to, DATABASE_PATH by default.
+    """
+    path = path or DATABASE_PATH
+    if path in _schema_ready:
+        return
+    has_sujets = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sujets'").fetchone()
+    if not has_sujets:
+        # Nothing to attach to yet; `flask init-db` will call us again.
+        return
+    current_version = db.execute('PRAGMA user_version').fetchone()[0]
+    for version, statements in SCHEMA_MIGRATIONS:
+        if version <= current_version:
+            continue
+        for statement in statements:
+            # Steps that need to look before they leap are callables
+            if callable(statement):
+                statement(db)
+            else:
+                db.execute(statement)
+        db.execute(f'PRAGMA user_version = {version}')
+        print(f"[SCHEMA] Applied migration {version} to {path}")
+    db.commit()
+    _schema_ready.add(path)
+
+
+def get_version_token(kind='content'):
+    """Returns an opaque token that changes whenever the sujets table changes.
+
+    Args:
+        kind: 'content' ignores view count bumps, 'data' includes them.
+
+    Returns:
+        str like 'a1b2c3.42', or None if the schema is not initialized yet.
+    """
+    db = get_db()
+    try:
+        rows = db.execute(
+            "SELECT key, value FROM sujets_meta WHERE key IN ('epoch', ?)",
+            (f'{kind}_version',)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    values = {row['key']: row['value'] for row in rows}
+    if 'epoch' not in values or f'{kind}_version' not in values:
+        return None
+    return f"{values['epoch']:x}.{values[f'{kind}_version']}"
+
+
+# --- Field Projection ---
+
+# Named column sets accepted by ?fields=. 'lite' is what fast navigation needs
+# to render a title; the long notes and suggestion columns are skipped.
+FIELD_PRESETS = {
+    'all': SUJET_COLUMNS,
+    'lite': ('id', 'original_sujet'),
+}
+
+
+class UnknownFieldError(ValueError):
+    """Raised when ?fields= names a column or preset that doesn't exist."""
+
+
+def parse_fields(fields_str):
+    """Turns a ?fields= value into a tuple of columns, or None for all columns.
+
+    Accepts a preset name ('lite') or a comma-separated list of column names.
+    'id' is always included since the client navigates by it.
+    """
+    if not fields_str or not fields_str.strip():
+        return None
+    fields_str = fields_str.strip()
+    if fields_str in FIELD_PRESETS:
+        return FIELD_PRESETS[fields_str]
+    names = [name.strip() for name in fields_str.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SUJET_COLUMNS]
+    if unknown:
+        raise UnknownFieldError(f"Unknown field(s): {', '.join(unknown)}")
+    # Keep canonical column order so equal projections produce equal SQL
+    return tuple(column for column in SUJET_COLUMNS if column == 'id' or column in names)
+
+
+def select_columns(fields=None):
+    """SQL column list for a projection returned by parse_fields."""
+    return ', '.join(fields or SUJET_COLUMNS)
+
+
+def get_sujet_by_id(sujet_id, fields=None):
     """Fetches a single sujet by its ID from the database."""
     db = get_db()
     sujet_data = db.execute(
-        'SELECT id, original_sujet, ai_suggestion, user_notes, user_tags, status, view_count, person, date_created FROM sujets WHERE id = ?',
+        f"SELECT {select_columns(fields)} FROM sujets WHERE id = ?",
         (sujet_id,)
     ).fetchone()
-    return sujet_data
+    return Sujet.from_row(sujet_data)
 
 
 def build_sujet_query(filters=None):
@@ -57,7 +328,7 @@ def build_sujet_query(filters=None):
     where_clauses = []
 
     columns_to_select = "COUNT(*) as count" if filters.get(
-        'select_count') else "id, original_sujet, ai_suggestion, view_count, user_notes, user_tags, status, person, date_created"
+        'select_count') else select_columns(filters.get('fields'))
     base_query = base_query.format(columns=columns_to_select)
 
     tags = filters.get('tags', [])
@@ -108,30 +379,22 @@ def build_sujet_query(filters=None):
 # --- Data Access Functions for App ---
 
 
-def get_next_sujet_by_filter(offset, tags, people, search=None):
-    """Fetches the next sujet based on filters and increments its view count."""
+def get_next_sujet_by_filter(offset, tags, people, search=None, fields=None):
+    """Fetches the sujet at `offset` in the filtered order. Read-only."""
     db = get_db()
     filters = {
         'tags': tags,
         'people': people,
         'search': search,
-        'sort_by': 'id'
+        'sort_by': 'id',
+        'fields': fields
     }
     query, params = build_sujet_query(filters)
 
     query += " LIMIT 1 OFFSET ?"
     params.append(offset)
 
-    sujet = db.execute(query, params).fetchone()
-
-    if sujet:
-        db.execute(
-            'UPDATE sujets SET view_count = view_count + 1 WHERE id = ?', (sujet['id'],))
-        db.commit()
-        # Re-fetch to get updated view count
-        return get_sujet_by_id(sujet['id'])
-
-    return None
+    return Sujet.from_row(db.execute(query, params).fetchone())
 
 
 def get_sujets_count_by_filter(tags, people, search=None):
@@ -149,24 +412,21 @@ def get_sujets_count_by_filter(tags, people, search=None):
     return count_result['count'] if count_result else 0
 
 
-def get_random_sujet_from_db():
-    """Fetches a random sujet and increments its view count."""
+def get_random_sujet_from_db(fields=None):
+    """Fetches a random sujet. Read-only."""
     db = get_db()
-    # Query for any random sujet, not just those needing enrichment
-    query = "SELECT id, original_sujet, ai_suggestion, view_count, user_notes, user_tags, status, person, date_created FROM sujets ORDER BY RANDOM() LIMIT 1"
+    # Query for any random sujet, not just those needing enrichment.
+    # Sorting bare IDs is much cheaper than sorting whole rows.
+    query = "SELECT id FROM sujets ORDER BY RANDOM() LIMIT 1"
     sujet = db.execute(query).fetchone()
 
     if sujet:
-        db.execute(
-            'UPDATE sujets SET view_count = view_count + 1 WHERE id = ?', (sujet['id'],))
-        db.commit()
-        # Re-fetch to get updated view count
-        return get_sujet_by_id(sujet['id'])
+        return get_sujet_by_id(sujet['id'], fields)
 
     return None
 
 
-def get_first_or_last_sujet_from_db(first=True, tags=None, people=None, search=None):
+def get_first_or_last_sujet_from_db(first=True, tags=None, people=None, search=None, fields=None):
     """Fetches the first or last sujet from the database.
 
     Args:
@@ -174,11 +434,13 @@ def get_first_or_last_sujet_from_db(first=True, tags=None, people=None, search=N
         tags: Tag filters
         people: People filters
         search: Search term filter
+        fields: Columns to return (see parse_fields), None for all
     """
     db = get_db()
 
     # Build query with filters
-    filters = {'tags': tags or [], 'people': people or [], 'search': search}
+    filters = {'tags': tags or [], 'people': people or [],
+               'search': search, 'fields': fields}
     base_query, params = build_sujet_query(filters)
 
     # Remove existing ORDER BY clause if present
@@ -199,44 +461,63 @@ def get_first_or_last_sujet_from_db(first=True, tags=None, people=None, search=N
     print(
         f"[FIRST/LAST DEBUG] Getting {'first' if first else 'last'} sujet, query: {base_query}")
 
-    # Execute query and update view count
-    sujet = db.execute(base_query, params).fetchone()
+    return Sujet.from_row(db.execute(base_query, params).fetchone())
 
-    if sujet:
-        db.execute(
-            'UPDATE sujets SET view_count = view_count + 1 WHERE id = ?', (sujet['id'],))
-        db.commit()
-        # Re-fetch to get the updated view count
-        return get_sujet_by_id(sujet['id'])
 
-    return None
+def record_views(views):
+    """Adds viewed sujets to their view counts in a single transaction.
+
+    Args:
+        views: iterable of sujet IDs; an ID listed twice counts twice
+
+    Returns:
+        int: number of sujets whose count changed
+    """
+    counts = {}
+    for sujet_id in views:
+        counts[sujet_id] = counts.get(sujet_id, 0) + 1
+    if not counts:
+        return 0
+    db = get_db()
+    cursor = db.executemany(
+        'UPDATE sujets SET view_count = view_count + ? WHERE id = ?',
+        [(count, sujet_id) for sujet_id, count in counts.items()])
+    db.commit()
+    return cursor.rowcount
 
 
-def update_sujet_status(sujet_id, status):
-    """Updates the status of a sujet (e.g., 'skipped')."""
+def update_sujet_status(sujet_id, status, commit=True):
+    """Updates the status of a sujet (e.g., 'skipped'). Returns True if it exists."""
     db = get_db()
-    db.execute(
+    cursor = db.execute(
         'UPDATE sujets SET status = ? WHERE id = ?',
         (status, sujet_id)
     )
-    db.commit()
+    if commit:
+        db.commit()
+    return cursor.rowcount > 0
 
 
-def update_sujet_details(sujet_id, user_notes, user_tags, person):
-    """Updates the user-provided details of a sujet without changing its status."""
+def update_sujet_details(sujet_id, user_notes, user_tags, person, commit=True):
+    """Updates the user-provided details of a sujet without changing its status.
+    Returns True if it exists."""
     db = get_db()
-    db.execute(
+    cursor = db.execute(
         'UPDATE sujets SET user_notes = ?, user_tags = ?, person = ? WHERE id = ?',
         (user_notes, user_tags, person, sujet_id)
     )
-    db.commit()
+    if commit:
+        db.commit()
+    return cursor.rowcount > 0
 
 
-def delete_sujet_from_db(sujet_id):
-    """Deletes a sujet from the database by its ID."""
+def delete_sujet_from_db(sujet_id, commit=True):
+    """Deletes a sujet from the database by its ID. Returns True if it existed."""
     db = get_db()
-    db.execute('DELETE FROM sujets WHERE id = ?', (sujet_id,))
-    db.commit()
+    cursor = db.execute('DELETE FROM sujets WHERE id = ?', (sujet_id,))
+    if commit:
+        db.commit()
+    return cursor.rowcount > 0
 
 
 def get_all_unique_tags():
@@ -260,7 +541,7 @@ def get_all_unique_people():
     return sorted(people)
 
 
-def get_adjacent_sujet(sujet_id, tags, people, direction, search=None):
+def get_adjacent_sujet(sujet_id, tags, people, direction, search=None, fields=None):
     """
     Fetches the sujet immediately before or after the given ID in chronological order.
 
@@ -270,6 +551,7 @@ def get_adjacent_sujet(sujet_id, tags, people, direction, search=None):
         people: List of people filters  
         direction: 'next' or 'prev'
         search: Search term filter
+        fields: Columns to return (see parse_fields), None for all
 
     Returns:
         The adjacent sujet or None if not found
@@ -284,9 +566,9 @@ def get_adjacent_sujet(sujet_id, tags, people, direction, search=None):
         print(f"[ADJACENT DEBUG] No filters provided, doing simple ID-based lookup")
 
         if direction == 'next':
-            query = "SELECT id, original_sujet, ai_suggestion, view_count, user_notes, user_tags, status, person, date_created FROM sujets WHERE id > ? ORDER BY id ASC LIMIT 1"
+            query = f"SELECT {select_columns(fields)} FROM sujets WHERE id > ? ORDER BY id ASC LIMIT 1"
         else:  # prev
-            query = "SELECT id, original_sujet, ai_suggestion, view_count, user_notes, user_tags, status, person, date_created FROM sujets WHERE id < ? ORDER BY id DESC LIMIT 1"
+            query = f"SELECT {select_columns(fields)} FROM sujets WHERE id < ? ORDER BY id DESC LIMIT 1"
 
         print(f"[ADJACENT DEBUG] Simple query: {query}")
         print(f"[ADJACENT DEBUG] Simple params: [{sujet_id}]")
@@ -295,12 +577,8 @@ def get_adjacent_sujet(sujet_id, tags, people, direction, search=None):
 
         if sujet:
             print(
-                f"[ADJACENT DEBUG] Found simple adjacent sujet: {sujet['id']} - {sujet['original_sujet']}")
-            # Increment view count
-            db.execute(
-                'UPDATE sujets SET view_count = view_count + 1 WHERE id = ?', (sujet['id'],))
-            db.commit()
-            return dict(sujet)
+                f"[ADJACENT DEBUG] Found simple adjacent sujet: {sujet['id']}")
+            return Sujet.from_row(sujet)
         else:
             print(f"[ADJACENT DEBUG] No simple adjacent sujet found")
             return None
@@ -309,7 +587,7 @@ def get_adjacent_sujet(sujet_id, tags, people, direction, search=None):
     print(f"[ADJACENT DEBUG] Filters provided, using complex query logic")
 
     # Get the current sujet's ID for comparison (ID is more reliable than dates)
-    current_sujet = get_sujet_by_id(sujet_id)
+    current_sujet = get_sujet_by_id(sujet_id, fields=('id',))
     if not current_sujet:
         print(f"[ADJACENT DEBUG] Current sujet {sujet_id} not found!")
         return None
@@ -318,7 +596,8 @@ def get_adjacent_sujet(sujet_id, tags, people, direction, search=None):
     filters = {
         'tags': tags,
         'people': people,
-        'search': search
+        'search': search,
+        'fields': fields
     }
     base_query, params = build_sujet_query(filters)
     print(f"[ADJACENT DEBUG] Base query before modification: {base_query}")
@@ -360,13 +639,8 @@ def get_adjacent_sujet(sujet_id, tags, people, direction, search=None):
 
     if sujet:
         print(
-            f"[ADJACENT DEBUG] Found adjacent sujet: {sujet['id']} - {sujet['original_sujet']}")
-        # Increment view count
-        db.execute(
-            'UPDATE sujets SET view_count = view_count + 1 WHERE id = ?', (sujet['id'],))
-        db.commit()
-        # Re-fetch to get updated view count
-        return get_sujet_by_id(sujet['id'])
+            f"[ADJACENT DEBUG] Found adjacent sujet: {sujet['id']}")
+        return Sujet.from_row(sujet)
     else:
         print(f"[ADJACENT DEBUG] No adjacent sujet found")
         return None
@@ -374,7 +648,156 @@ def get_adjacent_sujet(sujet_id, tags, people, direction, search=None):
     return None
 
 
-def update_sujet_title(sujet_id, new_title):
+def seek_sujet(sujet_id, delta, tags, people, search=None, fields=None):
+    """
+    Jumps `delta` positions from the given ID in the filtered chronological order.
+
+    Clamps at the ends of the result set: seeking +50 with only 12 matches left
+    lands on the last one. Meant for fast navigation, so no view is counted.
+
+    Args:
+        sujet_id: The current sujet ID (it doesn't have to match the filters)
+        delta: Positions to move; positive = forward in time, negative = backward
+        tags, people, search: Same filters as get_adjacent_sujet
+        fields: Columns to return (see parse_fields), None for all
+
+    Returns:
+        (sujet, moved) where moved is the number of positions actually skipped,
+        or (None, 0) if there is nothing in that direction.
+    """
+    db = get_db()
+    filters = {
+        'tags': tags,
+        'people': people,
+        'search': search,
+        'fields': ('id',)
+    }
+    if delta == 0:
+        sujet = get_sujet_by_id(sujet_id, fields)
+        return sujet, 0
+
+    steps_query, params = build_sujet_query(filters)
+    if 'ORDER BY' in steps_query:
+        steps_query = steps_query.split('ORDER BY')[0].strip()
+    if delta > 0:
+        id_compare, order, reverse = "id > ?", "ASC", "DESC"
+    else:
+        id_compare, order, reverse = "id < ?", "DESC", "ASC"
+    steps_query += (" AND " if 'WHERE' in steps_query else " WHERE ") + id_compare
+    steps_query += f" ORDER BY id {order} LIMIT ?"
+    params.extend([sujet_id, abs(delta)])
+
+    # One statement: walk at most |delta| matching IDs, keep the farthest one
+    # and how many were walked, then fetch that row's columns.
+    query = f"""
+        SELECT {select_columns(fields)}, moved FROM sujets
+        JOIN (
+            SELECT id AS target_id, COUNT(*) OVER () AS moved
+            FROM ({steps_query}) ORDER BY id {reverse} LIMIT 1
+        ) ON id = target_id
+        LIMIT 1"""
+    row = db.execute(query, params).fetchone()
+    if not row:
+        return None, 0
+    moved = row['moved']
+    sujet = Sujet(**{column: row[column] for column in (fields or SUJET_COLUMNS)})
+    return sujet, moved
+
+
+def get_filtered_ids(tags, people, search=None):
+    """All IDs matching the filters, in navigation order (ascending ID).
+
+    Used to materialise navigation sessions (see nav_sessions.py).
+    """
+    db = get_db()
+    filters = {
+        'tags': tags,
+        'people': people,
+        'search': search,
+        'fields': ('id',)
+    }
+    query, params = build_sujet_query(filters)
+    if 'ORDER BY' in query:
+        query = query.split('ORDER BY')[0].strip()
+    cursor = db.execute(query + " ORDER BY id ASC", params)
+    # Plain tuples are much cheaper than sqlite3.Row for a large ID list
+    cursor.row_factory = None
+    return [row[0] for row in cursor]
+
+
+def iter_filtered_rows(tags, people, search=None, fields=None, batch_size=500, db=None):
+    """Yields batches of plain row tuples matching the filters, in ID order.
+
+    Each batch is its own short statement resuming after the last ID seen
+    (keyset pagination), so memory stays constant however large the result
+    and no read lock is held while the caller sends a batch to a slow client.
+    The columns are `fields` (see parse_fields), or SUJET_COLUMNS for None.
+    """
+    db = db or get_db()
+    filters = {
+        'tags': tags,
+        'people': people,
+        'search': search,
+        'fields': fields
+    }
+    query, params = build_sujet_query(filters)
+    if 'ORDER BY' in query:
+        query = query.split('ORDER BY')[0].strip()
+    query += (" AND" if " WHERE " in query else " WHERE") + " id > ? ORDER BY id ASC LIMIT ?"
+    id_index = (fields or SUJET_COLUMNS).index('id')
+    last_id = float('-inf')
+    while True:
+        cursor = db.execute(query, [*params, last_id, batch_size])
+        cursor.row_factory = None
+        batch = cursor.fetchall()
+        if batch:
+            yield batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1][id_index]
+
+
+def get_sujets_by_ids(sujet_ids, fields=None):
+    """Fetches several sujets by ID in one statement. Returns {id: Sujet}; missing IDs are absent."""
+    if not sujet_ids:
+        return {}
+    db = get_db()
+    placeholders = ', '.join('?' * len(sujet_ids))
+    rows = db.execute(
+        f"SELECT {select_columns(fields)} FROM sujets WHERE id IN ({placeholders})",
+        list(sujet_ids)
+    ).fetchall()
+    return {row['id']: Sujet.from_row(row) for row in rows}
+
+
+def get_changes(since, limit):
+    """Inserts, updates and deletes after row version `since`, oldest first.
+
+    Returns (changes, state): `changes` is a list of (version, Sujet) for live
+    rows and (version, id) for deleted ones, at most `limit` long; `state` holds
+    the current 'row_version' and 'sync_floor' counters.
+    """
+    db = get_db()
+    tombstone_columns = ', '.join('id' if column == 'id' else 'NULL' for column in SUJET_COLUMNS)
+    rows = db.execute(
+        f"""SELECT 0 AS deleted, rowversion, {select_columns()} FROM sujets WHERE rowversion > :since
+            UNION ALL
+            SELECT 1, rowversion, {tombstone_columns} FROM sujets_tombstones WHERE rowversion > :since
+            ORDER BY rowversion LIMIT :limit""",
+        {'since': since, 'limit': limit}
+    ).fetchall()
+    changes = []
+    for row in rows:
+        if row['deleted']:
+            changes.append((row['rowversion'], row['id']))
+        else:
+            changes.append((row['rowversion'], Sujet(**{column: row[column] for column in SUJET_COLUMNS})))
+    state = dict(db.execute(
+        "SELECT key, value FROM sujets_meta WHERE key IN ('row_version', 'sync_floor')").fetchall())
+    return changes, state
+
+
+def update_sujet_title(sujet_id, new_title, commit=True):
     """
     Updates the title part of the original_sujet field for a sujet.
     Preserves the ID prefix format (ID: xxx - ).
@@ -382,6 +805,7 @@ def update_sujet_title(sujet_id, new_title):
     Args:
         sujet_id (int): The ID of the sujet to update
         new_title (str): The new title text
+        commit (bool): False to leave the change in the caller's transaction
 
     Returns:
         bool: True if successful, False otherwise
@@ -389,41 +813,30 @@ def update_sujet_title(sujet_id, new_title):
     try:
         db = get_db()
 
-        # Get the current original_sujet value
-        current_sujet = db.execute(
-            'SELECT original_sujet FROM sujets WHERE id = ?',
-            (sujet_id,)
-        ).fetchone()
-
-        if not current_sujet:
-            return False
-
-        # Extract the ID prefix if it exists
-        current_text = current_sujet['original_sujet']
-        match = current_text.split(' - ', 1)
-
-        if len(match) > 1 and match[0].startswith('ID:'):
-            # Preserve the ID prefix format
-            id_prefix = match[0] + ' - '
-            updated_text = id_prefix + new_title
-        else:
-            # If no ID prefix format exists, create one
-            updated_text = f"ID: {sujet_id} - {new_title}"
-
-        # Update the database
-        db.execute(
-            'UPDATE sujets SET original_sujet = ? WHERE id = ?',
-            (updated_text, sujet_id)
+        # One statement: keep an existing "ID: xxx - " prefix (everything up to the
+        # first ' - '), or create one if the current text doesn't have it
+        cursor = db.execute(
+            '''UPDATE sujets SET original_sujet = CASE
+                   WHEN substr(original_sujet, 1, 3) = 'ID:' AND instr(original_sujet, ' - ') > 0
+                   THEN substr(original_sujet, 1, instr(original_sujet, ' - ') + 2) || :title
+                   ELSE 'ID: ' || id || ' - ' || :title
+               END
+               WHERE id = :id''',
+            {'title': new_title, 'id': sujet_id}
         )
-        db.commit()
+        if commit:
+            db.commit()
 
-        return True
+        return cursor.rowcount > 0
+    except sqlite3.OperationalError:
+        # Lock timeouts and the like are reported by the app's error handler
+        raise
     except Exception as e:
         print(f"Error updating sujet title: {e}")
         return False
 
 
-def add_new_sujet(title, ai_suggestion="", user_notes=""):
+def add_new_sujet(title, ai_suggestion="", user_notes="", commit=True):
     """
     Adds a new sujet to the database with the given title and optional AI suggestion.
     Automatically assigns the next available ID.
@@ -432,42 +845,77 @@ def add_new_sujet(title, ai_suggestion="", user_notes=""):
         title (str): The title for the new sujet
         ai_suggestion (str, optional): AI suggestion for the sujet
         user_notes (str, optional): User notes for the sujet
+        commit (bool): False to leave the change in the caller's transaction
 
     Returns:
-        dict: The newly created sujet data or None if failed
+        Sujet: The newly created sujet or None if failed
     """
     try:
         db = get_db()
 
-        # Get the highest ID currently in the database
-        max_id_row = db.execute(
-            'SELECT MAX(id) as max_id FROM sujets').fetchone()
-        next_id = 1
-        if max_id_row and max_id_row['max_id']:
-            next_id = max_id_row['max_id'] + 1
-
-        # Format the original_sujet with ID prefix
-        original_sujet = f"ID: {next_id} - {title}"
-
         # Format the current date as YYYY-MM-DD
         current_date = datetime.now().strftime('%Y-%m-%d')
 
-        # Insert the new sujet
-        db.execute(
-            '''INSERT INTO sujets 
-               (id, original_sujet, ai_suggestion, user_notes, user_tags, status, view_count, person, date_created) 
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (next_id, original_sujet, ai_suggestion,
-             user_notes, "", "new", 1, "", current_date)
-        )
-        db.commit()
+        # Next ID, "ID: xxx - " prefix, insert and read-back in one statement.
+        # Computing MAX(id) inside the INSERT also keeps concurrent adds from
+        # picking the same ID.
+        row = db.execute(
+            f'''INSERT INTO sujets
+               (id, original_sujet, ai_suggestion, user_notes, user_tags, status, view_count, person, date_created)
+               SELECT next_id, 'ID: ' || next_id || ' - ' || ?, ?, ?, '', 'new', 1, '', ?
+               FROM (SELECT COALESCE(MAX(id), 0) + 1 AS next_id FROM sujets)
+               RETURNING {select_columns()}''',
+            (title, ai_suggestion, user_notes, current_date)
+        ).fetchone()
+        if commit:
+            db.commit()
 
         # Return the newly created sujet
-        return get_sujet_by_id(next_id)
+        return Sujet.from_row(row)
+    except sqlite3.OperationalError:
+        # Lock timeouts and the like are reported by the app's error handler
+        raise
     except Exception as e:
         print(f"Error adding new sujet: {e}")
         return None
 
+
+def apply_idempotent(keyed_items, apply):
+    """Runs `apply(item)` for each (key, item) whose key hasn't been applied before.
+
+    Everything happens in one write transaction, so an item's effect and the
+    record of its key commit together: a batch retried after a lost response
+    replays stored results instead of applying anything twice. `apply` must
+    not commit. Returns a list of (result, replayed) in input order.
+    """
+    db = get_db()
+    # IMMEDIATE takes the write lock up front, so two replays of the same key
+    # (e.g. page and service worker) can't both miss the lookup
+    if not db.in_transaction:
+        db.execute('BEGIN IMMEDIATE')
+    try:
+        keys = list({key for key, _ in keyed_items})
+        stored = {row['key']: json.loads(row['response']) for row in db.execute(
+            f"SELECT key, response FROM idempotency_keys WHERE key IN ({', '.join('?' * len(keys))})",
+            keys)}
+        results, new_rows = [], []
+        for key, item in keyed_items:
+            if key in stored:
+                results.append((stored[key], True))
+                continue
+            # Round-trip through JSON so a first answer looks exactly like its replays
+            response = stdlib_dumps(apply(item)).decode('utf-8')
+            stored[key] = json.loads(response)
+            new_rows.append((key, response))
+            results.append((stored[key], False))
+        if new_rows:
+            db.executemany("INSERT INTO idempotency_keys (key, response) VALUES (?, ?)", new_rows)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return results
+
 # --- CLI Commands ---
 
 
@@ -475,6 +923,9 @@ def add_new_sujet(title, ai_suggestion="", user_notes=""):
 @click.argument('csv_filepath', type=click.Path(exists=True))
 def add_sujets_command(csv_filepath):
     """Adds new sujets from a CSV file to the database if they don't already exist."""
+    # pandas is only needed by the CLI; importing it here keeps it off the web worker boot path
+    import pandas as pd
+
     conn = get_db()
     # ... (rest of the function is the same)
     try:
@@ -520,8 +971,11 @@ def add_sujets_command(csv_filepath):
 
 
 @click.command('init-db')
+@with_appcontext
 def init_db_command():
     """Initialize the database from the initial CSV file."""
+    import pandas as pd
+
     try:
         if not os.path.exists(INITIAL_CSV_PATH):
             print(f"Error: Initial CSV file not found at {INITIAL_CSV_PATH}.")
@@ -546,12 +1000,45 @@ def init_db_command():
         df.index = df.index + 1
         df.to_sql('sujets', conn, if_exists='replace',
                   index=True, index_label='id')
+        # Replacing the table dropped its triggers, so re-run the migrations
+        conn.execute('PRAGMA user_version = 0')
+        _schema_ready.discard(DATABASE_PATH)
+        ensure_schema(conn)
+        # The migration keeps the old counters, so without a new epoch every
+        # ETag handed out for the old data would still validate
+        conn.execute("UPDATE sujets_meta SET value = (value + 1 + abs(random() % 4294967295)) % 4294967296"
+                     " WHERE key = 'epoch'")
         conn.commit()
         print("Database initialized successfully.")
     except Exception as e:
         print(f"An error occurred during DB initialization: {e}")
         sys.exit(1)
 
+
+@click.command('prune-tombstones')
+@with_appcontext
+@click.option('--days', default=90, show_default=True, help='Keep tombstones newer than this.')
+def prune_tombstones_command(days):
+    """Deletes old delete markers and idempotency keys. Clients that last synced
+    before the pruned deletes must resync."""
+    conn = get_db()
+    keys = conn.execute("DELETE FROM idempotency_keys WHERE created_at < datetime('now', ?)",
+                        (f'-{days} days',)).rowcount
+    conn.commit()
+    if keys:
+        print(f"Pruned {keys} idempotency keys.")
+    cutoff = conn.execute(
+        "SELECT MAX(rowversion) FROM sujets_tombstones WHERE deleted_at < datetime('now', ?)",
+        (f'-{days} days',)
+    ).fetchone()[0]
+    if cutoff is None:
+        print("No tombstones to prune.")
+        return
+    deleted = conn.execute("DELETE FROM sujets_tombstones WHERE rowversion <= ?", (cutoff,)).rowcount
+    conn.execute("UPDATE sujets_meta SET value = MAX(value, ?) WHERE key = 'sync_floor'", (cutoff,))
+    conn.commit()
+    print(f"Pruned {deleted} tombstones; clients synced before version {cutoff} will resync.")
+
 # --- Registration Functions ---
 
 
@@ -559,6 +1046,7 @@ def register_cli_commands(app):
     """Registers CLI commands with the Flask app."""
     app.cli.add_command(add_sujets_command)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(prune_tombstones_command)
 
 
 def register_teardown(app):
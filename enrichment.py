@@ -0,0 +1,554 @@
+# enrichment.py
+"""Concurrent, rate-limited LLM enrichment of sujets.
+
+weave_batch.py used to call the chat completions API one sujet at a time with
+a fixed half-second sleep in between. The Enricher here keeps up to
+`concurrency` requests in flight instead, paced by two token buckets (requests
+per minute and tokens per minute, matching how the API meters usage). On a
+429 every worker pauses for the server's Retry-After (plus jitter), and the
+buckets drop to half rate before creeping back up, so a run settles just
+under the account's real limits instead of hammering them.
+
+Requests go straight to the HTTP endpoint rather than through the openai SDK,
+whose own hidden retries would fight the limiter. OPENAI_BASE_URL points it
+at any compatible server, e.g. benchmarks/stub_llm.py in tests.
+
+    results, stats = run_enrichment([(1, 'weird hat coffee shop'), ...])
+
+Given an EnrichmentCache, finished suggestions are stored under a hash of the
+normalized sujet text, the prompt version, model and temperature, and later
+runs (or duplicate rows in the same run) are answered from it without a call.
+
+With pack_size > 1 each request carries several sujets and the few-shot
+examples are paid for once per pack; answers come back as JSON, are
+validated per sujet, and only the sujets that came back wrong are re-sent.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Configuration ---
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
+ENRICH_MODEL = os.getenv('ENRICH_MODEL', 'gpt-3.5-turbo')
+ENRICH_TEMPERATURE = 0.7
+ENRICH_MAX_TOKENS = 100
+# Requests in flight at once
+ENRICH_CONCURRENCY = int(os.getenv('ENRICH_CONCURRENCY', '8'))
+# Account limits; the buckets start here and back off on 429s
+ENRICH_RPM = float(os.getenv('ENRICH_RPM', '500'))
+ENRICH_TPM = float(os.getenv('ENRICH_TPM', '200000'))
+ENRICH_MAX_ATTEMPTS = int(os.getenv('ENRICH_MAX_ATTEMPTS', '6'))
+# Sujets per request in packed mode (1 = one request per sujet)
+ENRICH_PACK_SIZE = int(os.getenv('ENRICH_PACK_SIZE', '1'))
+# Re-sends of a pack's invalid or missing items before they go one by one
+PACK_RETRIES = 1
+# Suggestion cache; entries older than the TTL are misses, and eviction keeps the newest MAX_ENTRIES
+ENRICH_CACHE_PATH = os.getenv('ENRICH_CACHE_PATH') or os.path.join(APP_ROOT, 'instance', 'enrichment_cache.db')
+ENRICH_CACHE_TTL_DAYS = float(os.getenv('ENRICH_CACHE_TTL_DAYS', '180'))
+ENRICH_CACHE_MAX_ENTRIES = int(os.getenv('ENRICH_CACHE_MAX_ENTRIES', '100000'))
+# 429s in a row after which one request gives up
+MAX_THROTTLED = 20
+REQUEST_TIMEOUT = 60
+# Exponential backoff for transient errors: up to BACKOFF_BASE * 2**attempt, full jitter
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+# Rate multiplier bounds for the adaptive limiter, and the recovery per success
+MIN_RATE_FACTOR = 0.1
+RATE_RECOVERY = 0.02
+
+SYSTEM_PROMPT = "You are a helpful assistant for organizing personal notes."
+
+PROMPT_TEMPLATE = """
+    You are helping someone organize very brief personal notes ("sujets").
+    Your task is to understand the likely meaning or core theme of the brief note and suggest relevant tags or categories.
+    Provide a slightly more descriptive phrase or sentence clarifying the note's meaning, followed by suggested tags.
+    The tags should be comma-separated keywords relevant to the topic (e.g., Travel, AI, Personal, Funny, Science, Observation, Quote).
+
+    Example:
+    Input: "weird hat coffee shop"
+    Suggestion: "Observation about someone wearing a very unusual hat in a coffee shop. Tags: Observation, People Watching, Funny, Everyday Life."
+
+    Input: "AI ethical debate"
+    Suggestion: "Reflecting on recent discussions or articles about the ethical challenges of AI. Tags: AI, Ethics, Technology, Society, News."
+
+    Input: "Feeling overwhelmed"
+    Suggestion: "Recalling a personal experience of feeling overwhelmed. Tags: Personal, Feeling, Emotion, Self-reflection, Vulnerable."
+
+    Input: "Great book quote"
+    Suggestion: "A memorable quote from a book recently read. Tags: Quote, Reading, Literature, Philosophy, Inspiration."
+
+    Input: "Visited the new museum exhibit"
+    Suggestion: "Visited a new museum exhibit about modern art. Tags: Art, Culture, Travel (if applicable), Activity."
+
+    Now, provide a suggestion for the following note. Format: Clarification phrase. Tags: Tag1, Tag2, Tag3...
+    Input: "{sujet_text}"
+
+    Suggestion:
+    """
+
+
+# Packed mode: one request carries several sujets and the examples are sent
+# once per pack instead of once per sujet. The model answers in JSON so the
+# response can be validated and split back per sujet.
+PACKED_PROMPT_TEMPLATE = """
+    You are helping someone organize very brief personal notes ("sujets").
+    For each note, understand its likely meaning or core theme. Write a slightly more descriptive phrase or sentence clarifying the note's meaning, followed by suggested tags.
+    The tags should be comma-separated keywords relevant to the topic (e.g., Travel, AI, Personal, Funny, Science, Observation, Quote).
+
+    Examples of single suggestions:
+    "weird hat coffee shop" -> "Observation about someone wearing a very unusual hat in a coffee shop. Tags: Observation, People Watching, Funny, Everyday Life."
+    "AI ethical debate" -> "Reflecting on recent discussions or articles about the ethical challenges of AI. Tags: AI, Ethics, Technology, Society, News."
+    "Feeling overwhelmed" -> "Recalling a personal experience of feeling overwhelmed. Tags: Personal, Feeling, Emotion, Self-reflection, Vulnerable."
+    "Great book quote" -> "A memorable quote from a book recently read. Tags: Quote, Reading, Literature, Philosophy, Inspiration."
+
+    Answer with a JSON object only, in this shape, with one entry per note and the note's id unchanged:
+    {{"results": [{{"id": 0, "suggestion": "Clarification phrase. Tags: Tag1, Tag2, Tag3..."}}]}}
+
+    Notes (JSON):
+    {notes_json}
+    """
+
+
+# Changes whenever a prompt does, so edited prompts don't reuse cached answers
+PROMPT_VERSION = hashlib.sha256(
+    (SYSTEM_PROMPT + PROMPT_TEMPLATE + PACKED_PROMPT_TEMPLATE).encode('utf-8')).hexdigest()[:12]
+
+
+def build_prompt(sujet_text):
+    return PROMPT_TEMPLATE.format(sujet_text=sujet_text)
+
+
+def build_packed_prompt(texts):
+    """Prompt for several sujets; their ids in the answer are their positions in `texts`."""
+    notes = [{'id': i, 'text': text} for i, text in enumerate(texts)]
+    return PACKED_PROMPT_TEMPLATE.format(notes_json=json.dumps(notes, ensure_ascii=False))
+
+
+def parse_packed_response(content, count):
+    """{position: suggestion} for every valid entry in a packed answer.
+
+    Entries with an unknown id, or without a non-empty string suggestion, are
+    left out, and so are positions the model skipped; the caller retries those.
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return {}
+    entries = data.get('results') if isinstance(data, dict) else data
+    found = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        position, suggestion = entry.get('id'), entry.get('suggestion')
+        if (isinstance(position, int) and not isinstance(position, bool) and 0 <= position < count
+                and isinstance(suggestion, str) and suggestion.strip() and position not in found):
+            found[position] = suggestion.strip()
+    return found
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token), for rate limiting."""
+    return len(text) // 4 + 1
+
+# --- Errors ---
+
+
+class RateLimited(Exception):
+    """The API answered 429. `retry_after` is the server's hint in seconds, if any."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TransientError(Exception):
+    """A timeout, connection error or 5xx: worth retrying."""
+
+
+class PermanentError(Exception):
+    """A request the API will never accept (bad key, bad request)."""
+
+# --- Rate Limiting ---
+
+
+class TokenBucket:
+    """Allows `rate_per_minute` units per minute, with bursts up to `capacity`.
+
+    The rate can be scaled down and back up at runtime (see Enricher), and
+    debit() can push the level below zero when a request turns out to have
+    cost more than was reserved for it.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.factor = 1.0
+        self.capacity = capacity or max(1.0, rate_per_minute / 60.0)
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * self.factor)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.level >= amount:
+                self.level -= amount
+                return
+            await asyncio.sleep((amount - self.level) / (self.rate * self.factor))
+
+    def debit(self, amount):
+        self._refill()
+        self.level -= amount
+
+# --- Transport ---
+
+
+class OpenAIChatTransport:
+    """POSTs chat completion payloads to OPENAI_BASE_URL and returns the parsed JSON."""
+
+    def __init__(self, base_url=None, api_key=None, timeout=REQUEST_TIMEOUT):
+        self.url = (base_url or OPENAI_BASE_URL).rstrip('/') + '/chat/completions'
+        self.api_key = api_key if api_key is not None else os.getenv('OPENAI_API_KEY', '')
+        self.timeout = timeout
+
+    def post(self, payload):
+        request = urllib.request.Request(
+            self.url, data=json.dumps(payload).encode('utf-8'), method='POST',
+            headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {self.api_key}'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            body = e.read().decode('utf-8', 'replace')[:300]
+            if e.code == 429:
+                raise RateLimited(body, _retry_after(e.headers))
+            if e.code in (408, 409) or e.code >= 500:
+                raise TransientError(f"HTTP {e.code}: {body}")
+            raise PermanentError(f"HTTP {e.code}: {body}")
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            raise TransientError(str(e))
+        except ValueError as e:
+            raise TransientError(f"Malformed response: {e}")
+
+    async def __call__(self, payload):
+        # urllib blocks, so each request runs on the loop's executor thread pool
+        return await asyncio.get_running_loop().run_in_executor(None, self.post, payload)
+
+
+def _retry_after(headers):
+    for name in ('retry-after-ms', 'retry-after'):
+        value = headers.get(name)
+        try:
+            if value is not None:
+                return float(value) / (1000 if name == 'retry-after-ms' else 1)
+        except ValueError:
+            continue
+    return None
+
+# --- Cache ---
+
+
+def normalize_text(text):
+    """Sujet text as cached: case-folded, whitespace collapsed."""
+    return ' '.join(text.split()).casefold()
+
+
+def cache_key(text, model=None, temperature=ENRICH_TEMPERATURE, prompt_version=PROMPT_VERSION):
+    """Content address of a suggestion: what it was generated from, and how."""
+    material = json.dumps([normalize_text(text), prompt_version, model or ENRICH_MODEL, temperature])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class EnrichmentCache:
+    """Finished suggestions in a small SQLite file, keyed by cache_key().
+
+    Only used from the event loop's thread; lookups and stores are local
+    and fast enough not to need an executor.
+    """
+
+    def __init__(self, path=None, ttl_days=None, max_entries=None):
+        self.path = path or ENRICH_CACHE_PATH
+        self.ttl = (ENRICH_CACHE_TTL_DAYS if ttl_days is None else ttl_days) * 86400
+        self.max_entries = max_entries or ENRICH_CACHE_MAX_ENTRIES
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS enrichment_cache (key TEXT PRIMARY KEY, suggestion TEXT NOT NULL,"
+            " model TEXT NOT NULL, prompt_version TEXT NOT NULL, created_at REAL NOT NULL,"
+            " used_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)")
+        self.conn.commit()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        """The cached suggestion, or None if absent or older than the TTL."""
+        row = self.conn.execute("SELECT suggestion FROM enrichment_cache WHERE key = ? AND created_at >= ?",
+                                (key, time.time() - self.ttl)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE enrichment_cache SET hits = hits + 1, used_at = ? WHERE key = ?",
+                          (time.time(), key))
+        self.conn.commit()
+        return row[0]
+
+    def put(self, key, suggestion, model=None):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO enrichment_cache (key, suggestion, model, prompt_version, created_at, used_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)", (key, suggestion, model or ENRICH_MODEL, PROMPT_VERSION, now, now))
+        self.conn.commit()
+
+    def evict(self):
+        """Deletes expired entries, then the least recently used beyond max_entries. Returns the count."""
+        expired = self.conn.execute("DELETE FROM enrichment_cache WHERE created_at < ?",
+                                    (time.time() - self.ttl,)).rowcount
+        excess = self.conn.execute(
+            "DELETE FROM enrichment_cache WHERE key IN (SELECT key FROM enrichment_cache"
+            " ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+        self.conn.commit()
+        return expired + excess
+
+    def stats(self):
+        """Entry counts and lifetime hits, plus this session's hits and misses."""
+        entries, stored_hits, oldest = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(hits), 0), MIN(created_at) FROM enrichment_cache").fetchone()
+        expired = self.conn.execute("SELECT COUNT(*) FROM enrichment_cache WHERE created_at < ?",
+                                    (time.time() - self.ttl,)).fetchone()[0]
+        return {'entries': entries, 'expired': expired, 'lifetime_hits': stored_hits,
+                'oldest_days': round((time.time() - oldest) / 86400, 1) if oldest else None,
+                'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        self.conn.close()
+
+# --- Enricher ---
+
+
+class Enricher:
+    """Runs enrichment requests concurrently under request and token rate limits.
+
+    `stats` counts requests, 429s, retries, failures and the tokens the API
+    reported, for the caller to print or benchmark. With a `cache`, items
+    are looked up first (unless `refresh`) and new suggestions are stored.
+    """
+
+    def __init__(self, transport=None, concurrency=None, rpm=None, tpm=None,
+                 model=None, max_attempts=None, pack_size=None, cache=None, refresh=False):
+        self.transport = transport or OpenAIChatTransport()
+        self.concurrency = concurrency or ENRICH_CONCURRENCY
+        self.requests = TokenBucket(rpm or ENRICH_RPM)
+        self.tokens = TokenBucket(tpm or ENRICH_TPM)
+        self.model = model or ENRICH_MODEL
+        self.max_attempts = max_attempts or ENRICH_MAX_ATTEMPTS
+        self.pack_size = max(1, pack_size or ENRICH_PACK_SIZE)
+        self.cache = cache
+        self.refresh = refresh
+        self.paused_until = 0.0
+        self.stats = {'requests': 0, 'rate_limited': 0, 'retries': 0, 'failed': 0,
+                      'prompt_tokens': 0, 'completion_tokens': 0, 'items_resent': 0,
+                      'cached': 0, 'duplicates': 0}
+
+    def _set_rate_factor(self, factor):
+        factor = min(1.0, max(MIN_RATE_FACTOR, factor))
+        for bucket in (self.requests, self.tokens):
+            bucket._refill()
+            bucket.factor = factor
+
+    def payload(self, prompt, max_tokens=ENRICH_MAX_TOKENS, json_mode=False):
+        payload = {
+            'model': self.model,
+            'messages': [{'role': 'system', 'content': SYSTEM_PROMPT},
+                         {'role': 'user', 'content': prompt}],
+            'max_tokens': max_tokens,
+            'temperature': ENRICH_TEMPERATURE,
+        }
+        if json_mode:
+            payload['response_format'] = {'type': 'json_object'}
+        return payload
+
+    async def complete(self, payload, reserve_tokens):
+        """Sends one payload with limiting and retries. Returns the response JSON.
+
+        Transient errors count against max_attempts. 429s don't, since they
+        say nothing about the request itself, but a request still throttled
+        after MAX_THROTTLED tries gives up.
+        """
+        failures = throttled = 0
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self.requests.acquire()
+            await self.tokens.acquire(reserve_tokens)
+            self.stats['requests'] += 1
+            try:
+                response = await self.transport(payload)
+            except RateLimited as e:
+                self.stats['rate_limited'] += 1
+                throttled += 1
+                if throttled >= MAX_THROTTLED:
+                    raise
+                # Everyone waits out the server's hint, and the rate halves
+                wait = (e.retry_after if e.retry_after is not None
+                        else min(BACKOFF_MAX, BACKOFF_BASE * 2 ** throttled))
+                wait += random.uniform(0, wait * 0.25 + 0.05)
+                self.paused_until = max(self.paused_until, time.monotonic() + wait)
+                self._set_rate_factor(self.requests.factor / 2)
+            except TransientError:
+                failures += 1
+                if failures >= self.max_attempts:
+                    raise TransientError(f"Gave up after {self.max_attempts} attempts")
+                await asyncio.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** failures)))
+            else:
+                usage = response.get('usage') or {}
+                used = usage.get('total_tokens')
+                if used is not None and used > reserve_tokens:
+                    self.tokens.debit(used - reserve_tokens)
+                self.stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+                self.stats['completion_tokens'] += usage.get('completion_tokens', 0)
+                if self.requests.factor < 1.0:
+                    self._set_rate_factor(self.requests.factor + RATE_RECOVERY)
+                return response
+            self.stats['retries'] += 1
+
+    async def enrich(self, sujet_text):
+        """The suggestion for one sujet."""
+        prompt = build_prompt(sujet_text)
+        response = await self.complete(self.payload(prompt),
+                                       estimate_tokens(SYSTEM_PROMPT + prompt) + ENRICH_MAX_TOKENS)
+        content = _content(response)
+        if not content:
+            raise TransientError('Response has no message content')
+        return content
+
+    async def enrich_pack(self, texts):
+        """Suggestions for several sujets in one request: {position: suggestion}.
+
+        Items the answer left out or got wrong are re-sent as a smaller pack
+        (PACK_RETRIES times), then one by one. Positions still missing failed;
+        their error is in the returned `errors` dict.
+        """
+        found, errors = {}, {}
+        pending = list(range(len(texts)))
+        for _ in range(PACK_RETRIES + 1):
+            if len(pending) < 2:
+                break
+            prompt = build_packed_prompt([texts[i] for i in pending])
+            max_tokens = ENRICH_MAX_TOKENS * len(pending)
+            try:
+                response = await self.complete(self.payload(prompt, max_tokens, json_mode=True),
+                                               estimate_tokens(SYSTEM_PROMPT + prompt) + max_tokens)
+            except (TransientError, PermanentError, RateLimited) as e:
+                errors = {i: str(e) or type(e).__name__ for i in pending}
+                break
+            answered = parse_packed_response(_content(response), len(pending))
+            for position, suggestion in answered.items():
+                found[pending[position]] = suggestion
+            pending = [i for i in pending if i not in found]
+            if pending:
+                self.stats['items_resent'] += len(pending)
+        if not errors:
+            for i in pending:
+                try:
+                    found[i] = await self.enrich(texts[i])
+                except (TransientError, PermanentError, RateLimited) as e:
+                    errors[i] = str(e) or type(e).__name__
+        return found, errors
+
+    async def enrich_all(self, items, on_result=None):
+        """Enriches (key, text) pairs. Returns a result dict per item, in input order.
+
+        Each result is {'key', 'text', 'suggestion', 'error'}; exactly one of
+        suggestion and error is set. `on_result` is called with each result as
+        it completes. Items whose normalized text repeats are sent once; cached
+        items are not sent at all. With pack_size > 1, items go pack_size to a
+        request.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        items = list(items)
+        results = [{'key': key, 'text': text, 'suggestion': None, 'error': None} for key, text in items]
+
+        def finish(indexes, suggestion, error=None):
+            for index in indexes:
+                result = results[index]
+                result['suggestion'] = suggestion
+                if suggestion is None:
+                    self.stats['failed'] += 1
+                    result['error'] = error
+                if on_result:
+                    on_result(result)
+
+        # {cache key: indexes of the items with that text}, in first-seen order
+        groups = {}
+        for index, (_, text) in enumerate(items):
+            groups.setdefault(cache_key(text, self.model), []).append(index)
+        pending = []
+        for key, indexes in groups.items():
+            self.stats['duplicates'] += len(indexes) - 1
+            suggestion = self.cache.get(key) if self.cache and not self.refresh else None
+            if suggestion is not None:
+                self.stats['cached'] += len(indexes)
+                finish(indexes, suggestion)
+            else:
+                pending.append(key)
+
+        async def run(keys):
+            async with semaphore:
+                texts = [results[groups[key][0]]['text'] for key in keys]
+                if len(keys) == 1:
+                    found, errors = {}, {}
+                    try:
+                        found[0] = await self.enrich(texts[0])
+                    except (TransientError, PermanentError, RateLimited) as e:
+                        errors[0] = str(e) or type(e).__name__
+                else:
+                    found, errors = await self.enrich_pack(texts)
+            for position, key in enumerate(keys):
+                suggestion = found.get(position)
+                if suggestion is not None and self.cache:
+                    self.cache.put(key, suggestion, self.model)
+                finish(groups[key], suggestion, errors.get(position, 'No suggestion returned'))
+
+        await asyncio.gather(*(run(pending[start:start + self.pack_size])
+                               for start in range(0, len(pending), self.pack_size)))
+        return results
+
+
+def _content(response):
+    try:
+        return response['choices'][0]['message']['content'].strip()
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return None
+
+
+def run_enrichment(items, on_result=None, **options):
+    """Synchronous entry point: enriches (key, text) pairs, returns (results, stats)."""
+    enricher = Enricher(**options)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        # One thread per in-flight request for the blocking HTTP calls
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=enricher.concurrency))
+        start = time.perf_counter()
+        results = await enricher.enrich_all(items, on_result)
+        enricher.stats['seconds'] = time.perf_counter() - start
+        return results
+
+    results = asyncio.run(main())
+    return results, enricher.stats
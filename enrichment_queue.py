@@ -0,0 +1,140 @@
+# enrichment_queue.py
+"""Durable enrichment work queue in the sujets database.
+
+Progress used to be one integer in last_processed_index.txt: only one process
+could run, and a crash mid-batch lost or repeated work. Each sujet now has a
+row in enrichment_jobs:
+
+    pending --claim--> leased --complete--> done
+                         |
+                         +--fail--> pending (retried) or failed (attempts used up)
+
+Workers claim a batch atomically with one UPDATE ... RETURNING, so any number
+of weave_batch.py processes can share the queue. A claim is a lease: if its
+worker dies, the jobs become claimable again once lease_expires_at passes.
+
+    queue = JobQueue()
+    queue.enqueue_unenriched()
+    for sujet_id, text in queue.claim(50): ...
+"""
+
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+import db_operations
+from enrichment_sink import title_text
+
+# --- Configuration ---
+# Seconds a claimed batch stays with its worker before others may take it over
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '600'))
+# Claims per job before it stays failed (until --retry-failed)
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+LOCK_TIMEOUT = 30
+
+STATES = ('pending', 'leased', 'done', 'failed')
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class JobQueue:
+    """The enrichment_jobs table, seen from one worker."""
+
+    def __init__(self, db_path=None, owner=None, lease_seconds=None, max_attempts=None):
+        self.db_path = db_path or db_operations.DATABASE_PATH
+        self.owner = owner or worker_name()
+        self.lease_seconds = JOB_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.max_attempts = max_attempts or JOB_MAX_ATTEMPTS
+        self.conn = sqlite3.connect(self.db_path, timeout=LOCK_TIMEOUT)
+        db_operations.ensure_schema(self.conn, self.db_path)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, sujet_ids):
+        """Adds a pending job per sujet that has none yet. Returns how many were added."""
+        with self.conn:
+            return self.conn.executemany(
+                "INSERT OR IGNORE INTO enrichment_jobs (sujet_id, updated_at) VALUES (?, ?)",
+                [(sujet_id, time.time()) for sujet_id in sujet_ids]).rowcount
+
+    def enqueue_unenriched(self):
+        """Adds a pending job for every sujet without an AI suggestion or a job."""
+        with self.conn:
+            return self.conn.execute(
+                "INSERT OR IGNORE INTO enrichment_jobs (sujet_id, updated_at)"
+                " SELECT id, ? FROM sujets WHERE COALESCE(ai_suggestion, '') = ''",
+                (time.time(),)).rowcount
+
+    def claim(self, limit):
+        """Leases up to `limit` pending (or abandoned) jobs. Returns [(sujet_id, text)] by id."""
+        now = time.time()
+        with self.conn:
+            # A lease that ran out on its last attempt means the job keeps killing its worker
+            self.conn.execute(
+                "UPDATE enrichment_jobs SET state = 'failed', lease_owner = NULL, lease_expires_at = NULL,"
+                " error = COALESCE(error, 'Lease expired'), updated_at = ?"
+                " WHERE state = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                (now, now, self.max_attempts))
+            claimed = [row[0] for row in self.conn.execute(
+                """UPDATE enrichment_jobs
+                   SET state = 'leased', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1,
+                       updated_at = ?
+                   WHERE sujet_id IN (
+                       SELECT sujet_id FROM enrichment_jobs
+                       WHERE state = 'pending' OR (state = 'leased' AND lease_expires_at < ?)
+                       ORDER BY sujet_id LIMIT ?)
+                   RETURNING sujet_id""",
+                (self.owner, now + self.lease_seconds, now, now, limit)).fetchall()]
+            if not claimed:
+                return []
+            placeholders = ', '.join('?' * len(claimed))
+            rows = self.conn.execute(
+                f"SELECT id, original_sujet FROM sujets WHERE id IN ({placeholders}) ORDER BY id",
+                claimed).fetchall()
+            # Jobs whose sujet was deleted meanwhile have nothing left to do
+            gone = set(claimed) - {sujet_id for sujet_id, _ in rows}
+            if gone:
+                self.conn.executemany("DELETE FROM enrichment_jobs WHERE sujet_id = ?", [(i,) for i in gone])
+        return [(sujet_id, title_text(title)) for sujet_id, title in rows]
+
+    def complete(self, sujet_ids, conn=None):
+        """Marks jobs done. Pass the sink's connection to do it in the same transaction as the write."""
+        (conn or self.conn).executemany(
+            "UPDATE enrichment_jobs SET state = 'done', lease_owner = NULL, lease_expires_at = NULL,"
+            " error = NULL, updated_at = ? WHERE sujet_id = ?",
+            [(time.time(), sujet_id) for sujet_id in sujet_ids])
+        if conn is None:
+            self.conn.commit()
+
+    def fail(self, sujet_id, error):
+        """Releases a job this worker holds: back to pending, or failed once attempts are used up."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE enrichment_jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+                " lease_owner = NULL, lease_expires_at = NULL, error = ?, updated_at = ?"
+                " WHERE sujet_id = ? AND state = 'leased' AND lease_owner = ?",
+                (self.max_attempts, error, time.time(), sujet_id, self.owner))
+
+    def retry_failed(self):
+        """Puts failed jobs back in the queue with fresh attempts. Returns how many."""
+        with self.conn:
+            return self.conn.execute(
+                "UPDATE enrichment_jobs SET state = 'pending', attempts = 0, updated_at = ?"
+                " WHERE state = 'failed'", (time.time(),)).rowcount
+
+    def counts(self):
+        """{state: jobs}, with every state present."""
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(self.conn.execute("SELECT state, COUNT(*) FROM enrichment_jobs GROUP BY state"))
+        return counts
+
+    def failures(self, limit=20):
+        """(sujet_id, attempts, error) of failed jobs."""
+        return self.conn.execute(
+            "SELECT sujet_id, attempts, error FROM enrichment_jobs WHERE state = 'failed'"
+            " ORDER BY sujet_id LIMIT ?", (limit,)).fetchall()
@@ -0,0 +1,148 @@
+# enrichment_sink.py
+"""Writes enrichment results into the sujets database in batched transactions.
+
+weave_batch.py used to re-read and rewrite the whole sujet_enrichments.csv
+after every batch, and the suggestions never reached the app. The sink
+instead updates sujets.ai_suggestion (and ai_tags, parsed from the
+suggestion's "Tags:" part) as results arrive, committing every `batch_size`
+rows, so each write costs O(batch) and the app shows the suggestions at once.
+A CSV copy can still be appended alongside.
+
+    with EnrichmentSink(csv_path='sujet_enrichments.csv') as sink:
+        sink.add(sujet_id, title, suggestion)
+"""
+
+import csv
+import os
+import re
+import sqlite3
+
+import db_operations
+
+# --- Configuration ---
+# Rows per transaction
+SINK_BATCH_SIZE = int(os.getenv('SINK_BATCH_SIZE', '100'))
+LOCK_TIMEOUT = 30
+
+CSV_COLUMNS = ['Original Sujet', 'Suggested Enrichment']
+# 'ID: 12 - ' as added by db_operations.add_new_sujet
+ID_PREFIX_RE = re.compile(r'^ID: \d+ - ')
+TAGS_RE = re.compile(r'\bTags:\s*(.+)$', re.IGNORECASE | re.DOTALL)
+
+
+def parse_tags(suggestion):
+    """'... Tags: AI, Travel (if applicable).' -> 'AI, Travel'."""
+    match = TAGS_RE.search(suggestion or '')
+    if not match:
+        return ''
+    tags = []
+    for tag in match.group(1).split(','):
+        tag = re.sub(r'\(.*?\)', '', tag).strip(' ."\'\n')
+        if tag and tag.casefold() not in (t.casefold() for t in tags):
+            tags.append(tag)
+    return ', '.join(tags)
+
+
+def title_text(original_sujet):
+    """The sujet's text without the 'ID: n - ' prefix, as sent for enrichment."""
+    return ID_PREFIX_RE.sub('', original_sujet or '').strip()
+
+
+class EnrichmentSink:
+    """Buffers results and upserts them into sujets, batch_size rows per transaction.
+
+    add() with a sujet id updates that row; with None it looks the title up
+    (with or without the 'ID: n - ' prefix) and inserts a new sujet if there
+    is none. Failed results are not written. With a `queue`, the jobs of
+    the written sujets are marked done in the same transaction.
+    """
+
+    def __init__(self, db_path=None, batch_size=None, csv_path=None, queue=None):
+        self.db_path = db_path or db_operations.DATABASE_PATH
+        self.batch_size = batch_size or SINK_BATCH_SIZE
+        self.csv_path = csv_path
+        # An enrichment_queue.JobQueue whose jobs are marked done with each write
+        self.queue = queue
+        self.conn = sqlite3.connect(self.db_path, timeout=LOCK_TIMEOUT)
+        db_operations.ensure_schema(self.conn, self.db_path)
+        self.pending = []
+        self.stats = {'updated': 0, 'inserted': 0, 'transactions': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, sujet_id, title, suggestion):
+        if not suggestion:
+            return
+        self.pending.append((sujet_id, title, suggestion))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows in one transaction (and appends them to the CSV)."""
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        with self.conn:
+            for sujet_id, title, suggestion in rows:
+                tags = parse_tags(suggestion)
+                if sujet_id is not None:
+                    updated = self.conn.execute(
+                        "UPDATE sujets SET ai_suggestion = ?, ai_tags = ? WHERE id = ?",
+                        (suggestion, tags, sujet_id)).rowcount
+                else:
+                    updated = self.conn.execute(
+                        "UPDATE sujets SET ai_suggestion = ?, ai_tags = ?"
+                        " WHERE original_sujet = ? OR (original_sujet GLOB 'ID: [0-9]* - *'"
+                        "  AND substr(original_sujet, instr(original_sujet, ' - ') + 3) = ?)",
+                        (suggestion, tags, title, title)).rowcount
+                if updated:
+                    self.stats['updated'] += updated
+                elif sujet_id is None:
+                    self.conn.execute(
+                        """INSERT INTO sujets (id, original_sujet, ai_suggestion, ai_tags, user_notes, user_tags,
+                                               status, view_count, person, date_created)
+                           SELECT next_id, 'ID: ' || next_id || ' - ' || ?, ?, ?, '', '', 'new', 0, '', date('now')
+                           FROM (SELECT COALESCE(MAX(id), 0) + 1 AS next_id FROM sujets)""",
+                        (title, suggestion, tags))
+                    self.stats['inserted'] += 1
+            if self.queue:
+                self.queue.complete([sujet_id for sujet_id, _, _ in rows if sujet_id is not None], conn=self.conn)
+        self.stats['transactions'] += 1
+        if self.csv_path:
+            self._append_csv(rows)
+
+    def resolve_titles(self, titles):
+        """The sujet id of each title, matched like add(None, ...); new titles become new sujets."""
+        known = {}
+        for sujet_id, original in self.conn.execute("SELECT id, original_sujet FROM sujets ORDER BY id DESC"):
+            # Lowest id wins for duplicate titles
+            known[original] = known[title_text(original)] = sujet_id
+        ids = []
+        with self.conn:
+            for title in titles:
+                if title not in known:
+                    known[title] = self.conn.execute(
+                        """INSERT INTO sujets (id, original_sujet, ai_suggestion, ai_tags, user_notes, user_tags,
+                                               status, view_count, person, date_created)
+                           SELECT next_id, 'ID: ' || next_id || ' - ' || ?, '', '', '', '', 'new', 0, '', date('now')
+                           FROM (SELECT COALESCE(MAX(id), 0) + 1 AS next_id FROM sujets)
+                           RETURNING id""", (title,)).fetchone()[0]
+                    self.stats['inserted'] += 1
+                ids.append(known[title])
+        return ids
+
+    def _append_csv(self, rows):
+        new_file = not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0
+        with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(CSV_COLUMNS)
+            writer.writerows((title, suggestion) for _, title, suggestion in rows)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
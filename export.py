@@ -0,0 +1,131 @@
+# export.py
+"""Streaming exports of the sujets table as NDJSON or CSV.
+
+Rows are stepped out of SQLite in batches and encoded by a generator, so a
+full-corpus export runs in constant memory. GET /export streams through the
+usual compress_response hook (gzip or brotli on the fly when the client
+accepts it); `flask export` writes to a file or stdout, optionally gzipped.
+Both take the same filters as the navigation routes.
+"""
+
+import contextlib
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+
+import click
+from flask import Response, request, stream_with_context
+from flask.cli import with_appcontext
+
+import db_operations
+from compression import stream_compress
+from serialization import SUJET_COLUMNS, json_response
+
+# --- Configuration ---
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+# Rows per fetch and per emitted chunk: one compression flush per chunk
+EXPORT_BATCH_SIZE = 500
+
+
+def ndjson_chunks(batches, columns):
+    """One JSON object per line; NULL columns stay null."""
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in batch)
+
+
+def csv_chunks(batches, columns):
+    """A header line, then one CSV record per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+ENCODERS = {
+    'ndjson': ndjson_chunks,
+    'csv': csv_chunks,
+}
+
+
+def export_chunks(fmt, tags, people, search=None, fields=None, db=None):
+    """Text chunks of an export in `fmt`, in ID order."""
+    batches = db_operations.iter_filtered_rows(
+        tags, people, search, fields, batch_size=EXPORT_BATCH_SIZE, db=db)
+    return ENCODERS[fmt](batches, fields or SUJET_COLUMNS)
+
+
+def _split(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+# --- Routes ---
+
+
+def export_view():
+    """GET /export?format=ndjson|csv&tags=&people=&search=&fields="""
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in FORMATS:
+        return json_response({'status': 'error', 'message': f"format must be one of: {', '.join(FORMATS)}"}), 400
+    # An unknown column raises UnknownFieldError, which app.py turns into a 400
+    fields = db_operations.parse_fields(request.args.get('fields', ''))
+    chunks = export_chunks(fmt, _split(request.args.get('tags')), _split(request.args.get('people')),
+                           request.args.get('search', '').strip() or None, fields)
+    # stream_with_context keeps the request (and its DB connection) open until
+    # the last chunk is sent
+    response = Response(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    filename = f"sujets-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# --- CLI Commands ---
+
+
+@click.command('export')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='ndjson', show_default=True)
+@click.option('--tags', default='', help='Comma-separated tags (any matches).')
+@click.option('--people', default='', help='Comma-separated people (any matches).')
+@click.option('--search', default=None, help='Text in the title or notes.')
+@click.option('--fields', default='', help="Column list or preset, e.g. 'lite'.")
+@click.option('--output', '-o', default='-', help='File to write, or - for stdout.')
+@click.option('--gzip', 'use_gzip', is_flag=True, help='Gzip the output.')
+@with_appcontext
+def export_command(fmt, tags, people, search, fields, output, use_gzip):
+    """Streams the (filtered) sujets table to a file or stdout."""
+    try:
+        columns = db_operations.parse_fields(fields)
+    except db_operations.UnknownFieldError as e:
+        raise click.BadParameter(str(e), param_hint='--fields')
+    chunks = export_chunks(fmt, _split(tags), _split(people), search, columns)
+    if use_gzip:
+        chunks = stream_compress(chunks, 'gzip')
+    else:
+        chunks = (chunk.encode('utf-8') for chunk in chunks)
+    out = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    try:
+        # The DB layer's debug prints go to stderr, leaving stdout to the export
+        with contextlib.redirect_stdout(sys.stderr):
+            for chunk in chunks:
+                out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        else:
+            out.flush()
+
+# --- Registration Functions ---
+
+
+def register_export(app):
+    """Adds GET /export and `flask export`."""
+    app.add_url_rule('/export', 'export', export_view)
+    app.cli.add_command(export_command)
@@ -0,0 +1,294 @@
+# metrics.py
+"""Request, database and cache metrics, exposed in Prometheus text format at /metrics.
+
+Each process keeps its own counters and histograms in memory. With several
+gunicorn workers, set WEAVE_METRICS_DIR to a directory shared by the workers:
+each one periodically writes a snapshot there and /metrics sums them all, so
+any worker can answer a scrape. Clear the directory on deploy, the same way
+prometheus_client's multiprocess mode expects.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from flask import Response, g, request
+
+import query_log
+
+# --- Configuration ---
+ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_DIR = os.getenv('WEAVE_METRICS_DIR')
+# How often a worker rewrites its snapshot in METRICS_DIR
+FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+# If set, /metrics requires "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+# SQLite calls the progress handler every this many VM instructions
+VM_STEP_INTERVAL = 1000
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+STATEMENT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                     0.025, 0.05, 0.1, 0.5, 1, 5)
+
+METRIC_HELP = {
+    'weave_http_request_duration_seconds': ('histogram', 'Request latency by route, method and status.'),
+    'weave_http_cache_requests_total': ('counter', 'Conditional requests by route, answered 304 (hit) or in full (miss).'),
+    'weave_db_statement_duration_seconds': ('histogram', 'SQL statement latency by calling db_operations function.'),
+    'weave_db_vm_steps_total': ('counter', f'SQLite VM instructions executed, in units of {VM_STEP_INTERVAL}. Proxy for rows scanned.'),
+    'weave_db_commit_duration_seconds': ('histogram', 'Commit latency, which is where write-lock waits show up.'),
+    'weave_db_errors_total': ('counter', "SQLite errors by operation; error='locked' is lock contention."),
+}
+
+# --- Registry ---
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> value
+_histograms = {}   # (name, labels) -> [bucket_counts, sum, count], buckets cumulative at render time
+_buckets = {}      # name -> bucket upper bounds
+_gauges = {}       # name -> callable returning [(labels, value)], sampled at render time
+_last_flush = 0.0
+
+
+def inc(name, labels, amount=1):
+    """Adds `amount` to a counter. `labels` is a tuple of (key, value) pairs."""
+    key = (name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, labels, value, buckets):
+    """Records one observation in a histogram."""
+    key = (name, labels)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            _buckets[name] = buckets
+            entry = _histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+
+def register_gauge(name, help_text, sample):
+    """Adds a gauge whose current samples come from calling `sample()` on every scrape."""
+    METRIC_HELP[name] = ('gauge', help_text)
+    _gauges[name] = sample
+
+
+def snapshot():
+    """This process's metrics as a JSON-serialisable dict."""
+    with _lock:
+        return {
+            'counters': [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, list(labels), list(counts), total, count]
+                           for (name, labels), (counts, total, count) in _histograms.items()],
+            'buckets': {name: list(bounds) for name, bounds in _buckets.items()},
+        }
+
+
+def write_snapshot():
+    """Atomically writes this worker's snapshot to METRICS_DIR."""
+    global _last_flush
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f'metrics-{os.getpid()}.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(path + '.tmp', path)
+    _last_flush = time.monotonic()
+
+
+def merged_snapshots():
+    """Sums the snapshots of every worker (or just this process without METRICS_DIR)."""
+    if not METRICS_DIR:
+        snapshots = [snapshot()]
+    else:
+        write_snapshot()
+        snapshots = []
+        for name in os.listdir(METRICS_DIR):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # a worker is mid-write or the file vanished
+
+    counters, histograms, buckets = {}, {}, {}
+    for snap in snapshots:
+        buckets.update(snap['buckets'])
+        for name, labels, value in snap['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total, count in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            entry = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+            entry[2] += count
+    return counters, histograms, buckets
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render():
+    """All metrics in Prometheus text exposition format."""
+    counters, histograms, buckets = merged_snapshots()
+    lines = []
+    for name, (kind, help_text) in METRIC_HELP.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'gauge':
+            for labels, value in _gauges[name]():
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        elif kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        else:
+            bounds = buckets.get(name, ())
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(list(bounds) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+# --- Database Instrumentation ---
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection that times statements and commits.
+
+    Statements are labelled with the name of the function that issued them
+    (e.g. get_adjacent_sujet), which keeps label cardinality fixed no matter
+    how the filter SQL varies. Timings cover execute() up to the first row,
+    which for the single-row and aggregate queries here is nearly all the work.
+    Statements over the slow-query threshold are handed to query_log.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.vm_ticks = 0
+        # Called with each statement's SQL; used by db_operations.statement_budget
+        self.statement_listener = None
+        if ENABLED:
+            self.set_progress_handler(self._tick, VM_STEP_INTERVAL)
+
+    def _tick(self):
+        self.vm_ticks += 1
+        return 0
+
+    def _timed(self, method, sql, parameters, many=False):
+        operation = sys._getframe(2).f_code.co_name
+        if self.statement_listener:
+            self.statement_listener(sql)
+        ticks = self.vm_ticks
+        start = time.perf_counter()
+        try:
+            cursor = method(sql, parameters)
+        except sqlite3.OperationalError as e:
+            error = 'locked' if 'locked' in str(e) or 'busy' in str(e) else 'other'
+            if ENABLED:
+                inc('weave_db_errors_total', (('operation', operation), ('error', error)))
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if ENABLED:
+                labels = (('operation', operation),
+                          ('statement', sql.split(None, 1)[0].upper() if sql.strip() else ''))
+                observe('weave_db_statement_duration_seconds', labels, elapsed, STATEMENT_BUCKETS)
+                if self.vm_ticks != ticks:
+                    inc('weave_db_vm_steps_total', labels[:1], self.vm_ticks - ticks)
+        if elapsed >= query_log.THRESHOLD_S:
+            query_log.record_slow(self, sql, None if many else parameters, elapsed, operation)
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self._timed(super().executemany, sql, parameters, many=True)
+
+    def commit(self):
+        operation = sys._getframe(1).f_code.co_name
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            if ENABLED:
+                observe('weave_db_commit_duration_seconds', (('operation', operation),),
+                        time.perf_counter() - start, STATEMENT_BUCKETS)
+
+
+def connection_class():
+    """Connection factory for sqlite3.connect: instrumented unless metrics and the
+    slow-query log are both off."""
+    return InstrumentedConnection if ENABLED or query_log.ENABLED else sqlite3.Connection
+
+
+def count_cache(hit):
+    """Counts a conditional request for the current endpoint as a cache hit or miss."""
+    if ENABLED:
+        inc('weave_http_cache_requests_total',
+            (('route', request.endpoint or ''), ('result', 'hit' if hit else 'miss')))
+
+# --- Request Instrumentation ---
+
+
+def start_timer():
+    """before_request hook."""
+    g.metrics_start = time.perf_counter()
+
+
+def record_request(response):
+    """after_request hook: one latency observation per request."""
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        # The rule, not the path, so /get_sujet_by_id/<id> is one series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe('weave_http_request_duration_seconds',
+                (('route', route), ('method', request.method), ('status', str(response.status_code))),
+                time.perf_counter() - start, REQUEST_BUCKETS)
+    if METRICS_DIR and time.monotonic() - _last_flush > FLUSH_SECONDS:
+        write_snapshot()
+    return response
+
+
+def metrics_view():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+# --- Registration Functions ---
+
+
+def register_metrics(app):
+    """Installs request timing and the /metrics route.
+
+    Register before compression so the measured latency includes compressing
+    the body (after_request hooks run in reverse registration order).
+    """
+    if not ENABLED:
+        return
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    if METRICS_DIR:
+        atexit.register(write_snapshot)
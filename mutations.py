@@ -0,0 +1,124 @@
+# mutations.py
+"""Idempotent batch writes for the offline client (static/offline_store.js).
+
+The client queues saves, skips, deletes, title edits and adds while offline
+and replays them to POST /mutations. Each entry carries a client-generated
+idempotency key; a key that was already applied returns its stored result
+instead of being applied again, so retrying after a lost response is safe.
+
+    {"mutations": [{"key": "5f0c...", "op": "save", "id": 12,
+                    "user_notes": "...", "user_tags": "AI", "person": "S"},
+                   {"key": "9a41...", "op": "add", "title": "New idea"}]}
+"""
+
+from flask import request
+
+import db_operations
+from serialization import json_response
+
+# --- Configuration ---
+MUTATION_BATCH_MAX = 100
+KEY_MAX_LENGTH = 100
+
+# --- Operations ---
+# Each takes one mutation dict and returns its result. They run inside
+# db_operations.apply_idempotent's transaction, so none of them commit.
+
+
+def _error(message):
+    return {'status': 'error', 'message': message}
+
+
+def _sujet_id(mutation):
+    sujet_id = mutation.get('id')
+    return sujet_id if isinstance(sujet_id, int) and not isinstance(sujet_id, bool) else None
+
+
+def _title(mutation):
+    title = mutation.get('title')
+    return title.strip() if isinstance(title, str) else ''
+
+
+def save(mutation):
+    found = db_operations.update_sujet_details(
+        _sujet_id(mutation), mutation.get('user_notes', ''), mutation.get('user_tags', ''),
+        mutation.get('person', ''), commit=False)
+    return {'status': 'ok'} if found else _error('Sujet not found')
+
+
+def skip(mutation):
+    found = db_operations.update_sujet_status(_sujet_id(mutation), 'skipped', commit=False)
+    return {'status': 'ok'} if found else _error('Sujet not found')
+
+
+def delete(mutation):
+    # Deleting something already gone is still success for a replayed queue
+    return {'status': 'ok', 'deleted': db_operations.delete_sujet_from_db(_sujet_id(mutation), commit=False)}
+
+
+def update_title(mutation):
+    title = _title(mutation)
+    if not title:
+        return _error('Title cannot be empty')
+    if not db_operations.update_sujet_title(_sujet_id(mutation), title, commit=False):
+        return _error('Sujet not found')
+    return {'status': 'ok'}
+
+
+def add(mutation):
+    title = _title(mutation)
+    if not title:
+        return _error('Title cannot be empty')
+    sujet = db_operations.add_new_sujet(title, '', '', commit=False)
+    return {'status': 'ok', 'sujet': sujet} if sujet else _error('Failed to create sujet')
+
+
+OPERATIONS = {
+    'save': save,
+    'skip': skip,
+    'delete': delete,
+    'title': update_title,
+    'add': add,
+}
+# Operations that act on an existing sujet and need an integer 'id'
+NEEDS_ID = {'save', 'skip', 'delete', 'title'}
+
+
+def apply_mutation(mutation):
+    op = mutation.get('op')
+    if op not in OPERATIONS:
+        return _error(f"Unknown op: {op!r}")
+    if op in NEEDS_ID and _sujet_id(mutation) is None:
+        return _error('id must be an integer')
+    return OPERATIONS[op](mutation)
+
+# --- Routes ---
+
+
+def mutations_view():
+    """Applies a batch of keyed mutations in order and returns one result per entry."""
+    data = request.get_json(force=True, silent=True) or {}
+    batch = data.get('mutations')
+    if not isinstance(batch, list) or not 0 < len(batch) <= MUTATION_BATCH_MAX:
+        return json_response({'status': 'error',
+                              'message': f'mutations must be a list of 1 to {MUTATION_BATCH_MAX} entries'}), 400
+    for mutation in batch:
+        key = mutation.get('key') if isinstance(mutation, dict) else None
+        if not isinstance(key, str) or not 0 < len(key) <= KEY_MAX_LENGTH:
+            return json_response({'status': 'error',
+                                  'message': f'every mutation needs a key of 1 to {KEY_MAX_LENGTH} characters'}), 400
+
+    results = db_operations.apply_idempotent(
+        [(mutation['key'], mutation) for mutation in batch], apply_mutation)
+    return json_response({
+        'status': 'ok',
+        'results': [dict(result, key=mutation['key'], replayed=replayed)
+                    for mutation, (result, replayed) in zip(batch, results)],
+    })
+
+# --- Registration Functions ---
+
+
+def register_mutations(app):
+    """Adds POST /mutations."""
+    app.add_url_rule('/mutations', 'mutations', mutations_view, methods=['POST'])
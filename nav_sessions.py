@@ -0,0 +1,190 @@
+# nav_sessions.py
+"""Navigation sessions: a filter's ordered matching IDs, materialised once.
+
+Without a session every next/prev/seek re-runs the filtered query. A session
+keeps the matching IDs (ascending, the app's navigation order) in an
+array('q') - 8 bytes per sujet - so a step is a bisect plus one primary-key
+fetch.
+
+Sessions live in process memory with a TTL and LRU eviction bounded by both
+count and total bytes. Each gunicorn worker has its own store, so callers
+always send the filter along with the token; an unknown or expired token, or
+one for a different filter, just rebuilds the session. The token is derived
+from the filter, so a worker rebuilding a session hands out the token the
+client already has, and a client bouncing between workers doesn't rebuild on
+every request. Clients with the same filter share a session; it expires
+NAV_SESSION_TTL after it was built, however busy, so the snapshot is never
+older than that.
+
+A session is a snapshot: sujets added later don't appear in it, and sujets
+deleted since are skipped when stepping.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+import db_operations
+
+# --- Configuration ---
+NAV_SESSION_TTL = int(os.getenv('NAV_SESSION_TTL', 1800))
+NAV_SESSION_MAX = int(os.getenv('NAV_SESSION_MAX', 256))
+# Upper bound on the memory held by all sessions' ID arrays together
+NAV_SESSION_MAX_BYTES = int(os.getenv('NAV_SESSION_MAX_BYTES', 64 * 1024 * 1024))
+# IDs fetched per query when stepping, so a few deleted sujets cost no extra round trip
+FETCH_AHEAD = 8
+
+
+def filter_key(tags, people, search):
+    """Canonical form of a filter, to tell whether a session matches a request."""
+    return (tuple(sorted(tags or ())), tuple(sorted(people or ())), (search or '').strip())
+
+
+class NavSession:
+    __slots__ = ('token', 'key', 'ids', 'expires')
+
+    def __init__(self, token, key, ids):
+        self.token = token
+        self.key = key
+        self.ids = ids
+        self.expires = time.monotonic() + NAV_SESSION_TTL
+
+    @property
+    def nbytes(self):
+        return self.ids.itemsize * len(self.ids)
+
+
+class SessionStore:
+    """Thread-safe LRU of sessions with TTL, a count limit and a byte budget."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._bytes = 0
+
+    def get(self, token):
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if session.expires < time.monotonic():
+                self._remove(token)
+                return None
+            self._sessions.move_to_end(token)
+            return session
+
+    def put(self, session):
+        with self._lock:
+            if session.token in self._sessions:
+                self._remove(session.token)
+            self._sessions[session.token] = session
+            self._bytes += session.nbytes
+            now = time.monotonic()
+            # Expired first, then least recently used, but never the one just added
+            for token in [t for t, s in self._sessions.items() if s.expires < now]:
+                self._remove(token)
+            while len(self._sessions) > 1 and (len(self._sessions) > NAV_SESSION_MAX
+                                               or self._bytes > NAV_SESSION_MAX_BYTES):
+                self._remove(next(iter(self._sessions)))
+
+    def _remove(self, token):
+        session = self._sessions.pop(token)
+        self._bytes -= session.nbytes
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'bytes': self._bytes}
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+
+
+_store = SessionStore()
+
+
+def session_token(key):
+    """Same filter, same token, in every worker."""
+    return hashlib.blake2b(json.dumps(key).encode('utf-8'), digest_size=12).hexdigest()
+
+
+def open_session(token, tags, people, search, rebuild=False):
+    """Returns the session for `token` if it matches the filter, else the filter's
+    session, built if need be. `rebuild` takes a fresh snapshot regardless."""
+    key = filter_key(tags, people, search)
+    session = _store.get(token) if token and not rebuild else None
+    if session is None or session.key != key:
+        token = session_token(key)
+        session = None if rebuild else _store.get(token)
+        if session is None:
+            ids = array('q', db_operations.get_filtered_ids(tags, people, search))
+            session = NavSession(token, key, ids)
+            _store.put(session)
+    return session
+
+
+def position_of(session, sujet_id):
+    """0-based position of `sujet_id` in the session, or None if it isn't in it."""
+    index = bisect_left(session.ids, sujet_id)
+    if index < len(session.ids) and session.ids[index] == sujet_id:
+        return index
+    return None
+
+
+def locate(ids, sujet_id, delta):
+    """(origin, target) indexes for moving `delta` matches from `sujet_id`, clamped.
+
+    `origin` is where sujet_id sits, or the gap it falls in if it doesn't match
+    the filter. Returns None if there is nothing in that direction, and for
+    delta 0 unless sujet_id is in `ids`.
+    """
+    if delta == 0:
+        index = bisect_left(ids, sujet_id)
+        return (index, index) if index < len(ids) and ids[index] == sujet_id else None
+    if delta > 0:
+        origin = bisect_right(ids, sujet_id) - 1
+        target = min(origin + delta, len(ids) - 1)
+        if target <= origin:
+            return None
+    else:
+        origin = bisect_left(ids, sujet_id)
+        target = max(origin + delta, 0)
+        if target >= origin:
+            return None
+    if not 0 <= target < len(ids):
+        return None
+    return origin, target
+
+
+def step(session, sujet_id, delta, fields=None):
+    """Moves `delta` positions from `sujet_id`, skipping sujets deleted since the snapshot.
+
+    Returns (sujet, position, moved); sujet is None if nothing is left that way.
+    """
+    if delta == 0:
+        # Like /seek: the current sujet, whether or not it matches the filter
+        sujet = db_operations.get_sujets_by_ids([sujet_id], fields).get(sujet_id)
+        return sujet, position_of(session, sujet_id) if sujet else None, 0
+    ids = session.ids
+    located = locate(ids, sujet_id, delta)
+    if located is None:
+        return None, None, 0
+    origin, target = located
+    direction = 1 if delta >= 0 else -1
+    # Try the target, then onwards past it, then back towards the origin
+    onwards = range(target, len(ids) if direction > 0 else -1, direction)
+    back = range(target - direction, origin, -direction)
+    for candidates in (onwards, back):
+        for start in range(0, len(candidates), FETCH_AHEAD):
+            chunk = candidates[start:start + FETCH_AHEAD]
+            found = db_operations.get_sujets_by_ids([ids[i] for i in chunk], fields)
+            for index in chunk:
+                if ids[index] in found:
+                    return found[ids[index]], index, abs(index - origin)
+    return None, None, 0
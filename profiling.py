@@ -0,0 +1,287 @@
+# profiling.py
+"""Opt-in per-request profiling for hunting intermittent slow requests.
+
+A request is profiled when it carries PROFILE_SECRET in the X-Weave-Profile
+header or the `_profile` query parameter, or when it falls in the
+PROFILE_SAMPLE_RATE random sample. Each capture is written to PROFILE_DIR as
+a cProfile .pstats file, a .collapsed file (one "frame;frame;frame
+microseconds" line per stack, for flamegraph.pl or speedscope) and a .json
+summary. Only the newest PROFILE_KEEP captures are kept.
+
+With neither a secret nor a sample rate configured nothing is installed at
+all, so there is no per-request cost.
+"""
+
+import cProfile
+import hmac
+import itertools
+import json
+import os
+import pstats
+import random
+import re
+import time
+from urllib.parse import parse_qs
+
+from flask import abort, request, send_from_directory
+
+from serialization import json_response
+
+# --- Configuration ---
+PROFILE_SECRET = os.getenv('PROFILE_SECRET')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+# Defaults to a profiles/ directory next to the database
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 50))
+# Collapsed stacks deeper than this are cut off (recursion guard)
+MAX_STACK_DEPTH = 64
+
+# Disambiguates captures started in the same millisecond
+_sequence = itertools.count()
+
+
+def enabled():
+    return bool(PROFILE_SECRET) or PROFILE_SAMPLE_RATE > 0
+
+
+def profile_dir():
+    if PROFILE_DIR:
+        return PROFILE_DIR
+    import db_operations
+    return os.path.join(os.path.dirname(db_operations.DATABASE_PATH), 'profiles')
+
+
+def _has_secret(provided):
+    return bool(PROFILE_SECRET and provided) and hmac.compare_digest(provided, PROFILE_SECRET)
+
+
+def profile_trigger(environ):
+    """Why this request should be profiled ('secret' or 'sample'), or None."""
+    if environ.get('PATH_INFO', '').startswith('/debug/profiles'):
+        return None  # reading captures shouldn't create new ones
+    if PROFILE_SECRET:
+        provided = environ.get('HTTP_X_WEAVE_PROFILE')
+        if provided is None and '_profile' in environ.get('QUERY_STRING', ''):
+            provided = parse_qs(environ['QUERY_STRING']).get('_profile', [None])[0]
+        if _has_secret(provided):
+            return 'secret'
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sample'
+    return None
+
+# --- Output ---
+
+
+def _frame_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # built-in, e.g. <method 'execute' of 'sqlite3.Connection' objects>
+    return f"{os.path.basename(filename)}:{name}:{line}"
+
+
+def collapsed_stacks(stats):
+    """Approximate collapsed stacks from cProfile's caller/callee graph.
+
+    cProfile records edges, not full stacks, so each function's time is split
+    among its callees in proportion to the time spent through each edge.
+    Returns {"a;b;c": microseconds}.
+    """
+    callees = {}
+    for func, (_cc, _nc, _tt, _ct, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = [func for func, entry in stats.stats.items() if not entry[4]]
+
+    stacks = {}
+
+    def walk(func, path, budget):
+        _cc, _nc, tt, ct, _callers = stats.stats[func]
+        if ct <= 0 or budget <= 0:
+            return
+        scale = budget / ct
+        path = path + [_frame_name(func)]
+        self_time = tt * scale
+        if self_time > 0:
+            key = ';'.join(path)
+            stacks[key] = stacks.get(key, 0) + self_time
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_ct in callees.get(func, ()):
+            if _frame_name(callee) not in path:
+                walk(callee, path, edge_ct * scale)
+
+    for root in roots:
+        walk(root, [], stats.stats[root][3])
+    return {stack: int(seconds * 1e6) for stack, seconds in stacks.items() if seconds >= 1e-6}
+
+
+def prune(directory, keep):
+    """Deletes all but the newest `keep` captures."""
+    captures = sorted(name[:-len('.json')] for name in os.listdir(directory) if name.endswith('.json'))
+    for stem in captures[:-keep] if keep > 0 else captures:
+        for suffix in ('.json', '.pstats', '.collapsed'):
+            try:
+                os.remove(os.path.join(directory, stem + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def save_profile(profiler, meta):
+    """Writes one capture (pstats, collapsed stacks, summary) and trims the ring."""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    route = re.sub(r'[^A-Za-z0-9]+', '_', meta['path']).strip('_') or 'root'
+    # Timestamp first so names sort chronologically
+    stem = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(meta['ts']))}-{int(meta['ts'] * 1000) % 1000:03d}" \
+           f"-{os.getpid()}-{next(_sequence)}-{meta['method']}-{route[:40]}"
+    stats = pstats.Stats(profiler)
+    stats.dump_stats(os.path.join(directory, stem + '.pstats'))
+    with open(os.path.join(directory, stem + '.collapsed'), 'w') as f:
+        for stack, micros in sorted(collapsed_stacks(stats).items()):
+            f.write(f"{stack} {micros}\n")
+    with open(os.path.join(directory, stem + '.json'), 'w') as f:
+        json.dump(dict(meta, name=stem), f)
+    prune(directory, PROFILE_KEEP)
+    print(f"[PROFILE] {meta['method']} {meta['path']} {meta['ms']:.1f} ms -> {stem}")
+
+
+class ProfiledBody:
+    """A response body iterated with the profiler on only while the app makes
+    each chunk. Streamed responses pass through chunk by chunk instead of
+    being buffered, and the time spent sending to the client isn't profiled.
+    `finish` runs once, when the body is exhausted or closed."""
+
+    def __init__(self, body, profiler, finish):
+        self.body = body
+        self.profiler = profiler
+        self.finish = finish
+        self.finished = False
+        self.profiler.enable()
+        try:
+            self.iterator = iter(body)
+        finally:
+            self.profiler.disable()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.profiler.enable()
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            self.profiler.disable()
+            self._finish()
+            raise
+        finally:
+            self.profiler.disable()
+
+    def _finish(self):
+        if not self.finished:
+            self.finished = True
+            self.finish()
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.profiler.enable()
+                try:
+                    self.body.close()
+                finally:
+                    self.profiler.disable()
+        finally:
+            self._finish()
+
+
+class ProfilingMiddleware:
+    """WSGI wrapper that runs selected requests, body included, under cProfile."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        trigger = profile_trigger(environ)
+        if trigger is None:
+            return self.wsgi_app(environ, start_response)
+
+        status = []
+
+        def capture_status(status_line, headers, exc_info=None):
+            status.append(status_line)
+            return start_response(status_line, headers, exc_info)
+
+        profiler = cProfile.Profile()
+        started = time.time()
+        start = time.perf_counter()
+
+        def finish():
+            # Wall time until the body was closed, i.e. fully sent for streams
+            elapsed = time.perf_counter() - start
+            try:
+                save_profile(profiler, {
+                    'ts': started,
+                    'method': environ.get('REQUEST_METHOD', ''),
+                    'path': environ.get('PATH_INFO', ''),
+                    'query': re.sub(r'(^|&)_profile=[^&]*', '', environ.get('QUERY_STRING', '')).lstrip('&'),
+                    'status': status[0].split(' ', 1)[0] if status else '',
+                    'ms': round(elapsed * 1000, 2),
+                    'trigger': trigger,
+                })
+            except Exception as e:
+                print(f"Error saving profile: {e}")
+
+        profiler.enable()
+        try:
+            body = self.wsgi_app(environ, capture_status)
+        except BaseException:
+            profiler.disable()
+            finish()
+            raise
+        profiler.disable()
+        return ProfiledBody(body, profiler, finish)
+
+# --- Routes ---
+
+
+def _require_secret():
+    provided = request.headers.get('X-Weave-Profile') or request.args.get('_profile')
+    if not _has_secret(provided):
+        abort(404)
+
+
+def list_profiles():
+    """Recent captures, newest first."""
+    _require_secret()
+    directory = profile_dir()
+    captures = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory), reverse=True):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(directory, name)) as f:
+                        captures.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+    return json_response({'status': 'ok', 'profiles': captures})
+
+
+def download_profile(filename):
+    _require_secret()
+    if not filename.endswith(('.pstats', '.collapsed', '.json')):
+        abort(404)
+    return send_from_directory(profile_dir(), filename, as_attachment=True)
+
+# --- Registration Functions ---
+
+
+def register_profiling(app):
+    """Wraps the app in ProfilingMiddleware and adds /debug/profiles, if configured.
+
+    The listing needs PROFILE_SECRET; with only a sample rate, read PROFILE_DIR directly.
+    """
+    if not enabled():
+        return
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app)
+    if PROFILE_SECRET:
+        app.add_url_rule('/debug/profiles', 'list_profiles', list_profiles)
+        app.add_url_rule('/debug/profiles/<path:filename>', 'download_profile', download_profile)
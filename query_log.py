@@ -0,0 +1,184 @@
+# query_log.py
+"""Slow-query log: statements over a latency threshold, grouped by query shape.
+
+build_sujet_query emits a different statement for every filter mix, so each
+statement is reduced to a fingerprint (literals and repeated OR terms
+collapsed). Slow executions are appended to a JSONL file together with the
+shape's EXPLAIN QUERY PLAN and whether it scans a whole table;
+`flask query-report` summarises the log.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import statistics
+import threading
+import time
+
+import click
+
+# --- Configuration ---
+# Statements at least this slow are logged; a negative value disables the log.
+# 0 logs everything, which is handy for a short profiling session.
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 50))
+# Defaults to slow_queries.jsonl next to the database
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG')
+
+ENABLED = SLOW_QUERY_MS >= 0
+THRESHOLD_S = SLOW_QUERY_MS / 1000 if ENABLED else float('inf')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+# "x LIKE ? OR x LIKE ? OR x LIKE ?" -> "x LIKE ?": one tag or three is the same shape
+_REPEATED_OR = re.compile(r'(\b[\w.]+ LIKE \?)(?: OR \1)+')
+
+_write_lock = threading.Lock()
+# fingerprint -> (plan details, full_scan), so EXPLAIN runs once per shape per process
+_plans = {}
+
+
+def normalize(sql):
+    """The statement's shape: whitespace, literals and repeated OR terms collapsed."""
+    shape = ' '.join(sql.split())
+    shape = _STRING_LITERAL.sub('?', shape)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    return _REPEATED_OR.sub(r'\1', shape)
+
+
+def _digest(shape):
+    return hashlib.sha1(shape.encode('utf-8')).hexdigest()[:12]
+
+
+def fingerprint(sql):
+    """Short stable ID of the statement's shape."""
+    return _digest(normalize(sql))
+
+
+def log_path():
+    if SLOW_QUERY_LOG:
+        return SLOW_QUERY_LOG
+    import db_operations  # deferred: db_operations imports this module via metrics
+    return os.path.join(os.path.dirname(db_operations.DATABASE_PATH), 'slow_queries.jsonl')
+
+
+def explain(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN details and whether any step reads a whole table."""
+    # Bypass any instrumented execute() so the EXPLAIN itself isn't logged
+    rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    details = [row[3] for row in rows]
+    full_scan = any(detail.startswith('SCAN ') and not detail.startswith('SCAN CONSTANT ROW')
+                    for detail in details)
+    return details, full_scan
+
+
+def record_slow(conn, sql, parameters, elapsed, operation):
+    """Appends one slow execution to the log. Never raises into the caller.
+
+    `parameters` is None for executemany(), whose plan isn't captured.
+    """
+    try:
+        shape = normalize(sql)
+        key = _digest(shape)
+        if key not in _plans:
+            plan = ([], False)
+            if parameters is not None and shape.split(None, 1)[0].upper() in (
+                    'SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT'):
+                plan = explain(conn, sql, parameters)
+            _plans[key] = plan
+        details, full_scan = _plans[key]
+        entry = {
+            'ts': round(time.time(), 3),
+            'fingerprint': key,
+            'operation': operation,
+            'ms': round(elapsed * 1000, 3),
+            'full_scan': full_scan,
+            'plan': details,
+            'shape': shape,
+        }
+        line = json.dumps(entry) + '\n'
+        path = log_path()
+        with _write_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Single small appends keep lines intact across worker processes
+            with open(path, 'a') as f:
+                f.write(line)
+        print(f"[SLOW QUERY] {entry['ms']:.1f} ms {operation} {key}"
+              f"{' FULL SCAN' if full_scan else ''}")
+    except Exception as e:
+        print(f"Error recording slow query: {e}")
+
+
+def read_log(path):
+    entries = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # a torn final line
+    return entries
+
+
+def summarise(entries):
+    """Per-fingerprint stats, worst (most total time) first."""
+    groups = {}
+    for entry in entries:
+        groups.setdefault(entry['fingerprint'], []).append(entry)
+    summary = []
+    for key, group in groups.items():
+        durations = sorted(e['ms'] for e in group)
+
+        def pct(p):
+            return durations[min(len(durations) - 1, int(len(durations) * p))]
+        latest = group[-1]
+        summary.append({
+            'fingerprint': key,
+            'count': len(group),
+            'total_ms': round(sum(durations), 1),
+            'p50_ms': round(statistics.median(durations), 1),
+            'p95_ms': round(pct(0.95), 1),
+            'p99_ms': round(pct(0.99), 1),
+            'max_ms': round(durations[-1], 1),
+            'operations': sorted({e['operation'] for e in group}),
+            'full_scan': latest['full_scan'],
+            'plan': latest['plan'],
+            'shape': latest['shape'],
+        })
+    summary.sort(key=lambda row: row['total_ms'], reverse=True)
+    return summary
+
+# --- CLI Commands ---
+
+
+@click.command('query-report')
+@click.option('--log', 'path', default=None, help='Slow-query log (default: next to the database).')
+@click.option('--top', default=10, show_default=True, help='Number of shapes to show.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the summary as JSON.')
+def query_report_command(path, top, as_json):
+    """Summarises the slow-query log by statement shape."""
+    path = path or log_path()
+    if not os.path.exists(path):
+        print(f"No slow-query log at {path}")
+        return
+    summary = summarise(read_log(path))[:top]
+    if as_json:
+        print(json.dumps(summary, indent=2))
+        return
+    for row in summary:
+        print(f"{row['fingerprint']}  {row['count']}x  total {row['total_ms']} ms  "
+              f"p50 {row['p50_ms']}  p95 {row['p95_ms']}  p99 {row['p99_ms']}  max {row['max_ms']}"
+              f"{'  FULL SCAN' if row['full_scan'] else ''}")
+        print(f"    from: {', '.join(row['operations'])}")
+        print(f"    {row['shape']}")
+        for detail in row['plan']:
+            print(f"    plan: {detail}")
+        print()
+
+# --- Registration Functions ---
+
+
+def register_query_log(app):
+    """Registers the query-report CLI command."""
+    app.cli.add_command(query_report_command)
@@ -0,0 +1,238 @@
+# replication.py
+"""Read replicas of the sujets database, refreshed by `flask replicate`.
+
+The replicator polls the primary's content counter (sujets_meta
+content_version) and, when it moved, copies the database into each replica
+file with backup.copy_database. View count bumps move only data_version, and
+every dwell beacon makes one, so copying on those would copy the whole file
+on almost every check; they are picked up by the next content copy, or at
+most REPLICA_VIEW_SYNC_SECONDS late. After every check the replicator stamps
+the replica with the time its content was last known to match the primary,
+which is what replica lag is measured from.
+
+So a replica may lag on view counts (and the data-version ETags that
+include them) by up to REPLICA_VIEW_SYNC_SECONDS, and on everything else by
+REPLICATION_INTERVAL plus the copy time, which REPLICA_MAX_LAG bounds.
+
+A web process started with READ_REPLICA_PATH serves the read-only routes in
+REPLICA_ENDPOINTS from that file, so extra read-serving processes don't take
+locks on the primary. Writes always go to the primary; a client that wrote in
+the last REPLICA_STICKY_SECONDS keeps reading from the primary so it sees its
+own changes, and a replica lagging more than REPLICA_MAX_LAG is skipped.
+
+    REPLICA_PATHS=/srv/weave/replica1.db flask replicate --interval 2
+    READ_REPLICA_PATH=/srv/weave/replica1.db gunicorn app:app
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import click
+from flask import g, request
+
+import backup
+import db_operations
+import metrics
+
+# --- Configuration ---
+# Replica files kept up to date by `flask replicate`
+REPLICA_PATHS = [p.strip() for p in os.getenv('REPLICA_PATHS', '').split(',') if p.strip()]
+REPLICATION_INTERVAL = float(os.getenv('REPLICATION_INTERVAL', '2'))
+# Longest a replica goes without the primary's view counts
+REPLICA_VIEW_SYNC_SECONDS = float(os.getenv('REPLICA_VIEW_SYNC_SECONDS', '300'))
+# Replica this web process reads from (unset: everything reads the primary)
+READ_REPLICA_PATH = os.getenv('READ_REPLICA_PATH')
+# Seconds behind the primary after which reads go back to the primary
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '30'))
+# A client that wrote this recently reads from the primary (read-your-writes)
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+# Read-only endpoints that may be served from the replica
+REPLICA_ENDPOINTS = set(os.getenv(
+    'REPLICA_ENDPOINTS',
+    'get_sujet,get_sujets_count,get_sujet_by_id_route,get_random_sujet,first,last,'
+    'get_all_tags,get_all_people,get_first_sujet,get_last_sujet,adjacent_sujet,seek,export'
+).split(','))
+# How long a process trusts its last look at the replica's lag
+LAG_CHECK_SECONDS = 1.0
+
+STICKY_COOKIE = 'weave_wrote'
+SYNCED_AT_KEY = 'replica_synced_at'
+COPIED_AT_KEY = 'replica_copied_at'
+
+# --- Replication ---
+
+
+def primary_state(conn):
+    """{key: value} of a database's epoch and version counters, or None without a schema."""
+    try:
+        return dict(conn.execute(
+            "SELECT key, value FROM sujets_meta WHERE key IN ('epoch', 'content_version', 'data_version', ?)",
+            (COPIED_AT_KEY,)))
+    except sqlite3.OperationalError:
+        return None
+
+
+def needs_copy(primary, replica, now):
+    """Whether a replica in state `replica` must be recopied from `primary`."""
+    if not primary or not replica:
+        return True
+    if any(primary.get(key) != replica.get(key) for key in ('epoch', 'content_version')):
+        return True
+    # Only view counts moved: batch them up
+    return (primary.get('data_version') != replica.get('data_version')
+            and now - replica.get(COPIED_AT_KEY, 0) / 1000 >= REPLICA_VIEW_SYNC_SECONDS)
+
+
+def synced_at(replica_path):
+    """When the replica was last known to match the primary (epoch seconds), or None."""
+    if not os.path.exists(replica_path):
+        return None
+    conn = sqlite3.connect(f'file:{replica_path}?mode=ro', uri=True, timeout=1)
+    try:
+        row = conn.execute("SELECT value FROM sujets_meta WHERE key = ?", (SYNCED_AT_KEY,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    return row[0] / 1000 if row else None
+
+
+def replica_lag(replica_path):
+    """Seconds since the replica was last in sync, or None if it never was."""
+    at = synced_at(replica_path)
+    return None if at is None else max(0.0, time.time() - at)
+
+
+def sync_replica(primary_path, replica_path):
+    """Brings one replica up to date. Returns the copy stats, or None if it was current
+    (or behind on view counts only, for less than REPLICA_VIEW_SYNC_SECONDS)."""
+    checked_at = time.time()
+    primary = sqlite3.connect(primary_path, timeout=backup.LOCK_TIMEOUT)
+    try:
+        state = primary_state(primary)
+    finally:
+        primary.close()
+
+    replica = sqlite3.connect(replica_path, timeout=backup.LOCK_TIMEOUT)
+    try:
+        stats = None
+        stamps = [(SYNCED_AT_KEY, int(checked_at * 1000))]
+        if needs_copy(state, primary_state(replica), checked_at):
+            stats = backup.copy_database(primary_path, replica_path)
+            stamps.append((COPIED_AT_KEY, int(checked_at * 1000)))
+        # The copy holds at least the content the primary had at checked_at
+        replica.executemany("INSERT OR REPLACE INTO sujets_meta (key, value) VALUES (?, ?)", stamps)
+        replica.commit()
+    finally:
+        replica.close()
+    return stats
+
+
+def sync_replicas(primary_path=None, replica_paths=None):
+    """One replication round over every replica. Returns {path: stats or None}."""
+    primary_path = primary_path or db_operations.DATABASE_PATH
+    results = {}
+    for path in replica_paths or REPLICA_PATHS:
+        try:
+            results[path] = sync_replica(primary_path, path)
+        except sqlite3.Error as e:
+            print(f"[REPLICA] Failed to update {path}: {e}")
+            results[path] = e
+    return results
+
+# --- Read Routing ---
+
+_lag_cache = {'checked': 0.0, 'fresh': False}
+_lag_lock = threading.Lock()
+
+
+def replica_is_fresh():
+    """Whether READ_REPLICA_PATH is within REPLICA_MAX_LAG, checked at most once per LAG_CHECK_SECONDS."""
+    now = time.monotonic()
+    with _lag_lock:
+        if now - _lag_cache['checked'] < LAG_CHECK_SECONDS:
+            return _lag_cache['fresh']
+    lag = replica_lag(READ_REPLICA_PATH)
+    fresh = lag is not None and lag <= REPLICA_MAX_LAG
+    with _lag_lock:
+        _lag_cache.update(checked=now, fresh=fresh)
+    return fresh
+
+
+def wrote_recently():
+    try:
+        return time.time() - float(request.cookies.get(STICKY_COOKIE, 0)) < REPLICA_STICKY_SECONDS
+    except ValueError:
+        return False
+
+
+def route_reads():
+    """before_request hook: points get_db at the replica for eligible reads."""
+    if (READ_REPLICA_PATH and request.method in ('GET', 'HEAD') and request.endpoint in REPLICA_ENDPOINTS
+            and not wrote_recently() and replica_is_fresh()):
+        conn = sqlite3.connect(f'file:{READ_REPLICA_PATH}?mode=ro', uri=True,
+                               factory=metrics.connection_class())
+        conn.row_factory = sqlite3.Row
+        g.replica_db = conn
+
+
+def mark_writes(response):
+    """after_request hook: pins a client that just wrote to the primary for a while."""
+    if READ_REPLICA_PATH and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+        response.set_cookie(STICKY_COOKIE, str(int(time.time())),
+                            max_age=REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+    return response
+
+
+def close_replica(exception):
+    conn = g.pop('replica_db', None)
+    if conn is not None:
+        conn.close()
+
+
+def lag_gauge():
+    """Samples for weave_replica_lag_seconds."""
+    paths = dict.fromkeys(REPLICA_PATHS + ([READ_REPLICA_PATH] if READ_REPLICA_PATH else []))
+    samples = []
+    for path in paths:
+        lag = replica_lag(path)
+        if lag is not None:
+            samples.append(((('replica', os.path.basename(path)),), round(lag, 3)))
+    return samples
+
+# --- CLI Commands ---
+
+
+@click.command('replicate')
+@click.option('--replica', 'replicas', multiple=True, help='Replica file (default: REPLICA_PATHS).')
+@click.option('--interval', type=float, default=None, help='Seconds between checks (default: REPLICATION_INTERVAL).')
+@click.option('--once', is_flag=True, help='Run one round and exit.')
+def replicate_command(replicas, interval, once):
+    """Keeps the replica files in step with the primary database."""
+    replicas = list(replicas) or REPLICA_PATHS
+    if not replicas:
+        raise click.UsageError('No replicas: pass --replica or set REPLICA_PATHS.')
+    interval = REPLICATION_INTERVAL if interval is None else interval
+    print(f"[REPLICA] {db_operations.DATABASE_PATH} -> {', '.join(replicas)}")
+    while True:
+        for path, stats in sync_replicas(replica_paths=replicas).items():
+            if isinstance(stats, dict):
+                print(f"[REPLICA] Copied {stats['bytes'] / (1 << 20):.1f} MB to {path} "
+                      f"in {stats['seconds']:.2f}s")
+        if once:
+            return
+        time.sleep(interval)
+
+# --- Registration Functions ---
+
+
+def register_replication(app):
+    """Registers `flask replicate`, the lag metric and read routing (a no-op without READ_REPLICA_PATH)."""
+    app.cli.add_command(replicate_command)
+    metrics.register_gauge('weave_replica_lag_seconds',
+                           'Seconds since each replica was last known to match the primary.', lag_gauge)
+    app.before_request(route_reads)
+    app.after_request(mark_writes)
+    app.teardown_appcontext(close_replica)
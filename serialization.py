@@ -0,0 +1,87 @@
+# serialization.py
+"""Sujet record type and the JSON encoding used by every API response."""
+
+import json
+import sqlite3
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
+
+# Canonical column order of a sujet as returned by the API
+SUJET_COLUMNS = ('id', 'original_sujet', 'ai_suggestion', 'view_count', 'user_notes',
+                 'user_tags', 'status', 'person', 'date_created')
+
+
+class Sujet:
+    """One row of the sujets table.
+
+    Holds only the columns the query selected (listed in `_fields`), and still
+    supports `sujet['id']` and `dict(sujet)` so it can stand in for sqlite3.Row.
+    """
+    __slots__ = ('_fields',) + SUJET_COLUMNS
+
+    def __init__(self, **values):
+        self._fields = tuple(values)
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def from_row(cls, row):
+        """Builds a Sujet straight from a sqlite3.Row (None passes through)."""
+        if row is None:
+            return None
+        sujet = cls.__new__(cls)
+        sujet._fields = tuple(row.keys())
+        for name, value in zip(sujet._fields, row):
+            setattr(sujet, name, value)
+        return sujet
+
+    def keys(self):
+        return self._fields
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def to_dict(self):
+        """Plain dict for JSON, with NULL columns sent as '' like the UI expects."""
+        result = {}
+        for name in self._fields:
+            value = getattr(self, name)
+            result[name] = '' if value is None else value
+        return result
+
+    def __repr__(self):
+        return f"Sujet(id={getattr(self, 'id', None)!r})"
+
+
+def _default(obj):
+    """Hook for types the JSON encoders don't know natively."""
+    if isinstance(obj, Sujet):
+        return obj.to_dict()
+    if isinstance(obj, sqlite3.Row):
+        return Sujet.from_row(obj).to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def stdlib_dumps(payload):
+    """Encodes `payload` to compact UTF-8 JSON bytes with the json module."""
+    return json.dumps(payload, default=_default, separators=(',', ':'),
+                      ensure_ascii=False).encode('utf-8')
+
+
+def orjson_dumps(payload):
+    """Encodes `payload` to JSON bytes with orjson (requires orjson)."""
+    return orjson.dumps(payload, default=_default)
+
+
+dumps = orjson_dumps if orjson else stdlib_dumps
+
+
+def json_response(payload, status=200):
+    """Drop-in replacement for jsonify that encodes in a single pass."""
+    return current_app.response_class(dumps(payload), status=status,
+                                      mimetype='application/json')
@@ -0,0 +1,446 @@
+// weave_webapp/static/offline_store.js
+//
+// Offline-first client store. Keeps a mirror of the corpus in IndexedDB, kept
+// current through /changes, so navigation and filtering run locally. Writes go
+// through a mutation queue: they are applied to the mirror at once and replayed
+// to /mutations with idempotency keys whenever the network allows.
+//
+// Loaded by the page (before script.js) and by the service worker
+// (importScripts), which flushes the queue on Background Sync.
+
+(function (global) {
+    'use strict';
+
+    const DB_NAME = 'weave';
+    const DB_VERSION = 1;
+    const SYNC_PAGE_SIZE = 1000;
+    // Must not exceed MUTATION_BATCH_MAX in mutations.py
+    const FLUSH_BATCH_SIZE = 50;
+    const SYNC_TAG = 'weave-mutations';
+
+    let dbPromise = null;
+    // In-memory copy of the mirror (page only): id -> sujet, plus ids in navigation order
+    const sujets = new Map();
+    let orderedIds = [];
+    let mirrorLoaded = false;
+    let synced = false;
+    let flushing = null;
+    let syncing = null;
+    const remapListeners = [];
+    const changeListeners = [];
+
+    // --- IndexedDB Helpers ---
+
+    function openDb() {
+        if (!dbPromise) {
+            dbPromise = new Promise((resolve, reject) => {
+                if (!global.indexedDB) {
+                    reject(new Error('IndexedDB is not available'));
+                    return;
+                }
+                const request = global.indexedDB.open(DB_NAME, DB_VERSION);
+                request.onupgradeneeded = () => {
+                    const db = request.result;
+                    db.createObjectStore('sujets', { keyPath: 'id' });
+                    db.createObjectStore('meta');
+                    db.createObjectStore('mutations', { keyPath: 'seq', autoIncrement: true });
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return dbPromise;
+    }
+
+    function requestResult(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function transactionDone(tx) {
+        return new Promise((resolve, reject) => {
+            tx.oncomplete = () => resolve();
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error);
+        });
+    }
+
+    async function getMeta(key) {
+        const db = await openDb();
+        return requestResult(db.transaction('meta').objectStore('meta').get(key));
+    }
+
+    // --- In-Memory Mirror ---
+
+    // Sujets added offline carry negative temporary IDs; the server will give
+    // them the next ID, so they sort after every real one, in creation order.
+    function orderKey(id) {
+        return id < 0 ? 2 ** 52 - id : id;
+    }
+
+    function rebuildOrder() {
+        orderedIds = Array.from(sujets.keys()).sort((a, b) => orderKey(a) - orderKey(b));
+    }
+
+    function putLocal(sujet) {
+        const isNew = !sujets.has(sujet.id);
+        sujets.set(sujet.id, sujet);
+        if (isNew) rebuildOrder();
+    }
+
+    function deleteLocal(id) {
+        if (sujets.delete(id)) rebuildOrder();
+    }
+
+    async function loadMirror() {
+        const db = await openDb();
+        const all = await requestResult(db.transaction('sujets').objectStore('sujets').getAll());
+        sujets.clear();
+        all.forEach(sujet => sujets.set(sujet.id, sujet));
+        rebuildOrder();
+        mirrorLoaded = true;
+        synced = (await getMeta('version')) !== undefined;
+    }
+
+    function notifyChange() {
+        changeListeners.forEach(listener => listener());
+    }
+
+    // --- Filtering (mirrors build_sujet_query in db_operations.py) ---
+
+    function contains(value, term) {
+        // SQLite LIKE is case-insensitive for ASCII
+        return (value || '').toString().toLowerCase().includes(term.toLowerCase());
+    }
+
+    function matches(sujet, filters) {
+        const tags = (filters.tags || []).map(t => t.trim()).filter(Boolean);
+        const people = (filters.people || []).map(p => p.trim()).filter(Boolean);
+        const search = (filters.search || '').trim();
+        if (tags.length && !tags.some(tag => contains(sujet.user_tags, tag))) return false;
+        if (people.length && !people.some(person => contains(sujet.person, person))) return false;
+        if (search && !contains(sujet.original_sujet, search) && !contains(sujet.user_notes, search)) return false;
+        return true;
+    }
+
+    function filteredIds(filters) {
+        return orderedIds.filter(id => matches(sujets.get(id), filters));
+    }
+
+    function adjacent(id, direction, filters) {
+        const ids = filteredIds(filters);
+        const key = orderKey(id);
+        if (direction === 'next') {
+            const found = ids.find(other => orderKey(other) > key);
+            return found === undefined ? null : sujets.get(found);
+        }
+        for (let i = ids.length - 1; i >= 0; i--) {
+            if (orderKey(ids[i]) < key) return sujets.get(ids[i]);
+        }
+        return null;
+    }
+
+    // The sujet at `index` in /get_sujet's order (date_created, then id)
+    function at(index, filters) {
+        const ids = filteredIds(filters).sort((a, b) => {
+            const dateA = sujets.get(a).date_created || '';
+            const dateB = sujets.get(b).date_created || '';
+            return dateA < dateB ? -1 : dateA > dateB ? 1 : orderKey(a) - orderKey(b);
+        });
+        return index >= 0 && index < ids.length ? sujets.get(ids[index]) : null;
+    }
+
+    function edge(which, filters) {
+        const ids = filteredIds(filters);
+        if (!ids.length) return null;
+        return sujets.get(which === 'first' ? ids[0] : ids[ids.length - 1]);
+    }
+
+    function randomSujet() {
+        if (!orderedIds.length) return null;
+        return sujets.get(orderedIds[Math.floor(Math.random() * orderedIds.length)]);
+    }
+
+    // --- Sync (pull) ---
+
+    // Applies one /changes page and its cursor in a single IndexedDB transaction
+    async function applyChanges(changes, reset, version) {
+        const db = await openDb();
+        const tx = db.transaction(['sujets', 'meta'], 'readwrite');
+        const store = tx.objectStore('sujets');
+        if (reset) {
+            store.clear();
+            sujets.clear();
+            orderedIds = [];
+        }
+        for (const change of changes) {
+            if (change.op === 'delete') {
+                store.delete(change.id);
+                sujets.delete(change.id);
+            } else {
+                store.put(change.sujet);
+                sujets.set(change.sujet.id, change.sujet);
+            }
+        }
+        // Once per page rather than per row: a first sync brings the whole corpus
+        rebuildOrder();
+        tx.objectStore('meta').put(version, 'version');
+        return transactionDone(tx);
+    }
+
+    async function pullChanges() {
+        let since = (await getMeta('version')) || 0;
+        // Later pages of a full sync may sit below the server's sync floor
+        let resync = false;
+        for (;;) {
+            const response = await fetch(`/changes?since=${since}&limit=${SYNC_PAGE_SIZE}${resync ? '&resync=1' : ''}`,
+                { cache: 'no-store' });
+            if (!response.ok) throw new Error(`/changes answered ${response.status}`);
+            const data = await response.json();
+            await applyChanges(data.changes, data.reset, data.next);
+            resync = resync || data.reset || since === 0;
+            since = data.next;
+            if (!data.more) break;
+        }
+        synced = true;
+    }
+
+    // Flushes queued writes first, so server state doesn't overwrite them, then
+    // pulls everything changed since the last sync.
+    function sync() {
+        if (!syncing) {
+            syncing = (async () => {
+                try {
+                    await flush();
+                    if (await pendingCount() > 0) return false; // still offline
+                    await pullChanges();
+                    notifyChange();
+                    return true;
+                } catch (error) {
+                    console.warn('[OFFLINE] Sync failed:', error);
+                    return false;
+                } finally {
+                    syncing = null;
+                }
+            })();
+        }
+        return syncing;
+    }
+
+    // --- Mutation Queue (push) ---
+
+    function newKey() {
+        if (global.crypto && global.crypto.randomUUID) return global.crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+
+    // -1, -2, ... kept in meta so ids stay unique across reloads and tabs (the
+    // caller's readwrite transaction serialises them); never above a stored one
+    async function nextTempId(tx) {
+        const meta = tx.objectStore('meta');
+        const lowest = await requestResult(tx.objectStore('sujets').openCursor());
+        const last = Math.min((await requestResult(meta.get('temp_id'))) || 0, lowest ? lowest.key : 0, 0);
+        meta.put(last - 1, 'temp_id');
+        return last - 1;
+    }
+
+    function todayString() {
+        return new Date().toISOString().slice(0, 10);
+    }
+
+    // Same rule as update_sujet_title in db_operations.py
+    function retitle(original, id, title) {
+        const separator = (original || '').indexOf(' - ');
+        if ((original || '').startsWith('ID:') && separator > 0) {
+            return original.slice(0, separator + 3) + title;
+        }
+        return `ID: ${id} - ${title}`;
+    }
+
+    // Applies a mutation to a stored sujet, returning the new version (null = deleted)
+    function applyLocally(sujet, mutation) {
+        switch (mutation.op) {
+            case 'save':
+                return Object.assign({}, sujet, {
+                    user_notes: mutation.user_notes,
+                    user_tags: mutation.user_tags,
+                    person: mutation.person
+                });
+            case 'skip':
+                return Object.assign({}, sujet, { status: 'skipped' });
+            case 'title':
+                return Object.assign({}, sujet, { original_sujet: retitle(sujet.original_sujet, sujet.id, mutation.title) });
+            case 'delete':
+                return null;
+            default:
+                return sujet;
+        }
+    }
+
+    // Queues a write and applies it to the mirror. Resolves to the sujet as it
+    // now looks locally (a placeholder with a negative id for 'add'), or null.
+    async function mutate(mutation) {
+        const db = await openDb();
+        const entry = Object.assign({ key: newKey() }, mutation);
+        const tx = db.transaction(['sujets', 'mutations', 'meta'], 'readwrite');
+        const store = tx.objectStore('sujets');
+        let result = null;
+        if (entry.op === 'add') {
+            entry.temp_id = await nextTempId(tx);
+            result = {
+                id: entry.temp_id, original_sujet: `ID: new - ${entry.title}`, ai_suggestion: '',
+                view_count: 1, user_notes: '', user_tags: '', status: 'new', person: '', date_created: todayString()
+            };
+            store.put(result);
+            putLocal(result);
+        } else {
+            const current = sujets.get(entry.id) || await requestResult(store.get(entry.id));
+            if (current) {
+                result = applyLocally(current, entry);
+                if (result) {
+                    store.put(result);
+                    putLocal(result);
+                } else {
+                    store.delete(entry.id);
+                    deleteLocal(entry.id);
+                }
+            }
+        }
+        tx.objectStore('mutations').add(entry);
+        await transactionDone(tx);
+        flush().catch(() => requestBackgroundSync());
+        return result;
+    }
+
+    async function pendingCount() {
+        const db = await openDb();
+        return requestResult(db.transaction('mutations').objectStore('mutations').count());
+    }
+
+    async function queuedMutations() {
+        const db = await openDb();
+        return requestResult(db.transaction('mutations').objectStore('mutations').getAll());
+    }
+
+    // Replaces an offline placeholder with the server's sujet and points queued
+    // mutations that referenced the temporary id at the real one.
+    async function remapTempId(tempId, sujet) {
+        const db = await openDb();
+        const tx = db.transaction(['sujets', 'mutations'], 'readwrite');
+        tx.objectStore('sujets').delete(tempId);
+        tx.objectStore('sujets').put(sujet);
+        const queue = tx.objectStore('mutations');
+        const pending = await requestResult(queue.getAll());
+        pending.filter(entry => entry.id === tempId).forEach(entry => {
+            entry.id = sujet.id;
+            queue.put(entry);
+        });
+        await transactionDone(tx);
+        if (mirrorLoaded) {
+            deleteLocal(tempId);
+            putLocal(sujet);
+        }
+        remapListeners.forEach(listener => listener(tempId, sujet));
+    }
+
+    // Drops the placeholder of an add the server rejected
+    async function discardPlaceholder(tempId) {
+        const db = await openDb();
+        const tx = db.transaction('sujets', 'readwrite');
+        tx.objectStore('sujets').delete(tempId);
+        await transactionDone(tx);
+        if (mirrorLoaded) deleteLocal(tempId);
+    }
+
+    async function sendBatch(batch) {
+        const response = await fetch('/mutations', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ mutations: batch.map(({ seq, temp_id, ...mutation }) => mutation) })
+        });
+        if (!response.ok) throw new Error(`/mutations answered ${response.status}`);
+        return (await response.json()).results;
+    }
+
+    async function removeQueued(seqs) {
+        const db = await openDb();
+        const tx = db.transaction('mutations', 'readwrite');
+        seqs.forEach(seq => tx.objectStore('mutations').delete(seq));
+        await transactionDone(tx);
+    }
+
+    // Sends the queue in order. A batch stops after an 'add', since later
+    // entries may refer to its temporary id, which is only remapped once the
+    // server has answered. Failed entries are dropped (they would fail again);
+    // network errors leave the queue for the next attempt.
+    function flush() {
+        if (!flushing) {
+            flushing = (async () => {
+                try {
+                    for (;;) {
+                        const queue = await queuedMutations();
+                        if (!queue.length) return;
+                        let end = queue.findIndex(entry => entry.op === 'add');
+                        end = end === -1 ? queue.length : end + 1;
+                        const batch = queue.slice(0, Math.min(end, FLUSH_BATCH_SIZE));
+                        const results = await sendBatch(batch);
+                        for (let i = 0; i < batch.length; i++) {
+                            const result = results[i];
+                            if (result.status !== 'ok') {
+                                console.warn(`[OFFLINE] ${batch[i].op} rejected by server:`, result.message);
+                                if (batch[i].op === 'add') await discardPlaceholder(batch[i].temp_id);
+                            } else if (batch[i].op === 'add' && result.sujet) {
+                                await remapTempId(batch[i].temp_id, result.sujet);
+                            }
+                        }
+                        await removeQueued(batch.map(entry => entry.seq));
+                    }
+                } finally {
+                    flushing = null;
+                }
+            })();
+        }
+        return flushing;
+    }
+
+    function requestBackgroundSync() {
+        const serviceWorker = global.navigator && global.navigator.serviceWorker;
+        if (!serviceWorker || !global.document) return;
+        serviceWorker.ready
+            .then(registration => registration.sync && registration.sync.register(SYNC_TAG))
+            .catch(() => { /* no Background Sync: the next 'online' event flushes */ });
+    }
+
+    // --- Public API ---
+
+    global.WeaveStore = {
+        SYNC_TAG,
+        // Opens the database and loads the mirror. Resolves to false if
+        // IndexedDB is unusable, in which case callers stay on the network path.
+        async ready() {
+            try {
+                await loadMirror();
+                return true;
+            } catch (error) {
+                console.warn('[OFFLINE] Local store unavailable:', error);
+                return false;
+            }
+        },
+        // True once the mirror holds a complete copy of the corpus
+        hasData: () => mirrorLoaded && synced,
+        get: id => sujets.get(id) || null,
+        count: filters => filteredIds(filters).length,
+        adjacent,
+        at,
+        edge,
+        randomSujet,
+        mutate,
+        flush,
+        sync,
+        pendingCount,
+        onRemap: listener => remapListeners.push(listener),
+        onChange: listener => changeListeners.push(listener)
+    };
+})(self);
@@ -66,6 +66,22 @@ document.addEventListener('DOMContentLoaded', () => {
     let titleEditMode = null; // 'edit' or 'new' - tracks what we're doing with the title input
     let activeFilterState = { tags: [], people: [], search: '' };
 
+    // --- View Tracking State ---
+    // Navigation GETs never touch view counts. A view is reported to /view only
+    // after a sujet has stayed on screen for VIEW_DWELL_MS (set by the server).
+    const VIEW_DWELL_MS = parseInt(document.body.dataset.viewDwellMs, 10) || 2000;
+    const VIEW_BATCH_SIZE = 10;
+    let pendingViews = [];
+    let dwellTimer = null;
+
+    // --- Offline Store State ---
+    // offline_store.js mirrors the corpus in IndexedDB. Once the mirror is
+    // complete, navigation is answered locally; writes always go through its
+    // queue when IndexedDB is usable, and reach the server when online.
+    const store = window.WeaveStore;
+    let storeReady = false;
+    const SYNC_INTERVAL_MS = 60000;
+
     // Abbreviated tag display mapping for mobile compactness
     const tagAbbreviations = {
         'AI': 'AI',
@@ -96,6 +112,49 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- Utility Functions ---
 
+    function startDwellTimer(sujetId) {
+        clearTimeout(dwellTimer);
+        const shownAt = Date.now();
+        dwellTimer = setTimeout(() => {
+            pendingViews.push({ id: sujetId, dwell_ms: Date.now() - shownAt });
+            if (pendingViews.length >= VIEW_BATCH_SIZE) flushViews();
+        }, VIEW_DWELL_MS);
+    }
+
+    function flushViews() {
+        if (pendingViews.length === 0) return;
+        const body = JSON.stringify({ views: pendingViews });
+        pendingViews = [];
+        // sendBeacon survives page unload; fall back to a keepalive fetch
+        if (!(navigator.sendBeacon && navigator.sendBeacon('/view', body))) {
+            fetch('/view', { method: 'POST', body, keepalive: true }).catch(error => {
+                console.error('Failed to record views:', error);
+            });
+        }
+    }
+
+    function useLocalStore() {
+        return storeReady && store.hasData();
+    }
+
+    // Answers a navigation request from the local mirror when it is complete,
+    // otherwise from `url`. Either way the result has the API's {status, sujet} shape.
+    async function navigationRequest(localAnswer, url) {
+        if (useLocalStore()) {
+            const sujet = localAnswer();
+            return sujet ? { status: 'ok', sujet } : { status: 'no_more_sujets' };
+        }
+        const response = await fetch(url);
+        return response.json();
+    }
+
+    async function sujetByIdRequest(id) {
+        const sujet = useLocalStore() ? store.get(id) : null;
+        if (sujet) return { status: 'ok', sujet };
+        const response = await fetch(`/get_sujet_by_id/${id}`);
+        return response.json();
+    }
+
     function updateGlobalButtonStates(sujetIsLoaded, currentHistoryLength) {
         saveButton.disabled = !sujetIsLoaded;
         skipButton.disabled = !sujetIsLoaded;
@@ -336,6 +395,7 @@ document.addEventListener('DOMContentLoaded', () => {
     function displaySujet(sujet) {
         currentSujetId = sujet.id;
         currentSujetData = sujet;
+        startDwellTimer(sujet.id);
         // Parse ID and Title from sujet.original_sujet (e.g., "ID: 123 - Title Text")
         const match = sujet.original_sujet.match(/^ID:\s*(\d+)\s*-\s*(.*)$/);
         let titleText;
@@ -432,20 +492,25 @@ document.addEventListener('DOMContentLoaded', () => {
         let filteredCount = 0;
         let totalCount = 0;
 
-        try {
-            const response = await fetch(`/get_sujets_count?${queryString}`);
-            const data = await response.json();
-            filteredCount = data.status === 'ok' ? data.count : 0;
-        } catch (error) {
-            console.error('Network error fetching filtered sujet count:', error);
-        }
+        if (useLocalStore()) {
+            filteredCount = store.count(filters);
+            totalCount = store.count({});
+        } else {
+            try {
+                const response = await fetch(`/get_sujets_count?${queryString}`);
+                const data = await response.json();
+                filteredCount = data.status === 'ok' ? data.count : 0;
+            } catch (error) {
+                console.error('Network error fetching filtered sujet count:', error);
+            }
 
-        try {
-            const totalResponse = await fetch(`/get_sujets_count`);
-            const totalData = await totalResponse.json();
-            totalCount = totalData.status === 'ok' ? totalData.count : 0;
-        } catch (error) {
-            console.error('Network error fetching total sujet count:', error);
+            try {
+                const totalResponse = await fetch(`/get_sujets_count`);
+                const totalData = await totalResponse.json();
+                totalCount = totalData.status === 'ok' ? totalData.count : 0;
+            } catch (error) {
+                console.error('Network error fetching total sujet count:', error);
+            }
         }
 
         // In filter mode, show only the filtered count; in tag mode, show filtered/total
@@ -472,8 +537,8 @@ document.addEventListener('DOMContentLoaded', () => {
         console.log('[NAV DEBUG] Query params:', queryParams.join('&'));
 
         try {
-            const response = await fetch(`/get_sujet?${queryParams.join('&')}`);
-            const data = await response.json();
+            const data = await navigationRequest(
+                () => store.at(currentOffset, filters), `/get_sujet?${queryParams.join('&')}`);
 
             console.log('[NAV DEBUG] Response data:', {
                 status: data.status,
@@ -529,8 +594,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!id) return;
         console.log(`--- DEBUG (loadSujetById): Loading sujet by ID: ${id} ---`);
         try {
-            const response = await fetch(`/get_sujet_by_id/${id}`);
-            const data = await response.json();
+            const data = await sujetByIdRequest(id);
             if (data.status === 'ok' && data.sujet) {
                 // When going 'back', the history is managed by the backButton listener.
                 // We do NOT push to history here, as it would create duplicates.
@@ -570,8 +634,8 @@ document.addEventListener('DOMContentLoaded', () => {
         if (filters.search && filters.search.trim()) qp.push(`search=${encodeURIComponent(filters.search)}`);
 
         try {
-            const res = await fetch(`/adjacent_sujet?${qp.join('&')}`);
-            const data = await res.json();
+            const data = await navigationRequest(
+                () => store.adjacent(currentSujetId, direction, filters), `/adjacent_sujet?${qp.join('&')}`);
 
             if (data.status === 'ok' && data.sujet) {
                 // Add to history if this is a new sujet
@@ -627,8 +691,8 @@ document.addEventListener('DOMContentLoaded', () => {
         ];
 
         // Only apply filters if ignoreFilters is false (default behavior for navigation)
+        const filters = ignoreFilters ? {} : getActiveFiltersForQuery();
         if (!ignoreFilters) {
-            const filters = getActiveFiltersForQuery();
             if (filters.tags.length) qp.push(`tags=${filters.tags.map(encodeURIComponent).join(',')}`);
             if (filters.people.length) qp.push(`people=${filters.people.map(encodeURIComponent).join(',')}`);
             if (filters.search && filters.search.trim()) qp.push(`search=${encodeURIComponent(filters.search)}`);
@@ -637,8 +701,8 @@ document.addEventListener('DOMContentLoaded', () => {
         console.log('[DELETE DEBUG] Query parameters being sent:', qp.join('&'), 'ignoreFilters:', ignoreFilters);
 
         try {
-            const res = await fetch(`/adjacent_sujet?${qp.join('&')}`);
-            const data = await res.json();
+            const data = await navigationRequest(
+                () => store.adjacent(referenceId, direction, filters), `/adjacent_sujet?${qp.join('&')}`);
 
             console.log('[DELETE DEBUG] Backend response:', data);
 
@@ -697,10 +761,10 @@ document.addEventListener('DOMContentLoaded', () => {
         try {
             // Build query string with filters if in filter mode
             let url = `/${edge}`;
+            const filters = editMode === 'filter' ? getActiveFiltersForQuery() : {};
 
             // If in filter mode, include the active filters
             if (editMode === 'filter') {
-                const filters = getActiveFiltersForQuery();
                 const queryParams = [];
 
                 if (filters.tags.length) {
@@ -720,8 +784,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             }
 
-            const response = await fetch(url);
-            const data = await response.json();
+            const data = await navigationRequest(() => store.edge(edge, filters), url);
             if (data.status === 'ok' && data.sujet) {
                 if (history.length === 0 || history[history.length - 1] !== data.sujet.id) {
                     history.push(data.sujet.id);
@@ -762,17 +825,22 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            const response = await fetch(endpoint, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(payload),
-            });
+            if (storeReady) {
+                // Applied locally now, sent to the server when online
+                await store.mutate(Object.assign({ op: actionType === 'save' ? 'save' : 'skip' }, payload));
+            } else {
+                const response = await fetch(endpoint, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(payload),
+                });
 
-            if (!response.ok) {
-                throw new Error(`Server responded with status ${response.status}`);
-            }
+                if (!response.ok) {
+                    throw new Error(`Server responded with status ${response.status}`);
+                }
 
-            await response.json();
+                await response.json();
+            }
 
             // Only navigate after save actions, not delete (delete handles its own navigation)
             if (actionType !== 'delete') {
@@ -800,16 +868,20 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            console.log('[DEBUG] handleDeleteSujet: About to fetch /delete_sujet/', currentSujetId);
-            const response = await fetch(`/delete_sujet/${currentSujetId}`, { method: 'DELETE' });
+            if (storeReady) {
+                await store.mutate({ op: 'delete', id: currentSujetId });
+            } else {
+                console.log('[DEBUG] handleDeleteSujet: About to fetch /delete_sujet/', currentSujetId);
+                const response = await fetch(`/delete_sujet/${currentSujetId}`, { method: 'DELETE' });
 
-            // Check if response is ok before trying to parse JSON
-            if (!response.ok) {
-                throw new Error(`Server responded with status ${response.status}`);
-            }
+                // Check if response is ok before trying to parse JSON
+                if (!response.ok) {
+                    throw new Error(`Server responded with status ${response.status}`);
+                }
 
-            const data = await response.json();
-            console.log('[DEBUG] handleDeleteSujet: Response received:', data);
+                const data = await response.json();
+                console.log('[DEBUG] handleDeleteSujet: Response received:', data);
+            }
 
             // Store the deleted sujet ID for finding adjacent sujets
             const deletedSujetId = currentSujetId;
@@ -840,8 +912,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     async function handleQuickSpark() {
         try {
-            const response = await fetch('/get_random_sujet');
-            const data = await response.json();
+            const data = await navigationRequest(() => store.randomSujet(), '/get_random_sujet');
             if (data.status === 'ok' && data.sujet) {
                 if (history.length === 0 || history[history.length - 1] !== data.sujet.id) {
                     history.push(data.sujet.id);
@@ -920,14 +991,18 @@ document.addEventListener('DOMContentLoaded', () => {
                 // Update existing sujet title
                 if (!currentSujetData || !currentSujetId) return;
 
-                const response = await fetch(`/update_title/${currentSujetId}`, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ title: title })
-                });
-
-                if (!response.ok) throw new Error('Failed to update title');
-                const data = await response.json();
+                if (storeReady) {
+                    await store.mutate({ op: 'title', id: currentSujetId, title: title });
+                } else {
+                    const response = await fetch(`/update_title/${currentSujetId}`, {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ title: title })
+                    });
+
+                    if (!response.ok) throw new Error('Failed to update title');
+                    await response.json();
+                }
 
                 // Update the display
                 originalSujetSpan.textContent = title;
@@ -942,13 +1017,18 @@ document.addEventListener('DOMContentLoaded', () => {
 
             } else if (titleEditMode === 'new') {
                 // Create new sujet
-                const response = await fetch('/add_sujet', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ title: title })
-                });
-
-                const result = await response.json();
+                let result;
+                if (storeReady) {
+                    // A placeholder with a temporary id until the server assigns one (see onRemap)
+                    result = { status: 'success', sujet: await store.mutate({ op: 'add', title: title }) };
+                } else {
+                    const response = await fetch('/add_sujet', {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ title: title })
+                    });
+                    result = await response.json();
+                }
                 if (result.status === 'success') {
                     if (result.sujet && result.sujet.id) {
                         currentSujetData = result.sujet;
@@ -1007,8 +1087,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     async function jumpToSujetById(sujetId) {
         try {
-            const response = await fetch(`/get_sujet_by_id/${sujetId}`);
-            const data = await response.json();
+            const data = await sujetByIdRequest(sujetId);
 
             if (data.status === 'ok' && data.sujet) {
                 // Clear search term and reset to normal browsing
@@ -1072,6 +1151,17 @@ document.addEventListener('DOMContentLoaded', () => {
     firstSujetButton.addEventListener('click', () => loadEdgeSujet('first'));
     lastSujetButton.addEventListener('click', () => loadEdgeSujet('last'));
 
+    // Report dwell-qualified views when the page is hidden or closed
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            clearTimeout(dwellTimer); // Time in the background isn't a view
+            flushViews();
+        } else if (currentSujetId) {
+            startDwellTimer(currentSujetId);
+        }
+    });
+    window.addEventListener('pagehide', flushViews);
+
     // Search event listeners
     searchButton.addEventListener('click', toggleSearchContainer);
     searchApplyButton.addEventListener('click', applySearch);
@@ -1127,6 +1217,26 @@ document.addEventListener('DOMContentLoaded', () => {
         updateSujetCount();
         // Start at the last (newest) sujet for intuitive ascending navigation
         loadEdgeSujet('last');
+        initializeOfflineStore();
+    }
+
+    function initializeOfflineStore() {
+        if (!store) return;
+        store.ready().then(ok => {
+            storeReady = ok;
+            if (!ok) return;
+            // A sujet added offline got its real id from the server
+            store.onRemap((tempId, sujet) => {
+                history.forEach((id, i) => { if (id === tempId) history[i] = sujet.id; });
+                if (currentSujetId === tempId) displaySujet(sujet);
+            });
+            store.onChange(() => updateSujetCount());
+            store.sync();
+            window.addEventListener('online', () => store.sync());
+            setInterval(() => {
+                if (document.visibilityState === 'visible') store.sync();
+            }, SYNC_INTERVAL_MS);
+        });
     }
 
     initializeApp();
@@ -1,14 +1,27 @@
 // Minimal service worker for Weave PWA
-const CACHE_NAME = 'weave-pwa-v2'; // Increment version to force update
+importScripts('/static/offline_store.js'); // WeaveStore, for flushing queued mutations
+
+const CACHE_NAME = 'weave-pwa-v7'; // Increment version to force update
+const API_CACHE_NAME = 'weave-api-v1';
 const ASSETS = [
   '/',
   '/static/style.css',
   '/static/script.js',
+  '/static/offline_store.js',
   '/static/manifest.json',
   '/static/icons/icon-192.png',
   '/static/icons/icon-512.png'
 ];
 
+// Read endpoints that answer with ETags (see CACHE_POLICIES in app.py).
+// Entries ending in '/' match as a prefix.
+const REVALIDATED_PATHS = [
+  '/get_all_tags',
+  '/get_all_people',
+  '/get_sujets_count',
+  '/get_sujet_by_id/'
+];
+
 self.addEventListener('install', event => {
   event.waitUntil(
     caches.open(CACHE_NAME).then(cache => cache.addAll(ASSETS))
@@ -16,7 +29,7 @@ self.addEventListener('install', event => {
 });
 
 self.addEventListener('activate', event => {
-  const cacheWhitelist = [CACHE_NAME];
+  const cacheWhitelist = [CACHE_NAME, API_CACHE_NAME];
   event.waitUntil(
     caches.keys().then(cacheNames => {
       return Promise.all(
@@ -30,7 +43,45 @@ self.addEventListener('activate', event => {
   );
 });
 
+function isRevalidatedRequest(request) {
+  if (request.method !== 'GET') return false;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return false;
+  return REVALIDATED_PATHS.some(path =>
+    path.endsWith('/') ? url.pathname.startsWith(path) : url.pathname === path
+  );
+}
+
+// Revalidate a cached API response with If-None-Match. A 304 costs only a
+// header exchange and we answer from the cache; offline we serve the last copy.
+async function revalidate(request) {
+  const cache = await caches.open(API_CACHE_NAME);
+  const cached = await cache.match(request);
+  const headers = new Headers(request.headers);
+  const etag = cached && cached.headers.get('ETag');
+  if (etag) headers.set('If-None-Match', etag);
+
+  try {
+    // 'no-store' so the browser's HTTP cache doesn't answer the conditional for us
+    const response = await fetch(request.url, { headers, cache: 'no-store', credentials: 'same-origin' });
+    if (response.status === 304 && cached) {
+      return cached;
+    }
+    if (response.ok && response.headers.get('ETag')) {
+      await cache.put(request, response.clone());
+    }
+    return response;
+  } catch (err) {
+    if (cached) return cached;
+    throw err;
+  }
+}
+
 self.addEventListener('fetch', event => {
+  if (isRevalidatedRequest(event.request)) {
+    event.respondWith(revalidate(event.request));
+    return;
+  }
   event.respondWith(
     caches.match(event.request).then(response => {
       // Cache first, then network fallback
@@ -38,3 +89,11 @@ self.addEventListener('fetch', event => {
     })
   );
 });
+
+// Replays mutations queued while offline (see offline_store.js). The page
+// registers this sync when a flush fails, so it runs even if the app is closed.
+self.addEventListener('sync', event => {
+  if (event.tag === WeaveStore.SYNC_TAG) {
+    event.waitUntil(WeaveStore.flush());
+  }
+});
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Add the project root to the Python path to allow for correct module imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db_operations
+from app import app as flask_app
+
+# A small, known corpus so tests can assert exact results
+SEED_SUJETS = [
+    (1, 'ID: 1 - Weird hat in the coffee shop', None, 'Saw it twice', 'Observation', 'new', 0, 'S', '2025-01-01'),
+    (2, 'ID: 2 - AI ethics debate', None, '', 'AI, Politics', 'new', 0, 'MD', '2025-01-02'),
+    (3, 'ID: 3 - Great book quote', None, 'From the train', 'Quote', 'new', 0, '', '2025-01-03'),
+    (4, 'ID: 4 - Museum exhibit', None, '', 'Culture, Travel', 'new', 0, 'S', '2025-01-04'),
+    (5, 'ID: 5 - Model evaluation at work', None, '', 'AI, Work', 'new', 0, 'work', '2025-01-05'),
+]
+
+
+def create_sujets_table(path, rows=SEED_SUJETS):
+    """Creates a sujets table shaped like the one `flask init-db` produces."""
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE sujets (
+        id INTEGER, original_sujet TEXT, ai_suggestion TEXT, user_notes TEXT,
+        user_tags TEXT, status TEXT, view_count INTEGER, person TEXT, date_created TEXT)""")
+    conn.execute('CREATE INDEX ix_sujets_id ON sujets (id)')
+    conn.executemany(
+        'INSERT INTO sujets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def seeded_app(tmp_path, monkeypatch):
+    """The app pointed at a fresh temporary database holding SEED_SUJETS."""
+    db_path = str(tmp_path / 'sujets.db')
+    create_sujets_table(db_path)
+    monkeypatch.setattr(db_operations, 'DATABASE_PATH', db_path)
+    flask_app.config.update({"TESTING": True})
+    yield flask_app
+
+
+@pytest.fixture
+def seeded_client(seeded_app):
+    """A test client for the seeded app."""
+    return seeded_app.test_client()
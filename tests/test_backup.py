@@ -0,0 +1,107 @@
+import gzip
+import os
+import sqlite3
+
+import pytest
+
+import backup
+import db_operations
+from conftest import create_sujets_table
+
+
+def sujet_ids(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute('SELECT id FROM sujets ORDER BY id')]
+    finally:
+        conn.close()
+
+
+def meta(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute('SELECT key, value FROM sujets_meta'))
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def live_db(seeded_client):
+    # First request applies the schema migrations
+    seeded_client.get('/get_sujets_count')
+    return db_operations.DATABASE_PATH
+
+
+def test_snapshot_is_verified_and_checksummed(live_db, tmp_path):
+    path, stats = backup.create_snapshot(directory=str(tmp_path), compress=True)
+    assert path.endswith('.db.gz') and stats['steps'] >= 1 and stats['restarts'] == 0
+    assert backup.verify_checksum(path)
+    plain = tmp_path / 'plain.db'
+    plain.write_bytes(gzip.decompress(open(path, 'rb').read()))
+    assert sujet_ids(str(plain)) == [1, 2, 3, 4, 5]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.partial')]
+
+
+def test_tampered_snapshot_is_not_restored(live_db, tmp_path):
+    path, _ = backup.create_snapshot(directory=str(tmp_path))
+    with open(path, 'r+b') as f:
+        f.seek(100)
+        f.write(b'\xff')
+    with pytest.raises(backup.BackupError, match='Checksum'):
+        backup.restore_snapshot(path)
+
+
+def test_restore_brings_rows_back_and_forces_resync(live_db, seeded_client, tmp_path):
+    path, _ = backup.create_snapshot(directory=str(tmp_path))
+    seeded_client.delete('/delete_sujet/3')
+    before = meta(live_db)
+
+    backup.restore_snapshot(path)
+    after = meta(live_db)
+    assert sujet_ids(live_db) == [1, 2, 3, 4, 5]
+    assert after['sync_floor'] == after['row_version'] > before['row_version']
+    assert after['epoch'] != before['epoch']
+    changes = seeded_client.get(f"/changes?since={before['row_version']}").get_json()
+    assert changes['reset'] is True
+
+
+def test_restore_migrates_any_target(live_db, tmp_path):
+    path, _ = backup.create_snapshot(directory=str(tmp_path))
+    target = str(tmp_path / 'other.db')
+    create_sujets_table(target, rows=[])
+    backup.restore_snapshot(path, target)
+    assert sujet_ids(target) == [1, 2, 3, 4, 5]
+    assert meta(target)['sync_floor'] > 0
+
+
+def test_prune_keeps_the_newest(live_db, tmp_path):
+    paths = [backup.create_snapshot(directory=str(tmp_path))[0] for _ in range(3)]
+    assert backup.prune_snapshots(str(tmp_path), keep=2) == paths[:1]
+    assert backup.list_snapshots(str(tmp_path)) == paths[1:]
+    assert not os.path.exists(paths[0] + '.sha256')
+
+
+def test_writes_during_backup_fall_back_to_one_step(live_db, tmp_path, monkeypatch):
+    writer = sqlite3.connect(live_db)
+
+    def write_between_steps(seconds):
+        writer.execute("UPDATE sujets SET view_count = view_count + 1 WHERE id = 1")
+        writer.commit()
+
+    monkeypatch.setattr(backup.time, 'sleep', write_between_steps)
+    dest = str(tmp_path / 'copy.db')
+    stats = backup.copy_database(live_db, dest, pages=1, sleep=0.001)
+    writer.close()
+    assert stats['restarts'] > backup.BACKUP_MAX_RESTARTS and stats['fallback']
+    assert stats['max_step_ms'] > 0
+    backup.check_integrity(dest)
+    assert sujet_ids(dest) == [1, 2, 3, 4, 5]
+
+
+def test_backup_command(live_db, seeded_app, tmp_path):
+    runner = seeded_app.test_cli_runner()
+    for _ in range(2):
+        result = runner.invoke(args=['backup', '--dir', str(tmp_path), '--gzip', '--keep', '1'])
+        assert result.exit_code == 0, result.output
+    assert 'Pruned' in result.output
+    assert len(backup.list_snapshots(str(tmp_path))) == 1
@@ -0,0 +1,66 @@
+import pytest
+
+
+@pytest.mark.parametrize('url', [
+    '/get_all_tags',
+    '/get_all_people',
+    '/get_sujets_count?tags=AI',
+    '/get_sujet_by_id/2',
+])
+def test_read_routes_answer_304_for_matching_etag(seeded_client, url):
+    """A repeated request carrying the ETag gets an empty 304."""
+    first = seeded_client.get(url)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    etag = first.headers['ETag']
+
+    second = seeded_client.get(url, headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+
+
+def test_etag_changes_after_a_save(seeded_client):
+    """Saving a sujet invalidates the cached tag list."""
+    etag = seeded_client.get('/get_all_tags').headers['ETag']
+
+    seeded_client.post('/save_sujet', json={
+        'id': 3, 'user_notes': '', 'user_tags': 'Quote, Science', 'person': ''})
+
+    response = seeded_client.get('/get_all_tags', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Science' in response.get_json()
+    assert response.headers['ETag'] != etag
+
+
+def test_etags_change_after_init_db(seeded_app, seeded_client):
+    urls = ['/get_all_tags', '/get_sujets_count', '/get_sujet_by_id/1']
+    etags = {url: seeded_client.get(url).headers['ETag'] for url in urls}
+    result = seeded_app.test_cli_runner().invoke(args=['init-db'])
+    assert 'initialized successfully' in result.output, result.output
+    for url in urls:
+        response = seeded_client.get(url, headers={'If-None-Match': etags[url]})
+        assert response.status_code == 200 and response.headers['ETag'] != etags[url]
+
+
+def test_view_count_bump_keeps_list_etags(seeded_client):
+    """View count bumps must not invalidate tag/people lists."""
+    tags_etag = seeded_client.get('/get_all_tags').headers['ETag']
+    sujet_etag = seeded_client.get('/get_sujet_by_id/2').headers['ETag']
+
+    seeded_client.post('/view', json={'views': [{'id': 2, 'dwell_ms': 5000}]})
+
+    assert seeded_client.get(
+        '/get_all_tags', headers={'If-None-Match': tags_etag}).status_code == 304
+    assert seeded_client.get(
+        '/get_sujet_by_id/2', headers={'If-None-Match': sujet_etag}).status_code == 200
+
+
+def test_service_worker_is_served_from_the_root(seeded_client):
+    # Its scope is its own directory, and it has to see /get_sujet_by_id/ etc.
+    response = seeded_client.get('/sw.js')
+    assert response.status_code == 200 and 'javascript' in response.content_type
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert "importScripts('/static/offline_store.js')" in response.get_data(as_text=True)
+    page = seeded_client.get('/').get_data(as_text=True)
+    assert 'register("/sw.js", { scope: \'/\' })' in page
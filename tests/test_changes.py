@@ -0,0 +1,118 @@
+import sqlite3
+
+import db_operations
+
+
+def sync(client, since=0, limit=500, resync=False):
+    return client.get(f'/changes?since={since}&limit={limit}' + ('&resync=1' if resync else '')).get_json()
+
+
+def pull(client, since=0, limit=2):
+    """Pages through /changes like offline_store.js. Returns (ids in the mirror, final cursor, pages)."""
+    mirror, resync = set(), False
+    for pages in range(1, 50):
+        data = sync(client, since, limit, resync)
+        if data['reset']:
+            mirror.clear()
+        for change in data['changes']:
+            if change['op'] == 'delete':
+                mirror.discard(change['id'])
+            else:
+                mirror.add(change['sujet']['id'])
+        resync = resync or data['reset'] or since == 0
+        since = data['next']
+        if not data['more']:
+            return mirror, since, pages
+    raise AssertionError('/changes never finished')
+
+
+def test_full_sync_pages_in_version_order(seeded_client):
+    first = sync(seeded_client, limit=3)
+    assert [c['sujet']['id'] for c in first['changes']] == [1, 2, 3]
+    assert first['more'] and not first['reset'] and first['version'] == 5
+    rest = sync(seeded_client, first['next'])
+    assert [c['sujet']['id'] for c in rest['changes']] == [4, 5]
+    assert not rest['more'] and rest['next'] == 5
+    assert sync(seeded_client, 5)['changes'] == []
+
+
+def test_updates_inserts_and_deletes_are_tracked(seeded_client):
+    seeded_client.post('/save_sujet', json={'id': 2, 'user_notes': 'n', 'user_tags': 'AI', 'person': 'S'})
+    seeded_client.post('/view', json={'views': [{'id': 3, 'dwell_ms': 5000}]})
+    created = seeded_client.post('/add_sujet', json={'title': 'New'}).get_json()['sujet']
+    seeded_client.delete('/delete_sujet/4')
+
+    data = sync(seeded_client, 5)
+    assert [(c['op'], c['version']) for c in data['changes']] == \
+        [('upsert', 6), ('upsert', 7), ('upsert', 8), ('delete', 9)]
+    assert data['changes'][0]['sujet']['user_notes'] == 'n'
+    assert data['changes'][1]['sujet']['view_count'] == 1
+    assert data['changes'][2]['sujet']['id'] == created['id']
+    assert data['changes'][3]['id'] == 4
+    # A row changed twice is reported once, at its latest version
+    seeded_client.post('/skip_sujet', json={'id': 2})
+    assert [c.get('sujet', c)['id'] for c in sync(seeded_client, 8)['changes']] == [4, 2]
+    assert sync(seeded_client, 0)['changes'][-1]['sujet']['id'] == 2
+
+
+def test_pruned_tombstones_force_a_reset(seeded_app, seeded_client):
+    seeded_client.delete('/delete_sujet/4')
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    conn.execute("UPDATE sujets_tombstones SET deleted_at = '2000-01-01'")
+    conn.commit()
+    conn.close()
+    result = seeded_app.test_cli_runner().invoke(args=['prune-tombstones', '--days', '30'])
+    assert 'Pruned 1 tombstones' in result.output
+
+    stale = sync(seeded_client, 3)
+    assert stale['reset'] and [c['sujet']['id'] for c in stale['changes']] == [1, 2, 3, 5]
+    assert not sync(seeded_client, 6)['reset']
+    assert not sync(seeded_client, 0)['reset']
+
+
+def test_resync_after_prune_pages_to_the_end(seeded_app, seeded_client):
+    seeded_client.delete('/delete_sujet/4')
+    seeded_client.post('/skip_sujet', json={'id': 5})
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    conn.execute("UPDATE sujets_tombstones SET deleted_at = '2000-01-01'")
+    conn.commit()
+    conn.close()
+    seeded_app.test_cli_runner().invoke(args=['prune-tombstones', '--days', '30'])
+
+    # Rows 1-3 kept their versions below the new floor (6)
+    for since in (3, 0):
+        mirror, cursor, _ = pull(seeded_client, since)
+        assert mirror == {1, 2, 3, 5} and cursor == 7
+    assert not sync(seeded_client, 7)['reset']
+
+
+def test_resync_after_init_db_pages_to_the_end(seeded_app, seeded_client):
+    seeded_client.post('/skip_sujet', json={'id': 5})
+    stale = sync(seeded_client)['next']
+    result = seeded_app.test_cli_runner().invoke(args=['init-db'])
+    assert 'initialized successfully' in result.output, result.output
+
+    # The rebuilt rows are numbered above everything the old file handed out
+    assert min(c['version'] for c in sync(seeded_client, 0, 5)['changes']) > stale
+    mirror, cursor, pages = pull(seeded_client, stale, limit=200)
+    total = seeded_client.get('/get_sujets_count').get_json()['count']
+    assert len(mirror) == total and pages == -(-total // 200)
+    assert not sync(seeded_client, cursor)['reset']
+    # Fresh clients get the same cursor
+    assert pull(seeded_client, 0, limit=200)[1] == cursor
+
+
+def test_migrations_can_rerun_after_a_partial_apply(seeded_client):
+    seeded_client.get('/get_sujets_count')
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    # As if migration 2 had died after its ALTER TABLE committed
+    conn.execute('PRAGMA user_version = 1')
+    db_operations._schema_ready.discard(db_operations.DATABASE_PATH)
+    db_operations.ensure_schema(conn)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == db_operations.SCHEMA_MIGRATIONS[-1][0]
+    conn.close()
+    assert sync(seeded_client)['next'] >= 5
+
+
+def test_rejects_negative_since(seeded_client):
+    assert seeded_client.get('/changes?since=-1').status_code == 400
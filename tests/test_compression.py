@@ -0,0 +1,62 @@
+import gzip
+
+import pytest
+
+import compression
+
+
+def test_large_json_is_gzipped(seeded_client, monkeypatch):
+    monkeypatch.setattr(compression, 'MIN_SIZE', 10)
+    response = seeded_client.get('/get_all_tags', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'Observation' in gzip.decompress(response.data)
+
+
+def test_small_json_is_sent_uncompressed(seeded_client):
+    response = seeded_client.get('/get_sujets_count', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['count'] == 5
+
+
+def test_compressed_etag_still_revalidates(seeded_client, monkeypatch):
+    monkeypatch.setattr(compression, 'MIN_SIZE', 10)
+    first = seeded_client.get('/get_all_tags', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['ETag'].endswith('-gzip"')
+
+    second = seeded_client.get('/get_all_tags', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+
+def test_stream_compress_roundtrip():
+    chunks = [b'{"id": %d}\n' % i for i in range(100)]
+    compressed = b''.join(compression.stream_compress(iter(chunks), 'gzip'))
+    assert gzip.decompress(compressed) == b''.join(chunks)
+
+
+def test_static_serves_precompressed_variant(seeded_app, tmp_path, monkeypatch):
+    static_dir = tmp_path / 'static'
+    static_dir.mkdir()
+    (static_dir / 'app.js').write_text('console.log("weave");\n' * 200)
+    monkeypatch.setattr(seeded_app, 'static_folder', str(static_dir))
+    compression.precompress_static(str(static_dir))
+    client = seeded_app.test_client()
+
+    response = client.get('/static/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/javascript'
+    assert gzip.decompress(response.data).startswith(b'console.log')
+    response.close()
+
+    plain = client.get('/static/app.js', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    plain.close()
+
+
+@pytest.mark.skipif(compression.brotli is None, reason='brotli not installed')
+def test_brotli_preferred_when_available(seeded_client, monkeypatch):
+    monkeypatch.setattr(compression, 'MIN_SIZE', 10)
+    response = seeded_client.get('/get_all_tags', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert b'Observation' in compression.brotli.decompress(response.data)
@@ -0,0 +1,19 @@
+# tests/test_corpus.py
+import sqlite3
+
+from benchmarks.corpus import create_corpus_db, generate_sujets
+
+
+def test_corpus_is_deterministic_per_seed():
+    assert list(generate_sujets(200, seed=3)) == list(generate_sujets(200, seed=3))
+    assert list(generate_sujets(200, seed=3)) != list(generate_sujets(200, seed=4))
+
+
+def test_corpus_db_matches_app_schema(tmp_path):
+    path = create_corpus_db(str(tmp_path / 'corpus.db'), 250, batch_size=100)
+    conn = sqlite3.connect(path)
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(sujets)')]
+    assert columns == ['id', 'original_sujet', 'ai_suggestion', 'user_notes', 'user_tags',
+                       'status', 'view_count', 'person', 'date_created']
+    assert conn.execute('SELECT COUNT(*), MIN(id), MAX(id) FROM sujets').fetchone() == (250, 1, 250)
+    conn.close()
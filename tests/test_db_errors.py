@@ -0,0 +1,24 @@
+# tests/test_db_errors.py
+import sqlite3
+
+import db_operations
+
+
+def test_locked_database_returns_retryable_json(seeded_client, monkeypatch):
+    def locked():
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(db_operations, 'get_all_unique_people', locked)
+
+    response = seeded_client.get('/get_all_people')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json() == {'status': 'error', 'message': 'database is locked'}
+
+
+def test_lock_on_add_is_not_swallowed(seeded_client, monkeypatch):
+    def locked():
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(db_operations, 'get_db', locked)
+
+    response = seeded_client.post('/add_sujet', json={'title': 'New'})
+    assert response.status_code == 503
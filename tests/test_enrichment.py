@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+import enrichment
+from benchmarks.stub_llm import StubLLMServer, suggestion_for
+
+ITEMS = [(i, f'note number {i}') for i in range(20)]
+
+
+def run(stub, items=ITEMS, **options):
+    transport = enrichment.OpenAIChatTransport(base_url=stub.base_url, api_key='test')
+    options = dict({'rpm': 60000, 'tpm': 10 ** 8}, **options)
+    return enrichment.run_enrichment(items, transport=transport, **options)
+
+
+def test_results_come_back_in_input_order():
+    with StubLLMServer(latency=0.01) as stub:
+        results, stats = run(stub, concurrency=8)
+    assert [r['key'] for r in results] == [key for key, _ in ITEMS]
+    assert all(r['suggestion'] == suggestion_for(text) and r['error'] is None
+               for r, (_, text) in zip(results, ITEMS))
+    assert stats['requests'] == 20 and stats['failed'] == 0
+    assert stats['prompt_tokens'] == stub.stats['prompt_tokens']
+
+
+def test_requests_overlap():
+    with StubLLMServer(latency=0.2) as stub:
+        _, stats = run(stub, concurrency=10)
+    # Sequentially this would take 20 * 0.2 = 4s
+    assert stats['seconds'] < 1.5
+
+
+def test_request_rate_is_limited():
+    with StubLLMServer(latency=0.0) as stub:
+        _, stats = run(stub, items=ITEMS[:6], concurrency=6, rpm=120)
+    # Burst of 2, then one every half second
+    assert stats['seconds'] >= 1.9
+
+
+def test_429s_are_retried_after_the_servers_hint():
+    with StubLLMServer(latency=0.0, rpm=5, window=0.5, retry_after=0.2) as stub:
+        results, stats = run(stub, items=ITEMS[:12], concurrency=10, rpm=1200)
+    assert all(r['suggestion'] for r in results)
+    assert stats['rate_limited'] == stub.stats['rate_limited'] > 0
+    assert stats['retries'] >= stats['rate_limited']
+
+
+def test_server_errors_are_retried_and_failures_reported(monkeypatch):
+    monkeypatch.setattr(enrichment, 'BACKOFF_BASE', 0.01)
+    with StubLLMServer(latency=0.0, fail_every=3) as stub:
+        results, stats = run(stub, concurrency=4)
+    assert all(r['suggestion'] for r in results) and stats['retries'] > 0
+
+    with StubLLMServer(latency=0.0, fail_every=1) as stub:
+        results, stats = run(stub, items=ITEMS[:2], max_attempts=2)
+    assert [r['suggestion'] for r in results] == [None, None]
+    assert all('Gave up' in r['error'] for r in results) and stats['failed'] == 2
+
+
+def test_bad_request_is_not_retried():
+    def transport(payload):
+        raise enrichment.PermanentError('HTTP 401: bad key')
+
+    async def call(payload):
+        return transport(payload)
+
+    results, stats = enrichment.run_enrichment(ITEMS[:1], transport=call)
+    assert results[0]['error'] == 'HTTP 401: bad key' and stats['requests'] == 1
+
+
+def test_token_bucket_paces_to_its_rate():
+    clock = [0.0]
+    bucket = enrichment.TokenBucket(60, capacity=1, clock=lambda: clock[0])
+
+    async def sleep(seconds):
+        clock[0] += seconds
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    original = asyncio.sleep
+    enrichment.asyncio.sleep = sleep
+    try:
+        asyncio.run(take(5))
+    finally:
+        enrichment.asyncio.sleep = original
+    # One per second after the initial burst of one
+    assert clock[0] == pytest.approx(4.0)
+
+
+def test_packed_requests_split_back_per_sujet():
+    with StubLLMServer(latency=0.0) as stub:
+        results, stats = run(stub, concurrency=4, pack_size=8)
+    assert [r['suggestion'] for r in results] == [suggestion_for(text) for _, text in ITEMS]
+    # 8 + 8 + 4
+    assert stats['requests'] == stub.stats['requests'] == 3
+
+
+def test_packed_answers_missing_items_are_resent():
+    with StubLLMServer(latency=0.0, drop_every=5) as stub:
+        results, stats = run(stub, concurrency=4, pack_size=10)
+    assert all(r['suggestion'] == suggestion_for(r['text']) for r in results)
+    assert stats['items_resent'] > 0 and stats['failed'] == 0
+
+
+def test_parse_packed_response_keeps_only_valid_entries():
+    content = ('{"results": [{"id": 0, "suggestion": "A. Tags: X"}, {"id": 1, "suggestion": ""},'
+               ' {"id": 7, "suggestion": "out of range"}, {"id": true, "suggestion": "bool"},'
+               ' {"id": 2}]}')
+    assert enrichment.parse_packed_response(content, 3) == {0: 'A. Tags: X'}
+    assert enrichment.parse_packed_response('not json', 3) == {}
+
+
+def test_cached_suggestions_are_not_requested_again(tmp_path):
+    cache = enrichment.EnrichmentCache(str(tmp_path / 'cache.db'))
+    with StubLLMServer(latency=0.0) as stub:
+        first, _ = run(stub, items=ITEMS[:5], cache=cache)
+        again, stats = run(stub, items=ITEMS[:5] + [(99, '  Note  NUMBER 0 ')], cache=cache)
+        assert stub.stats['requests'] == 5
+        assert stats['requests'] == 0 and stats['cached'] == 6
+        assert [r['suggestion'] for r in again[:5]] == [r['suggestion'] for r in first]
+
+        _, stats = run(stub, items=ITEMS[:2], cache=cache, refresh=True)
+        assert stats['requests'] == 2
+    # One lookup answers both copies of note 0
+    assert cache.stats()['entries'] == 5 and cache.stats()['hits'] == 5
+
+
+def test_duplicate_texts_are_requested_once():
+    items = [(0, 'same note'), (1, 'Same  note'), (2, 'other note')]
+    with StubLLMServer(latency=0.0) as stub:
+        results, stats = run(stub, items=items)
+    assert stats['requests'] == 2 and stats['duplicates'] == 1
+    assert results[0]['suggestion'] == results[1]['suggestion']
+
+
+def test_cache_ttl_and_eviction(tmp_path):
+    cache = enrichment.EnrichmentCache(str(tmp_path / 'cache.db'), ttl_days=1, max_entries=2)
+    for i in range(3):
+        cache.put(f'key{i}', f'suggestion {i}')
+    cache.conn.execute("UPDATE enrichment_cache SET created_at = created_at - 2 * 86400 WHERE key = 'key0'")
+    assert cache.get('key0') is None and cache.get('key1') == 'suggestion 1'
+    assert cache.evict() == 1
+    assert cache.stats()['entries'] == 2
+    # Prompt, model and temperature are part of the key
+    assert enrichment.cache_key('a') != enrichment.cache_key('a', model='other')
+    assert enrichment.cache_key('a') != enrichment.cache_key('a', prompt_version='v2')
@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+
+import db_operations
+import enrichment
+import enrichment_queue
+import weave_batch
+from benchmarks.stub_llm import StubLLMServer
+
+
+def queue(**options):
+    return enrichment_queue.JobQueue(**options)
+
+
+def test_claims_are_exclusive(seeded_app):
+    first, second = queue(), queue()
+    assert first.enqueue_unenriched() == 5 and first.enqueue_unenriched() == 0
+    assert [i for i, _ in first.claim(2)] == [1, 2]
+    assert second.claim(2) == [(3, 'Great book quote'), (4, 'Museum exhibit')]
+    assert [i for i, _ in first.claim(10)] == [5]
+    assert second.claim(10) == []
+    assert first.counts() == {'pending': 0, 'leased': 5, 'done': 0, 'failed': 0}
+
+
+def test_concurrent_claims_never_overlap(seeded_app):
+    queue().enqueue(range(1, 6))
+    claimed = []
+
+    def worker():
+        jobs = queue()
+        while True:
+            batch = jobs.claim(1)
+            if not batch:
+                return
+            claimed.extend(i for i, _ in batch)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == [1, 2, 3, 4, 5]
+
+
+def test_expired_lease_is_taken_over(seeded_app):
+    crashed = queue(lease_seconds=-1)
+    crashed.enqueue([1, 2])
+    crashed.claim(2)
+    survivor = queue()
+    assert [i for i, _ in survivor.claim(5)] == [1, 2]
+    # The crashed worker no longer holds the jobs
+    crashed.fail(1, 'late')
+    assert survivor.counts()['leased'] == 2
+
+
+def test_failures_are_retried_then_kept_for_retry_failed(seeded_app):
+    jobs = queue(max_attempts=2)
+    jobs.enqueue([3])
+    for _ in range(2):
+        jobs.claim(1)
+        jobs.fail(3, 'HTTP 500')
+    assert jobs.claim(1) == []
+    assert jobs.failures() == [(3, 2, 'HTTP 500')]
+    assert jobs.retry_failed() == 1 and [i for i, _ in jobs.claim(1)] == [3]
+
+
+def test_weave_batch_resumes_after_a_crash(seeded_app, monkeypatch):
+    crashed = queue(lease_seconds=-1)
+    crashed.enqueue_unenriched()
+    crashed.claim(2)
+    with StubLLMServer(latency=0.0, fail_every=4) as stub:
+        transport = enrichment.OpenAIChatTransport(base_url=stub.base_url, api_key='test')
+        monkeypatch.setattr(enrichment, 'OpenAIChatTransport', lambda: transport)
+        monkeypatch.setattr(enrichment, 'BACKOFF_BASE', 0.01)
+        monkeypatch.setattr(weave_batch, 'OPENAI_API_KEY', 'test')
+        weave_batch.main(batch_size=2, use_cache=False, source='db', until_done=True)
+        assert stub.stats['completed'] == 5
+    assert queue().counts() == {'pending': 0, 'leased': 0, 'done': 5, 'failed': 0}
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    assert conn.execute("SELECT COUNT(*) FROM sujets WHERE ai_suggestion != ''").fetchone()[0] == 5
+    conn.close()
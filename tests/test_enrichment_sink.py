@@ -0,0 +1,68 @@
+import csv
+import sqlite3
+
+import db_operations
+import enrichment
+import enrichment_sink
+import weave_batch
+from benchmarks.stub_llm import StubLLMServer, suggestion_for
+
+
+def sujet_row(sujet_id):
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM sujets WHERE id = ?", (sujet_id,)).fetchone()
+    conn.close()
+    return row
+
+
+def test_parse_tags():
+    assert enrichment_sink.parse_tags(
+        'A museum visit. Tags: Art, Culture, Travel (if applicable), art, Activity.') == 'Art, Culture, Travel, Activity'
+    assert enrichment_sink.parse_tags('No tags here') == ''
+
+
+def test_sink_updates_in_batches(seeded_app, tmp_path):
+    csv_path = str(tmp_path / 'out.csv')
+    with enrichment_sink.EnrichmentSink(batch_size=2, csv_path=csv_path) as sink:
+        for sujet_id in (1, 2, 3):
+            sink.add(sujet_id, f'text {sujet_id}', f'Suggestion {sujet_id}. Tags: AI, Quote')
+        sink.add(4, 'failed', None)
+    assert sink.stats == {'updated': 3, 'inserted': 0, 'transactions': 2}
+    row = sujet_row(2)
+    assert row['ai_suggestion'] == 'Suggestion 2. Tags: AI, Quote' and row['ai_tags'] == 'AI, Quote'
+    assert sujet_row(4)['ai_suggestion'] is None
+    with open(csv_path, newline='') as f:
+        assert list(csv.reader(f))[0] == enrichment_sink.CSV_COLUMNS
+
+
+def test_sink_matches_sheet_rows_by_title(seeded_client):
+    with enrichment_sink.EnrichmentSink() as sink:
+        sink.add(None, 'Great book quote', 'A quote. Tags: Quote')
+        sink.add(None, 'A brand new note', 'New. Tags: Personal')
+    assert sink.stats['updated'] == 1 and sink.stats['inserted'] == 1
+    assert sujet_row(3)['ai_tags'] == 'Quote'
+    # Visible to the app straight away, and to syncing clients
+    assert seeded_client.get('/get_sujet_by_id/6').get_json()['sujet']['original_sujet'] == 'ID: 6 - A brand new note'
+    changed = [c['sujet']['id'] for c in seeded_client.get('/changes?since=0').get_json()['changes']]
+    assert 3 in changed and 6 in changed
+
+
+def test_add_column_migration_can_run_twice(seeded_app):
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    db_operations.ensure_schema(conn, db_operations.DATABASE_PATH)
+    db_operations.add_column(conn, 'sujets', 'ai_tags', "TEXT NOT NULL DEFAULT ''")
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(sujets)')]
+    conn.close()
+    assert columns.count('ai_tags') == 1
+
+
+def test_weave_batch_enriches_the_database(seeded_app, tmp_path, monkeypatch):
+    with StubLLMServer(latency=0.0) as stub:
+        transport = enrichment.OpenAIChatTransport(base_url=stub.base_url, api_key='test')
+        monkeypatch.setattr(enrichment, 'OpenAIChatTransport', lambda: transport)
+        monkeypatch.setattr(weave_batch, 'OPENAI_API_KEY', 'test')
+        weave_batch.main(batch_size=3, use_cache=False, source='db', csv_path=str(tmp_path / 'out.csv'))
+    assert sujet_row(1)['ai_suggestion'] == suggestion_for('Weird hat in the coffee shop')
+    assert sujet_row(3)['ai_tags'] == 'Observation, Stub'
+    assert sujet_row(4)['ai_suggestion'] is None
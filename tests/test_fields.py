@@ -0,0 +1,32 @@
+import pytest
+
+import db_operations
+
+
+def test_parse_fields_presets_and_lists():
+    assert db_operations.parse_fields('') is None
+    assert db_operations.parse_fields('lite') == ('id', 'original_sujet')
+    # 'id' is always added and the canonical order is kept
+    assert db_operations.parse_fields('person,original_sujet') == ('id', 'original_sujet', 'person')
+    with pytest.raises(db_operations.UnknownFieldError):
+        db_operations.parse_fields('id,password')
+
+
+@pytest.mark.parametrize('url', [
+    '/adjacent_sujet?id=1&direction=next&fields=lite',
+    '/adjacent_sujet?id=5&direction=prev&tags=AI&fields=lite',
+    '/get_sujet?offset=1&fields=lite',
+    '/first?fields=lite',
+    '/last?people=S&fields=lite',
+    '/get_sujet_by_id/3?fields=lite',
+])
+def test_lite_navigation_payload_has_only_id_and_title(seeded_client, url):
+    data = seeded_client.get(url).get_json()
+    assert data['status'] == 'ok'
+    assert set(data['sujet']) == {'id', 'original_sujet'}
+
+
+def test_unknown_field_is_rejected(seeded_client):
+    response = seeded_client.get('/first?fields=secret')
+    assert response.status_code == 400
+    assert 'secret' in response.get_json()['message']
@@ -0,0 +1,42 @@
+# tests/test_metrics.py
+import json
+import os
+
+import metrics
+
+
+def test_metrics_cover_requests_statements_and_cache(seeded_client):
+    etag = seeded_client.get('/get_all_tags').headers['ETag']
+    seeded_client.get('/get_all_tags', headers={'If-None-Match': etag})
+    seeded_client.get('/adjacent_sujet?id=1&direction=next')
+    seeded_client.post('/save_sujet', json={'id': 1, 'user_notes': 'n', 'user_tags': '', 'person': ''})
+
+    response = seeded_client.get('/metrics')
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    assert '# TYPE weave_http_request_duration_seconds histogram' in text
+    assert 'weave_http_request_duration_seconds_count{route="/adjacent_sujet",method="GET",status="200"}' in text
+    assert 'weave_http_cache_requests_total{route="get_all_tags",result="hit"}' in text
+    assert 'weave_http_cache_requests_total{route="get_all_tags",result="miss"}' in text
+    assert 'weave_db_statement_duration_seconds_count{operation="get_adjacent_sujet",statement="SELECT"}' in text
+    assert 'weave_db_commit_duration_seconds_count{operation="update_sujet_details"}' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics.observe('weave_test_seconds', (('case', 'buckets'),), 0.003, (0.001, 0.01))
+    metrics.observe('weave_test_seconds', (('case', 'buckets'),), 0.5, (0.001, 0.01))
+    counters, histograms, buckets = metrics.merged_snapshots()
+    counts, total, count = histograms[('weave_test_seconds', (('case', 'buckets'),))]
+    assert counts == [0, 1, 1] and count == 2 and abs(total - 0.503) < 1e-9
+
+
+def test_worker_snapshots_are_summed(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    metrics.inc('weave_db_errors_total', (('operation', 'shared'), ('error', 'locked')), 2)
+    # Another worker's snapshot, as written by write_snapshot() in that process
+    (tmp_path / 'metrics-99999.json').write_text(json.dumps({
+        'counters': [['weave_db_errors_total', [['operation', 'shared'], ['error', 'locked']], 3]],
+        'histograms': [], 'buckets': {}}))
+
+    assert 'weave_db_errors_total{operation="shared",error="locked"} 5' in metrics.render()
+    assert (tmp_path / f'metrics-{os.getpid()}.json').exists()
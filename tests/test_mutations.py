@@ -0,0 +1,69 @@
+import sqlite3
+
+import db_operations
+
+
+def post(client, *mutations):
+    return client.post('/mutations', json={'mutations': list(mutations)})
+
+
+def test_batch_applies_in_order(seeded_client):
+    data = post(seeded_client,
+                {'key': 'k1', 'op': 'add', 'title': 'Offline idea'},
+                {'key': 'k2', 'op': 'save', 'id': 2, 'user_notes': 'n', 'user_tags': 'AI', 'person': 'S'},
+                {'key': 'k3', 'op': 'title', 'id': 2, 'title': 'Renamed'},
+                {'key': 'k4', 'op': 'skip', 'id': 3},
+                {'key': 'k5', 'op': 'delete', 'id': 4}).get_json()
+    results = data['results']
+    assert [r['key'] for r in results] == ['k1', 'k2', 'k3', 'k4', 'k5']
+    assert all(r['status'] == 'ok' and not r['replayed'] for r in results)
+    assert results[0]['sujet']['id'] == 6 and results[0]['sujet']['original_sujet'] == 'ID: 6 - Offline idea'
+    assert results[4]['deleted'] is True
+
+    sujet = seeded_client.get('/get_sujet_by_id/2').get_json()['sujet']
+    assert sujet['user_notes'] == 'n' and sujet['original_sujet'] == 'ID: 2 - Renamed'
+    assert seeded_client.get('/get_sujet_by_id/3').get_json()['sujet']['status'] == 'skipped'
+    assert seeded_client.get('/get_sujet_by_id/4').status_code == 404
+
+
+def test_replayed_keys_are_not_applied_twice(seeded_client):
+    first = post(seeded_client, {'key': 'add-1', 'op': 'add', 'title': 'Once'}).get_json()['results'][0]
+    again = post(seeded_client, {'key': 'add-1', 'op': 'add', 'title': 'Once'},
+                 {'key': 'add-1', 'op': 'add', 'title': 'Once'}).get_json()['results']
+    assert all(r['replayed'] and r['sujet'] == first['sujet'] for r in again)
+    assert seeded_client.get('/get_sujets_count').get_json()['count'] == 6
+
+
+def test_per_entry_errors_do_not_fail_the_batch(seeded_client):
+    results = post(seeded_client,
+                   {'key': 'a', 'op': 'title', 'id': 2, 'title': '  '},
+                   {'key': 'b', 'op': 'save', 'id': 99},
+                   {'key': 'c', 'op': 'explode'},
+                   {'key': 'd', 'op': 'skip', 'id': '2'},
+                   {'key': 'e', 'op': 'delete', 'id': 99},
+                   {'key': 'f', 'op': 'skip', 'id': 2}).get_json()['results']
+    assert [r['status'] for r in results] == ['error', 'error', 'error', 'error', 'ok', 'ok']
+    assert results[4]['deleted'] is False
+
+
+def test_failed_batch_records_no_keys(seeded_client, monkeypatch):
+    update_status = db_operations.update_sujet_status
+    locked = [True]
+
+    def flaky_update(*args, **kwargs):
+        if locked[0]:
+            raise sqlite3.OperationalError('database is locked')
+        return update_status(*args, **kwargs)
+    monkeypatch.setattr(db_operations, 'update_sujet_status', flaky_update)
+    response = post(seeded_client, {'key': 'x', 'op': 'add', 'title': 'Rolled back'},
+                    {'key': 'y', 'op': 'skip', 'id': 2})
+    assert response.status_code == 503
+    assert seeded_client.get('/get_sujets_count').get_json()['count'] == 5
+    locked[0] = False
+    assert not post(seeded_client, {'key': 'x', 'op': 'add', 'title': 'Rolled back'}).get_json()['results'][0]['replayed']
+
+
+def test_rejects_malformed_batches(seeded_client):
+    assert post(seeded_client).status_code == 400
+    assert post(seeded_client, {'op': 'skip', 'id': 2}).status_code == 400
+    assert seeded_client.post('/mutations', json={'mutations': 'nope'}).status_code == 400
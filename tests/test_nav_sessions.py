@@ -0,0 +1,132 @@
+import sqlite3
+
+import pytest
+
+import db_operations
+import nav_sessions
+from db_operations import statement_budget
+
+
+@pytest.fixture(autouse=True)
+def fresh_store():
+    nav_sessions._store.clear()
+    yield
+    nav_sessions._store.clear()
+
+
+def start(client, query=''):
+    return client.get(f'/nav/start?{query}').get_json()
+
+
+@pytest.mark.parametrize('query, expected_id, moved', [
+    ('id=1&delta=2', 3, 2),
+    ('id=1&delta=50', 5, 4),
+    ('id=5&delta=-3', 2, 3),
+    ('id=1&delta=1&tags=AI', 2, 1),     # 1 isn't tagged AI, so this starts from the gap
+    ('id=2&delta=5&tags=AI', 5, 1),
+    ('id=3&delta=0', 3, 0),
+])
+def test_session_seek_matches_seek(seeded_client, query, expected_id, moved):
+    tags = '&tags=AI' if 'tags=AI' in query else ''
+    token = start(seeded_client, tags)['token']
+    data = seeded_client.get(f'/nav/seek?token={token}&{query}').get_json()
+    assert data['sujet']['id'] == expected_id and data['moved'] == moved
+    assert data['token'] == token
+    assert data == {**seeded_client.get(f'/seek?{query}').get_json(),
+                    'position': data['position'], 'count': data['count'], 'token': token}
+
+
+def test_next_prev_and_position(seeded_client):
+    started = start(seeded_client, 'tags=AI&id=2')
+    assert started['count'] == 2 and started['position'] == 0
+    token = started['token']
+    following = seeded_client.get(f'/nav/next?token={token}&id=2&tags=AI').get_json()
+    assert following['sujet']['id'] == 5 and following['position'] == 1
+    assert seeded_client.get(f'/nav/next?token={token}&id=5&tags=AI').get_json() == \
+        {'status': 'no_more_sujets', 'token': token}
+    assert seeded_client.get(f'/nav/prev?token={token}&id=5&tags=AI').get_json()['sujet']['id'] == 2
+    position = seeded_client.get(f'/nav/position?token={token}&id=3&tags=AI').get_json()
+    assert position['position'] is None and position['count'] == 2
+
+
+def test_reused_token_costs_one_statement(seeded_client):
+    token = start(seeded_client)['token']
+    with statement_budget(1, 'session step'):
+        data = seeded_client.get(f'/nav/next?token={token}&id=1&fields=lite').get_json()
+    assert data['sujet'] == {'id': 2, 'original_sujet': 'ID: 2 - AI ethics debate'}
+
+
+def test_unknown_token_or_changed_filter_rebuilds(seeded_client):
+    token = start(seeded_client)['token']
+    data = seeded_client.get('/nav/next?token=bogus&id=1').get_json()
+    assert data['sujet']['id'] == 2 and data['token'] != 'bogus'
+    data = seeded_client.get(f'/nav/next?token={token}&id=1&tags=AI').get_json()
+    assert data['sujet']['id'] == 2 and data['token'] != token
+
+
+def test_zero_delta_returns_the_current_sujet_like_seek(seeded_client):
+    token = start(seeded_client, 'tags=AI')['token']
+    # 3 isn't tagged AI: /seek still answers with 3 itself, not the match before it
+    data = seeded_client.get(f'/nav/seek?token={token}&id=3&delta=0&tags=AI').get_json()
+    assert data['sujet']['id'] == 3 and data['moved'] == 0 and data['position'] is None
+    assert data['sujet'] == seeded_client.get('/seek?id=3&delta=0&tags=AI').get_json()['sujet']
+    assert seeded_client.get(f'/nav/seek?token={token}&id=5&delta=0&tags=AI').get_json()['position'] == 1
+
+
+def test_rebuilt_session_keeps_its_token(seeded_client):
+    token = start(seeded_client, 'tags=AI')['token']
+    # Another worker, or this one after eviction, has no such session
+    nav_sessions._store.clear()
+    data = seeded_client.get(f'/nav/next?token={token}&id=2&tags=AI').get_json()
+    assert data['sujet']['id'] == 5 and data['token'] == token
+    assert start(seeded_client, 'tags=AI&people=MD')['token'] != token
+
+
+def test_start_without_token_sees_new_sujets(seeded_client):
+    token = start(seeded_client)['token']
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    conn.execute("INSERT INTO sujets (id, original_sujet, status) VALUES (6, 'ID: 6 - New', 'new')")
+    conn.commit()
+    conn.close()
+    assert start(seeded_client, f'token={token}')['count'] == 5
+    data = start(seeded_client)
+    assert data['count'] == 6 and data['token'] == token
+    assert start(seeded_client, f'token={token}')['count'] == 6
+
+
+def test_deleted_sujets_are_skipped(seeded_client):
+    token = start(seeded_client)['token']
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    conn.execute('DELETE FROM sujets WHERE id IN (2, 3, 5)')
+    conn.commit()
+    conn.close()
+    assert seeded_client.get(f'/nav/next?token={token}&id=1').get_json()['sujet']['id'] == 4
+    # The last match is gone, so seeking to the end falls back towards the start
+    data = seeded_client.get(f'/nav/seek?token={token}&id=1&delta=10').get_json()
+    assert data['sujet']['id'] == 4 and data['moved'] == 3
+    assert seeded_client.get(f'/nav/next?token={token}&id=4').get_json()['status'] == 'no_more_sujets'
+
+
+def test_store_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(nav_sessions, 'NAV_SESSION_MAX', 2)
+    store = nav_sessions.SessionStore()
+    sessions = [nav_sessions.NavSession(str(i), (), nav_sessions.array('q', [i])) for i in range(3)]
+    store.put(sessions[0])
+    store.put(sessions[1])
+    store.get('0')
+    store.put(sessions[2])
+    assert store.get('1') is None and store.get('0') is sessions[0]
+    assert store.stats() == {'sessions': 2, 'bytes': 16}
+
+
+def test_store_expires_and_respects_byte_budget(monkeypatch):
+    store = nav_sessions.SessionStore()
+    old = nav_sessions.NavSession('old', (), nav_sessions.array('q', range(10)))
+    store.put(old)
+    old.expires = 0
+    assert store.get('old') is None
+
+    monkeypatch.setattr(nav_sessions, 'NAV_SESSION_MAX_BYTES', 100)
+    store.put(nav_sessions.NavSession('a', (), nav_sessions.array('q', range(10))))
+    store.put(nav_sessions.NavSession('b', (), nav_sessions.array('q', range(10))))
+    assert store.get('a') is None and store.get('b') is not None
@@ -0,0 +1,78 @@
+# tests/test_profiling.py
+from flask import Flask
+
+import profiling
+
+
+def make_app(monkeypatch, tmp_path, secret='s3cret', sample_rate=0.0, keep=50):
+    monkeypatch.setattr(profiling, 'PROFILE_SECRET', secret)
+    monkeypatch.setattr(profiling, 'PROFILE_SAMPLE_RATE', sample_rate)
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling, 'PROFILE_KEEP', keep)
+    app = Flask(__name__)
+
+    @app.route('/work')
+    def work():
+        return str(sum(i * i for i in range(2000)))
+
+    @app.route('/stream')
+    def stream():
+        def generate():
+            for i in range(3):
+                produced.append(i)
+                yield f'{i}\n'
+        return app.response_class(generate(), mimetype='text/plain')
+
+    produced = app.produced = []
+    profiling.register_profiling(app)
+    return app
+
+
+def test_disabled_installs_nothing(monkeypatch, tmp_path):
+    app = make_app(monkeypatch, tmp_path, secret=None)
+    assert not isinstance(app.wsgi_app, profiling.ProfilingMiddleware)
+    assert 'list_profiles' not in app.view_functions
+
+
+def test_secret_header_captures_pstats_and_collapsed_stacks(monkeypatch, tmp_path):
+    client = make_app(monkeypatch, tmp_path).test_client()
+    assert client.get('/work').status_code == 200
+    assert client.get('/work', headers={'X-Weave-Profile': 'wrong'}).status_code == 200
+    assert list(tmp_path.iterdir()) == []
+
+    response = client.get('/work?_profile=s3cret')
+    assert response.status_code == 200 and response.data == client.get('/work').data
+    suffixes = sorted(p.suffix for p in tmp_path.iterdir())
+    assert suffixes == ['.collapsed', '.json', '.pstats']
+    collapsed = next(tmp_path.glob('*.collapsed')).read_text().splitlines()
+    assert any('test_profiling.py:work' in line for line in collapsed)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in collapsed)
+
+    assert client.get('/debug/profiles').status_code == 404
+    listing = client.get('/debug/profiles', headers={'X-Weave-Profile': 's3cret'}).get_json()
+    (capture,) = listing['profiles']
+    assert capture['path'] == '/work' and capture['status'] == '200' and capture['query'] == ''
+    download = client.get(f"/debug/profiles/{capture['name']}.pstats?_profile=s3cret")
+    assert download.status_code == 200 and download.data
+
+
+def test_sampling_keeps_a_bounded_ring(monkeypatch, tmp_path):
+    client = make_app(monkeypatch, tmp_path, secret=None, sample_rate=1.0, keep=3).test_client()
+    for _ in range(5):
+        # Captures are saved when the server closes the body
+        client.get('/work').close()
+    assert len(list(tmp_path.glob('*.json'))) == 3
+    assert len(list(tmp_path.glob('*.pstats'))) == 3
+
+
+def test_streamed_responses_are_not_buffered(monkeypatch, tmp_path):
+    app = make_app(monkeypatch, tmp_path)
+    response = app.test_client().get('/stream?_profile=s3cret', buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks) == b'0\n' and app.produced == [0]
+    assert list(tmp_path.iterdir()) == []
+    assert list(chunks) == [b'1\n', b'2\n']
+    response.close()
+    # Saved once the server closed the body, with the generator in the profile
+    collapsed = next(tmp_path.glob('*.collapsed')).read_text()
+    assert 'test_profiling.py:generate' in collapsed
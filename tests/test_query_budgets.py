@@ -0,0 +1,94 @@
+# tests/test_query_budgets.py
+"""Maximum SQL statements per route. Lowering a number is welcome; raising one
+needs a reason in the commit that does it."""
+import sqlite3
+
+import pytest
+
+import db_operations
+from db_operations import StatementBudgetExceeded, statement_budget
+
+# (method, url, json body, budget)
+ROUTE_BUDGETS = [
+    ('GET', '/', None, 0),
+    ('GET', '/sw.js', None, 0),
+    ('GET', '/get_sujet?offset=0', None, 1),
+    ('GET', '/get_sujet?offset=1&tags=AI&people=MD&search=a', None, 1),
+    ('GET', '/get_sujets_count', None, 2),
+    ('GET', '/get_sujets_count?tags=AI', None, 2),
+    ('GET', '/get_sujet_by_id/2', None, 2),
+    ('GET', '/get_sujet_by_id/2?fields=lite', None, 2),
+    ('GET', '/get_random_sujet', None, 2),
+    ('GET', '/first', None, 1),
+    ('GET', '/last?tags=AI', None, 1),
+    ('GET', '/get_first_sujet', None, 1),
+    ('GET', '/get_last_sujet', None, 1),
+    ('GET', '/adjacent_sujet?id=2&direction=next', None, 1),
+    ('GET', '/adjacent_sujet?id=2&direction=prev&tags=AI', None, 2),
+    ('GET', '/seek?id=1&delta=2', None, 1),
+    ('GET', '/seek?id=1&delta=1&tags=AI&fields=lite', None, 1),
+    ('GET', '/nav/start?tags=AI', None, 1),
+    ('GET', '/nav/position?id=2', None, 1),
+    # Session rebuilt (no token) plus the primary-key fetch
+    ('GET', '/nav/next?id=1', None, 2),
+    ('GET', '/nav/prev?id=5&tags=AI&fields=lite', None, 2),
+    ('GET', '/nav/seek?id=1&delta=3', None, 2),
+    ('GET', '/changes?since=0&limit=2', None, 2),
+    ('GET', '/get_all_tags', None, 2),
+    ('GET', '/get_all_people', None, 2),
+    ('POST', '/save_sujet', {'id': 2, 'user_notes': 'n', 'user_tags': 'AI', 'person': 'S'}, 1),
+    ('POST', '/skip_sujet', {'id': 2}, 1),
+    ('POST', '/view', {'views': [{'id': 1, 'dwell_ms': 5000}, {'id': 2, 'dwell_ms': 5000}]}, 1),
+    ('POST', '/update_title/2', {'title': 'Renamed'}, 1),
+    ('POST', '/add_sujet', {'title': 'Brand new'}, 1),
+    ('DELETE', '/delete_sujet/3', None, 1),
+    # BEGIN, key lookup, one statement per mutation, key insert
+    ('POST', '/mutations', {'mutations': [{'key': 'a', 'op': 'skip', 'id': 2},
+                                          {'key': 'b', 'op': 'add', 'title': 'Queued'}]}, 5),
+    ('DELETE', '/delete_sujet/99', None, 1),
+    # One SELECT stepped in batches, however many rows are exported
+    ('GET', '/export?format=csv&tags=AI', None, 1),
+]
+
+
+@pytest.mark.parametrize('method,url,body,budget', ROUTE_BUDGETS,
+                         ids=[f'{m} {u}' for m, u, _, _ in ROUTE_BUDGETS])
+def test_route_statement_budget(seeded_client, method, url, body, budget):
+    # Warm up once so the one-off schema check isn't counted
+    seeded_client.get('/get_sujets_count')
+    with statement_budget(budget, f'{method} {url}'):
+        response = seeded_client.open(url, method=method, json=body)
+    assert response.status_code < 500
+
+
+def test_budget_failure_lists_statements(seeded_client):
+    with pytest.raises(StatementBudgetExceeded, match='SELECT'):
+        with statement_budget(0, 'lookup'):
+            seeded_client.get('/get_sujet_by_id/1')
+
+
+def test_all_routes_have_a_budget(seeded_app):
+    budgeted = {url.split('?')[0].rstrip('/0123456789') or '/' for _, url, _, _ in ROUTE_BUDGETS}
+    rules = {rule.rule.split('<')[0].rstrip('/') or '/' for rule in seeded_app.url_map.iter_rules()
+             if rule.endpoint not in ('static', 'metrics', 'list_profiles', 'download_profile')}
+    assert rules <= budgeted
+
+
+def test_single_statement_writes_keep_their_behaviour(seeded_client, seeded_app):
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    conn.execute("UPDATE sujets SET original_sujet = 'No prefix - here' WHERE id = 4")
+    conn.commit()
+    conn.close()
+
+    seeded_client.post('/update_title/2', json={'title': 'Renamed'})
+    seeded_client.post('/update_title/4', json={'title': 'Fixed'})
+    assert seeded_client.get('/get_sujet_by_id/2').get_json()['sujet']['original_sujet'] == 'ID: 2 - Renamed'
+    assert seeded_client.get('/get_sujet_by_id/4').get_json()['sujet']['original_sujet'] == 'ID: 4 - Fixed'
+    assert seeded_client.post('/update_title/99', json={'title': 'x'}).status_code == 500
+
+    created = seeded_client.post('/add_sujet', json={'title': 'Brand new'}).get_json()['sujet']
+    assert created['id'] == 6 and created['original_sujet'] == 'ID: 6 - Brand new'
+    assert created['status'] == 'new' and created['view_count'] == 1
+
+    assert seeded_client.delete('/delete_sujet/6').status_code == 200
+    assert seeded_client.delete('/delete_sujet/6').status_code == 404
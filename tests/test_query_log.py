@@ -0,0 +1,35 @@
+# tests/test_query_log.py
+import json
+
+import query_log
+
+
+def test_fingerprint_ignores_literals_and_filter_count():
+    one_tag = "SELECT * FROM sujets WHERE (user_tags LIKE ?) ORDER BY date_created ASC, id ASC"
+    three_tags = ("SELECT * FROM sujets WHERE (user_tags LIKE ? OR user_tags LIKE ? OR user_tags LIKE ?)"
+                  "  ORDER BY date_created ASC, id ASC")
+    assert query_log.fingerprint(one_tag) == query_log.fingerprint(three_tags)
+    assert query_log.fingerprint('SELECT * FROM sujets WHERE id = 5') == \
+        query_log.fingerprint("SELECT * FROM sujets WHERE id = 12")
+    # A different filter mix is a different shape
+    assert query_log.fingerprint(one_tag) != query_log.fingerprint(
+        one_tag.replace('user_tags', 'person'))
+
+
+def test_slow_statements_are_logged_with_plan_and_reported(seeded_app, tmp_path, monkeypatch):
+    log = tmp_path / 'slow.jsonl'
+    monkeypatch.setattr(query_log, 'THRESHOLD_S', 0)
+    monkeypatch.setattr(query_log, 'SLOW_QUERY_LOG', str(log))
+    client = seeded_app.test_client()
+    client.get('/get_sujets_count?tags=AI')
+    client.get('/get_sujet_by_id/2')
+
+    entries = [json.loads(line) for line in log.read_text().splitlines()]
+    count_query = next(e for e in entries if e['operation'] == 'get_sujets_count_by_filter')
+    # LIKE '%tag%' can't use an index
+    assert count_query['full_scan'] and any(d.startswith('SCAN') for d in count_query['plan'])
+
+    result = seeded_app.test_cli_runner().invoke(args=['query-report', '--log', str(log), '--top', '100', '--json'])
+    summary = json.loads(result.output)
+    assert {row['fingerprint'] for row in summary} >= {count_query['fingerprint']}
+    assert all(row['count'] >= 1 and row['p95_ms'] >= row['p50_ms'] for row in summary)
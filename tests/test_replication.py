@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+import db_operations
+import replication
+
+
+@pytest.fixture
+def replica(seeded_client, tmp_path, monkeypatch):
+    seeded_client.get('/get_sujets_count')  # apply the schema migrations
+    path = str(tmp_path / 'replica.db')
+    monkeypatch.setattr(replication, 'READ_REPLICA_PATH', path)
+    monkeypatch.setattr(replication, '_lag_cache', {'checked': 0.0, 'fresh': False})
+    monkeypatch.setattr(replication, 'LAG_CHECK_SECONDS', 0)
+    return path
+
+
+def rename_on_primary(sujet_id, title):
+    conn = sqlite3.connect(db_operations.DATABASE_PATH)
+    conn.execute("UPDATE sujets SET original_sujet = ? WHERE id = ?", (title, sujet_id))
+    conn.commit()
+    conn.close()
+
+
+def test_replica_is_copied_only_when_the_primary_changed(replica):
+    assert replication.sync_replica(db_operations.DATABASE_PATH, replica)['bytes'] > 0
+    assert replication.sync_replica(db_operations.DATABASE_PATH, replica) is None
+    rename_on_primary(1, 'ID: 1 - Changed')
+    assert replication.sync_replica(db_operations.DATABASE_PATH, replica) is not None
+    assert replication.replica_lag(replica) < 5
+
+
+def test_view_counts_are_copied_in_batches(replica, seeded_client, monkeypatch):
+    replication.sync_replica(db_operations.DATABASE_PATH, replica)
+    seeded_client.post('/view', json={'views': [{'id': 1, 'dwell_ms': 60000}]})
+    assert replication.sync_replica(db_operations.DATABASE_PATH, replica) is None
+    assert replication.replica_lag(replica) < 5
+    monkeypatch.setattr(replication, 'REPLICA_VIEW_SYNC_SECONDS', 0)
+    assert replication.sync_replica(db_operations.DATABASE_PATH, replica) is not None
+    assert replication.sync_replica(db_operations.DATABASE_PATH, replica) is None
+
+
+def test_reads_are_served_from_the_replica(replica, seeded_client):
+    replication.sync_replicas(replica_paths=[replica])
+    rename_on_primary(1, 'ID: 1 - Not replicated yet')
+    title = seeded_client.get('/get_sujet_by_id/1').get_json()['sujet']['original_sujet']
+    assert title == 'ID: 1 - Weird hat in the coffee shop'
+    # Endpoints outside REPLICA_ENDPOINTS still read the primary
+    found = seeded_client.get('/changes?since=0').get_json()['changes']
+    assert 'ID: 1 - Not replicated yet' in [c['sujet']['original_sujet'] for c in found if c['op'] == 'upsert']
+
+
+def test_writers_read_their_own_writes(replica, seeded_client):
+    replication.sync_replicas(replica_paths=[replica])
+    response = seeded_client.post('/update_title/2', json={'title': 'Mine'})
+    assert replication.STICKY_COOKIE in response.headers['Set-Cookie']
+    sujet = seeded_client.get('/get_sujet_by_id/2').get_json()['sujet']
+    assert sujet['original_sujet'] == 'ID: 2 - Mine'
+
+
+def test_lagging_replica_falls_back_to_the_primary(replica, seeded_client, monkeypatch):
+    replication.sync_replicas(replica_paths=[replica])
+    rename_on_primary(1, 'ID: 1 - Fresh')
+    monkeypatch.setattr(replication, 'REPLICA_MAX_LAG', -1)
+    assert seeded_client.get('/get_sujet_by_id/1').get_json()['sujet']['original_sujet'] == 'ID: 1 - Fresh'
+
+
+def test_lag_metric(replica, seeded_client):
+    replication.sync_replicas(replica_paths=[replica])
+    body = seeded_client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE weave_replica_lag_seconds gauge' in body
+    assert 'weave_replica_lag_seconds{replica="replica.db"}' in body
+
+
+def test_replicate_command_once(replica, seeded_app):
+    result = seeded_app.test_cli_runner().invoke(args=['replicate', '--replica', replica, '--once'])
+    assert result.exit_code == 0, result.output
+    assert 'Copied' in result.output
+    assert replication.replica_lag(replica) is not None
@@ -0,0 +1,30 @@
+import pytest
+
+
+@pytest.mark.parametrize('query, expected_id, moved', [
+    ('id=1&delta=2', 3, 2),
+    ('id=1&delta=50', 5, 4),            # clamped at the end
+    ('id=5&delta=-3', 2, 3),
+    ('id=1&delta=1&tags=AI', 2, 1),
+    ('id=2&delta=5&tags=AI', 5, 1),     # only one more AI sujet after 2
+    ('id=3&delta=0', 3, 0),
+])
+def test_seek_moves_within_filtered_order(seeded_client, query, expected_id, moved):
+    data = seeded_client.get(f'/seek?{query}').get_json()
+    assert data['status'] == 'ok'
+    assert data['sujet']['id'] == expected_id
+    assert data['moved'] == moved
+
+
+def test_seek_past_the_end(seeded_client):
+    assert seeded_client.get('/seek?id=5&delta=3').get_json()['status'] == 'no_more_sujets'
+
+
+def test_seek_does_not_count_views(seeded_client):
+    seeded_client.get('/seek?id=1&delta=3&fields=lite')
+    sujet = seeded_client.get('/get_sujet_by_id/4').get_json()['sujet']
+    assert sujet['view_count'] == 0
+
+
+def test_seek_requires_integer_params(seeded_client):
+    assert seeded_client.get('/seek?id=1&delta=far').status_code == 400
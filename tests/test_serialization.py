@@ -0,0 +1,40 @@
+import json
+import sqlite3
+
+import pytest
+
+import serialization
+from serialization import Sujet
+
+
+@pytest.fixture
+def row():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    return conn.execute(
+        "SELECT 7 AS id, 'ID: 7 - Title' AS original_sujet, NULL AS user_notes").fetchone()
+
+
+def test_sujet_from_row_behaves_like_a_mapping(row):
+    sujet = Sujet.from_row(row)
+    assert sujet['id'] == 7
+    assert sujet.original_sujet == 'ID: 7 - Title'
+    assert dict(sujet) == {'id': 7, 'original_sujet': 'ID: 7 - Title', 'user_notes': None}
+
+
+def test_null_columns_serialize_as_empty_string(row):
+    payload = {'status': 'ok', 'sujet': Sujet.from_row(row)}
+    assert json.loads(serialization.dumps(payload))['sujet']['user_notes'] == ''
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason='orjson not installed')
+def test_orjson_and_stdlib_agree(row):
+    payload = {'status': 'ok', 'sujet': Sujet.from_row(row), 'note': 'café'}
+    assert json.loads(serialization.orjson_dumps(payload)) == \
+        json.loads(serialization.stdlib_dumps(payload))
+
+
+def test_route_returns_normalized_sujet(seeded_client):
+    data = seeded_client.get('/get_sujet_by_id/2').get_json()
+    assert data['sujet']['ai_suggestion'] == ''
+    assert data['sujet']['user_tags'] == 'AI, Politics'
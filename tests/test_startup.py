@@ -0,0 +1,8 @@
+from benchmarks.bench_import_time import FORBIDDEN_MODULES, measure_import
+
+
+def test_web_path_skips_cli_only_dependencies():
+    _total_ms, _packages, modules = measure_import()
+    loaded = {name.split('.')[0] for name in modules}
+    assert not loaded & set(FORBIDDEN_MODULES)
+
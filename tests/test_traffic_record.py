@@ -0,0 +1,79 @@
+# tests/test_traffic_record.py
+import json
+
+from flask import Flask
+
+import traffic_record
+from benchmarks.replay import load_trace, request_for
+
+
+def make_app(monkeypatch, path):
+    monkeypatch.setattr(traffic_record, 'TRAFFIC_RECORD_PATH', str(path))
+    monkeypatch.setattr(traffic_record, '_file', None)
+    app = Flask(__name__)
+
+    @app.route('/adjacent_sujet')
+    def adjacent():
+        return {'status': 'ok'}
+
+    @app.route('/save_sujet', methods=['POST'])
+    def save():
+        return {'status': 'success'}
+
+    @app.route('/mutations', methods=['POST'])
+    def mutations():
+        return {'status': 'ok'}
+
+    @app.route('/metrics')
+    def metrics():
+        return ''
+
+    traffic_record.register_traffic_recording(app)
+    return app
+
+
+def test_requests_are_recorded_anonymised_and_replayable(monkeypatch, tmp_path):
+    trace = tmp_path / 'trace.jsonl'
+    client = make_app(monkeypatch, trace).test_client()
+    client.get('/adjacent_sujet?id=4&direction=next&tags=AI&search=Paris trip')
+    client.post('/save_sujet', json={'id': 4, 'user_notes': 'Call Anna 12pm', 'user_tags': 'AI', 'person': 'S'})
+    client.get('/metrics')
+    traffic_record._file.close()
+
+    lines = trace.read_text().splitlines()
+    assert len(lines) == 2
+    get, post = map(json.loads, lines)
+    assert get['q'] == {'id': '4', 'direction': 'next', 'tags': 'AI', 'search': 'xxxxx xxxx'}
+    assert post['b'] == {'id': 4, 'user_notes': 'xxxx xxxx xxxx', 'user_tags': 'AI', 'person': 'S'}
+    assert get['s'] == post['s'] and get['st'] == 200 and get['ms'] >= 0
+    assert 'Anna' not in trace.read_text()
+
+    entries = load_trace(str(trace))
+    method, path, body = request_for(entries[0])
+    assert method == 'GET' and path.startswith('/adjacent_sujet?id=4&direction=next')
+    assert request_for(entries[1])[2]['id'] == 4
+
+
+def test_nested_text_and_profile_secret_are_not_recorded(monkeypatch, tmp_path):
+    trace = tmp_path / 'trace.jsonl'
+    client = make_app(monkeypatch, trace).test_client()
+    client.post('/mutations?_profile=s3cret', headers={'X-Weave-Profile': 's3cret'}, json={'mutations': [
+        {'key': 'k1', 'op': 'add', 'title': 'Dinner with Anna'},
+        {'key': 'k2', 'op': 'save', 'id': 3, 'user_notes': 'Anna 555-0199', 'user_tags': 'Quote'},
+    ]})
+    client.get('/adjacent_sujet?_profile=s3cret')
+    traffic_record._file.close()
+
+    text = trace.read_text()
+    assert 'Anna' not in text and 's3cret' not in text and '_profile' not in text
+    post, get = map(json.loads, text.splitlines())
+    assert post['b']['mutations'][0] == {'key': 'k1', 'op': 'add', 'title': 'xxxxxx xxxx xxxx'}
+    assert post['b']['mutations'][1]['user_tags'] == 'Quote'
+    assert 'q' not in post and 'q' not in get
+
+
+def test_recording_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(traffic_record, 'TRAFFIC_RECORD_PATH', None)
+    app = Flask(__name__)
+    traffic_record.register_traffic_recording(app)
+    assert not app.before_request_funcs and not app.after_request_funcs
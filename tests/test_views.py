@@ -0,0 +1,47 @@
+import pytest
+
+
+def view_count(client, sujet_id):
+    return client.get(f'/get_sujet_by_id/{sujet_id}').get_json()['sujet']['view_count']
+
+
+@pytest.mark.parametrize('url', [
+    '/get_sujet?offset=0',
+    '/first',
+    '/last',
+    '/adjacent_sujet?id=1&direction=next',
+    '/adjacent_sujet?id=3&direction=prev&tags=AI',
+    '/get_random_sujet',
+])
+def test_navigation_reads_are_side_effect_free(seeded_client, url):
+    version = seeded_client.get('/get_sujet_by_id/1').headers['ETag']
+    assert seeded_client.get(url).get_json()['status'] == 'ok'
+    # Nothing in the DB changed, so the data-version ETag still matches
+    assert seeded_client.get('/get_sujet_by_id/1', headers={
+        'If-None-Match': version}).status_code == 304
+
+
+def test_view_beacon_counts_only_dwelled_views(seeded_client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'VIEW_DWELL_MS', 1000)
+
+    # sendBeacon posts a plain string, so no JSON content type
+    response = seeded_client.post('/view', data=(
+        '{"views": [{"id": 2, "dwell_ms": 1500}, {"id": 2, "dwell_ms": 3000},'
+        ' {"id": 3, "dwell_ms": 200}]}'), content_type='text/plain')
+    assert response.get_json() == {'status': 'success', 'recorded': 1}
+    assert view_count(seeded_client, 2) == 2
+    assert view_count(seeded_client, 3) == 0
+
+
+def test_view_beacon_rejects_malformed_body(seeded_client):
+    assert seeded_client.post('/view', data='nope').status_code == 400
+
+
+def test_view_beacon_ignores_boolean_ids(seeded_client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'VIEW_DWELL_MS', 0)
+    response = seeded_client.post('/view', json={'views': [{'id': True, 'dwell_ms': 5000},
+                                                           {'id': 2, 'dwell_ms': True}]})
+    assert response.get_json() == {'status': 'success', 'recorded': 0}
+    assert view_count(seeded_client, 1) == 0
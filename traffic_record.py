@@ -0,0 +1,115 @@
+# traffic_record.py
+"""Records anonymised request traces for replay with benchmarks/replay.py.
+
+Enabled by setting TRAFFIC_RECORD_PATH. Each request appends one compact JSON
+line: timestamp, a pseudonymous session key, method, path, query, JSON body,
+status and duration. Free text (search terms, notes, titles) is masked
+letter-for-letter so lengths and selectivity stay similar while content is
+gone; IDs, tags and people are kept, since replay needs them to hit the same
+rows and filter mixes.
+"""
+
+import hashlib
+import json
+import os
+import re
+import secrets
+import threading
+import time
+
+from flask import g, request
+
+# --- Configuration ---
+TRAFFIC_RECORD_PATH = os.getenv('TRAFFIC_RECORD_PATH')
+# Endpoints never recorded: tooling, not user traffic
+SKIPPED_ENDPOINTS = {'static', 'service_worker', 'metrics', 'list_profiles', 'download_profile'}
+# Query parameters and JSON body keys holding free text, at any depth
+TEXT_FIELDS = {'search', 'title', 'user_notes', 'ai_suggestion', 'original_sujet'}
+# Query parameters and body keys dropped outright (profiling.py's secret).
+# Headers, including X-Weave-Profile, are never recorded.
+SECRET_FIELDS = {'_profile'}
+
+# Session keys are salted per process start, so they can't be linked across restarts
+_salt = secrets.token_bytes(16)
+_lock = threading.Lock()
+_file = None
+
+_WORD_CHARS = re.compile(r'\w', re.UNICODE)
+
+
+def mask_text(value):
+    """Replaces every letter and digit with 'x', keeping length and spacing."""
+    return _WORD_CHARS.sub('x', value) if isinstance(value, str) else value
+
+
+def anonymise(data):
+    """Copy of a query/body value with free-text fields masked and secrets dropped.
+
+    Walks nested dicts and lists, so batched bodies like /mutations entries
+    are masked too.
+    """
+    if isinstance(data, list):
+        return [anonymise(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {key: mask_text(value) if key in TEXT_FIELDS and isinstance(value, str) else anonymise(value)
+            for key, value in data.items() if key not in SECRET_FIELDS}
+
+
+def session_key():
+    """Pseudonymous per-client key: salted hash of address and user agent."""
+    client = f"{request.remote_addr}|{request.user_agent.string}".encode('utf-8')
+    return hashlib.blake2b(client, key=_salt, digest_size=4).hexdigest()
+
+
+def _open():
+    global _file
+    if _file is None:
+        os.makedirs(os.path.dirname(os.path.abspath(TRAFFIC_RECORD_PATH)), exist_ok=True)
+        # Line-buffered append: each record is one write, so workers can share the file
+        _file = open(TRAFFIC_RECORD_PATH, 'a', buffering=1)
+    return _file
+
+
+def start_trace():
+    """before_request hook."""
+    g.trace_start = time.perf_counter()
+
+
+def record_trace(response):
+    """after_request hook: appends this request to the trace file."""
+    start = g.pop('trace_start', None)
+    if start is None or request.endpoint in SKIPPED_ENDPOINTS:
+        return response
+    entry = {
+        't': round(time.time(), 3),
+        's': session_key(),
+        'm': request.method,
+        'p': request.path,
+        'st': response.status_code,
+        'ms': round((time.perf_counter() - start) * 1000, 2),
+    }
+    query = anonymise(request.args.to_dict())
+    if query:
+        entry['q'] = query
+    body = request.get_json(force=True, silent=True) if request.method != 'GET' else None
+    if body is not None:
+        entry['b'] = anonymise(body)
+    line = json.dumps(entry, separators=(',', ':')) + '\n'
+    try:
+        with _lock:
+            _open().write(line)
+    except OSError as e:
+        print(f"Error recording traffic: {e}")
+    return response
+
+# --- Registration Functions ---
+
+
+def register_traffic_recording(app):
+    """Installs the recorder if TRAFFIC_RECORD_PATH is set; otherwise does nothing."""
+    if not TRAFFIC_RECORD_PATH:
+        return
+    app.before_request(start_trace)
+    app.after_request(record_trace)
+    print(f"[TRAFFIC] Recording requests to {TRAFFIC_RECORD_PATH}")
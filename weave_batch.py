@@ -1,14 +1,33 @@
 # weave_batch.py (Incorporating batch processing)
+"""Enriches the sujets in the Google Sheet with LLM suggestions, a batch per run.
+
+    python weave_batch.py [--batch-size 50] [--concurrency 8] [--rpm 500] [--tpm 200000] [--pack-size 10]
+                          [--refresh | --no-cache] [--cache-stats] [--source sheet|db] [--csv [PATH]]
+                          [--until-done] [--retry-failed] [--status]
+
+Suggestions are requested concurrently through enrichment.Enricher, which
+paces itself to the account's rate limits and retries 429s and server errors.
+With --pack-size, several sujets share one request and its few-shot prompt.
+Suggestions are cached (enrichment.EnrichmentCache), so a rerun after a crash
+and duplicate rows make no API calls; --refresh regenerates them. Results go
+straight into sujets.ai_suggestion/ai_tags (enrichment_sink.EnrichmentSink);
+--csv also appends them to a CSV file.
+
+Work is tracked per sujet in the enrichment_jobs table (enrichment_queue.py):
+each run queues what is new, then claims a batch under a lease, so several
+runs can work in parallel and a crashed run's batch is picked up again when
+its lease expires. Failed sujets are retried up to JOB_MAX_ATTEMPTS times.
+"""
+
+import argparse
+import os
 
 from dotenv import load_dotenv
-import os
-import time
-import pandas as pd
-import openai
-from google.oauth2.service_account import Credentials
-import gspread
-# Use an alias to distinguish from openai.APIError
-from gspread.exceptions import APIError as GspreadAPIError
+
+import db_operations
+import enrichment
+import enrichment_queue
+import enrichment_sink
 
 # --- Load Environment Variables ---
 # This will load variables from the .env file into the script's environment
@@ -16,292 +35,232 @@ load_dotenv()
 
 # --- Configuration ---
 # Read from environment variables. os.getenv() returns None if the variable is not set.
-# It's good practice to add checks to ensure these are loaded.
 SERVICE_ACCOUNT_FILE = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
 GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID')
-# The openai client will automatically use this if set
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY') # Note: client reads from env var OPENAI_API_KEY
+# Read by enrichment.OpenAIChatTransport
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
 # --- Batch Processing Configuration ---
-BATCH_SIZE = 50  # How many items to process in each run
-LAST_INDEX_FILE = 'last_processed_index.txt'  # File to store the index of the last item processed
-
-# --- Validate Configuration ---
-if not SERVICE_ACCOUNT_FILE:
-    print("Error: GOOGLE_APPLICATION_CREDENTIALS environment variable not set.")
-    print("Please check your .env file or ensure the variable is set before running.")
-    exit()
-if not GOOGLE_SHEET_ID:
-    print("Error: GOOGLE_SHEET_ID environment variable not set.")
-    print("Please check your .env file or ensure the variable is set before running.")
-    exit()
-if not OPENAI_API_KEY:
-    print("Warning: OPENAI_API_KEY environment variable not set.")
-    print("OpenAI calls may fail if the key is not provided.")
-    # Don't exit here, allow the script to proceed and let the OpenAI function handle the API error
-
+BATCH_SIZE = 50  # How many items each claim takes from the job queue
+OUTPUT_CSV_PATH = 'sujet_enrichments.csv'  # Optional side output (--csv)
 
-# --- Google Sheets Setup ---
 # Changed scope to include write permission if you ever want to write back to the sheet
-# For now, it's still read-only for fetching data, but good to have write capability ready
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets'] # Use full sheets scope
-
-# --- Added debugging prints and detailed error handling here ---
-print(f"Attempting to load credentials from: {SERVICE_ACCOUNT_ACCOUNT_FILE}")
-
-try:
-    # Use Credentials.from_service_account_file to get credentials
-    credentials = Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES
-    )
-    print("Credentials loaded successfully.")  # <-- Step 1 Success
-
-    # Authorize gspread client
-    gc = gspread.authorize(credentials)
-    print("gspread client authorized.")  # <-- Step 2 Success
-
-    # Open the spreadsheet by key
-    spreadsheet = gc.open_by_key(GOOGLE_SHEET_ID)
-    # <-- Step 3 Success
-    print(f"Spreadsheet '{GOOGLE_SHEET_ID}' opened successfully.")
-
-    # Access the first worksheet
-    worksheet = spreadsheet.sheet1
-    print("First worksheet accessed.")  # <-- Step 4 Success
-
-# --- Specific Error Handling ---
-except FileNotFoundError:
-    print(
-        f"Error: Google Service Account file not found at {SERVICE_ACCOUNT_FILE}")
-    print("Please check the GOOGLE_APPLICATION_CREDENTIALS path in your .env file.")
-    exit()
-except GspreadAPIError as e:  # Using the alias GspreadAPIError
-    print(f"Error connecting to Google Sheets: {e}")
-    print("Please check your GOOGLE_SHEET_ID, sheet sharing permissions, and service account file validity.")
-    print("Make sure the Google Sheets API is enabled for your Google Cloud Project.")
-    # Try to extract project ID from the error if possible
-    project_id = "YOUR_PROJECT_ID_HERE" # Default placeholder
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']  # Use full sheets scope
+
+
+def check_configuration(source='sheet'):
+    """Exits if the Sheets settings are missing; warns about a missing OpenAI key."""
+    if source == 'sheet' and not SERVICE_ACCOUNT_FILE:
+        print("Error: GOOGLE_APPLICATION_CREDENTIALS environment variable not set.")
+        print("Please check your .env file or ensure the variable is set before running.")
+        exit()
+    if source == 'sheet' and not GOOGLE_SHEET_ID:
+        print("Error: GOOGLE_SHEET_ID environment variable not set.")
+        print("Please check your .env file or ensure the variable is set before running.")
+        exit()
+    if not OPENAI_API_KEY:
+        print("Warning: OPENAI_API_KEY environment variable not set.")
+        print("OpenAI calls may fail if the key is not provided.")
+
+
+def print_enable_api_hint(e):
+    """Points at the console page for enabling the Sheets API, with the project ID if the error has it."""
+    project_id = "YOUR_PROJECT_ID_HERE"  # Default placeholder
     try:
         # Attempt to parse error details for project ID
         if hasattr(e, 'response') and e.response is not None:
-             details = e.response.json().get('error', {}).get('details', [{}])
-             if details and isinstance(details, list) and details[0].get('project_id'):
+            details = e.response.json().get('error', {}).get('details', [{}])
+            if details and isinstance(details, list) and details[0].get('project_id'):
                 project_id = details[0]['project_id']
-    except:
-        pass # Ignore errors during project ID extraction
+    except Exception:
+        pass  # Ignore errors during project ID extraction
     print(
         f"Enable it by visiting: https://console.developers.google.com/apis/api/sheets.googleapis.com/overview?project={project_id}")
-    exit()
-# --- More Detailed Generic Exception Handling ---
-except Exception as e:
-    print(f"An unexpected error occurred during Google Sheets setup:")
-    print(f"Error Type: {type(e).__name__}")  # Print the class name
-    print(f"Error Details: {e}")           # Print the error message
-    exit()
-
-
-# --- OpenAI Helper Function ---
-def get_enrichment_suggestion(sujet_text):
-    """Calls OpenAI API to get a suggested enrichment for a brief sujet."""
-    # Note: The client automatically uses OPENAI_API_KEY env var if set
-    # if not OPENAI_API_KEY is checked at the start of the script, but we add
-    # a local check too for clarity/safety within the function.
-    if not os.getenv('OPENAI_API_KEY'): # Check env var directly within the function
-         print(f"Warning: OpenAI API key not available for '{sujet_text}'. Skipping API call.")
-         return "[OpenAI API key not set. Cannot generate suggestion.]"
-
-    prompt = f"""
-    You are helping someone organize very brief personal notes ("sujets").
-    Your task is to understand the likely meaning or core theme of the brief note and suggest relevant tags or categories.
-    Provide a slightly more descriptive phrase or sentence clarifying the note's meaning, followed by suggested tags.
-    The tags should be comma-separated keywords relevant to the topic (e.g., Travel, AI, Personal, Funny, Science, Observation, Quote).
-
-    Example:
-    Input: "weird hat coffee shop"
-    Suggestion: "Observation about someone wearing a very unusual hat in a coffee shop. Tags: Observation, People Watching, Funny, Everyday Life."
 
-    Input: "AI ethical debate"
-    Suggestion: "Reflecting on recent discussions or articles about the ethical challenges of AI. Tags: AI, Ethics, Technology, Society, News."
 
-    Input: "Feeling overwhelmed"
-    Suggestion: "Recalling a personal experience of feeling overwhelmed. Tags: Personal, Feeling, Emotion, Self-reflection, Vulnerable."
+# --- Google Sheets Setup ---
+def open_worksheet():
+    """Opens the first worksheet of GOOGLE_SHEET_ID, exiting with a diagnosis on failure."""
+    # Imported here so the enrichment engine can be used without the Google libraries
+    from google.oauth2.service_account import Credentials
+    import gspread
+    # Use an alias to distinguish from other APIError classes
+    from gspread.exceptions import APIError as GspreadAPIError
+
+    print(f"Attempting to load credentials from: {SERVICE_ACCOUNT_FILE}")
+    try:
+        credentials = Credentials.from_service_account_file(
+            SERVICE_ACCOUNT_FILE, scopes=SCOPES
+        )
+        print("Credentials loaded successfully.")  # <-- Step 1 Success
 
-    Input: "Great book quote"
-    Suggestion: "A memorable quote from a book recently read. Tags: Quote, Reading, Literature, Philosophy, Inspiration."
+        gc = gspread.authorize(credentials)
+        print("gspread client authorized.")  # <-- Step 2 Success
 
-    Input: "Visited the new museum exhibit"
-    Suggestion: "Visited a new museum exhibit about modern art. Tags: Art, Culture, Travel (if applicable), Activity."
+        spreadsheet = gc.open_by_key(GOOGLE_SHEET_ID)
+        print(f"Spreadsheet '{GOOGLE_SHEET_ID}' opened successfully.")  # <-- Step 3 Success
 
-    Now, provide a suggestion for the following note. Format: Clarification phrase. Tags: Tag1, Tag2, Tag3...
-    Input: "{sujet_text}"
+        worksheet = spreadsheet.sheet1
+        print("First worksheet accessed.")  # <-- Step 4 Success
+        return worksheet
 
-    Suggestion:
-    """
-    try:
-        # client = openai.OpenAI(api_key=OPENAI_API_KEY) # Not needed if env var is set
-        client = openai.OpenAI() # Reads from env var OPENAI_API_KEY automatically
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant for organizing personal notes."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=100,
-            temperature=0.7
-        )
-        suggestion = response.choices[0].message.content.strip()
-        return suggestion
-    except openai.AuthenticationError as e:
+    # --- Specific Error Handling ---
+    except FileNotFoundError:
         print(
-            f"Error calling OpenAI API for '{sujet_text}': Authentication failed. Check your API key.")
-        # Return a specific error message for this entry
-        return f"[Error generating suggestion: Authentication Failed ({e})]"
-    except openai.APIError as e:
-        print(f"Error calling OpenAI API for '{sujet_text}': API Error: {e}")
-         # Return a specific error message for this entry
-        return f"[Error generating suggestion: API Error ({e})]"
+            f"Error: Google Service Account file not found at {SERVICE_ACCOUNT_FILE}")
+        print("Please check the GOOGLE_APPLICATION_CREDENTIALS path in your .env file.")
+        exit()
+    except GspreadAPIError as e:
+        print(f"Error connecting to Google Sheets: {e}")
+        print("Please check your GOOGLE_SHEET_ID, sheet sharing permissions, and service account file validity.")
+        print("Make sure the Google Sheets API is enabled for your Google Cloud Project.")
+        print_enable_api_hint(e)
+        exit()
+    # --- More Detailed Generic Exception Handling ---
     except Exception as e:
-        print(
-            f"An unexpected error occurred calling OpenAI API for '{sujet_text}': {e}")
-         # Return a specific error message for this entry
-        return f"[Error generating suggestion: Unexpected Error ({e})]"
-
-
-# --- Main Logic ---
-print("Fetching data from Google Sheet...")
-try:
-    # Use get_all_values() to get all data
-    all_sujets_data = worksheet.get_all_values()
-    # Get first column, filter empty rows/cells.
-    # Skip the header row if your sheet has one.
-    # Assuming row 1 is header, start from index 1: all_sujets_data[1:]
-    sujets_full = [row[0] for row in all_sujets_data if row and row[0].strip()]
-
-except GspreadAPIError as e:  # Using the alias
-    print(f"Error reading data from sheet: {e}")
-    print("Make sure the Google Sheets API is enabled for your Google Cloud Project:")
-    project_id = "YOUR_PROJECT_ID_HERE" # Default placeholder
-    try:
-        # Attempt to parse error details for project ID
-        if hasattr(e, 'response') and e.response is not None:
-             details = e.response.json().get('error', {}).get('details', [{}])
-             if details and isinstance(details, list) and details[0].get('project_id'):
-                project_id = details[0]['project_id']
-    except:
-        pass # Ignore errors during project ID extraction
-    print(
-        f"Enable it by visiting: https://console.developers.google.com/apis/api/sheets.googleapis.com/overview?project={project_id}")
-    exit()
-except Exception as e:
-    print(f"An unexpected error occurred during data fetching: {e}")
-    print(f"Error Type: {type(e).__name__}")
-    print(f"Error Details: {e}")
-    exit()
+        print("An unexpected error occurred during Google Sheets setup:")
+        print(f"Error Type: {type(e).__name__}")
+        print(f"Error Details: {e}")
+        exit()
 
-print(f"Found {len(sujets_full)} total non-empty entries in the first column.")
 
-# --- Batch Processing Logic ---
-start_index = 0
-if os.path.exists(LAST_INDEX_FILE):
+def fetch_sujets(worksheet):
+    """Non-empty first-column cells of the worksheet."""
+    from gspread.exceptions import APIError as GspreadAPIError
+
+    print("Fetching data from Google Sheet...")
     try:
-        with open(LAST_INDEX_FILE, 'r') as f:
-            content = f.read().strip()
-            if content.isdigit():
-                start_index = int(content)
-                print(f"Resuming processing from index {start_index} (read from {LAST_INDEX_FILE}).")
-            else:
-                print(f"Warning: {LAST_INDEX_FILE} contains non-digit content: '{content}'. Starting from index 0.")
+        all_sujets_data = worksheet.get_all_values()
+        return [row[0] for row in all_sujets_data if row and row[0].strip()]
+    except GspreadAPIError as e:
+        print(f"Error reading data from sheet: {e}")
+        print("Make sure the Google Sheets API is enabled for your Google Cloud Project:")
+        print_enable_api_hint(e)
+        exit()
     except Exception as e:
-        print(f"Error reading {LAST_INDEX_FILE}: {e}. Starting from index 0.")
+        print(f"An unexpected error occurred during data fetching: {e}")
+        print(f"Error Type: {type(e).__name__}")
+        exit()
 
-# Determine the end index for the current batch
-end_index = min(start_index + BATCH_SIZE, len(sujets_full))
 
-# Select the current batch of sujets to process
-sujets_to_process = sujets_full[start_index:end_index]
+# --- OpenAI Helper Function ---
+def get_enrichment_suggestion(sujet_text):
+    """Gets a suggested enrichment for one brief sujet (or an '[Error ...]' string)."""
+    if not os.getenv('OPENAI_API_KEY'):
+        print(f"Warning: OpenAI API key not available for '{sujet_text}'. Skipping API call.")
+        return "[OpenAI API key not set. Cannot generate suggestion.]"
+    results, _ = enrichment.run_enrichment([(0, sujet_text)], concurrency=1)
+    return results[0]['suggestion'] or f"[Error generating suggestion: {results[0]['error']}]"
 
-if not sujets_to_process:
-    print("No new entries found in the current batch range.")
-    print(f"Last processed index was {start_index}. Total entries available: {len(sujets_full)}.")
-    if start_index >= len(sujets_full):
-         print("All entries appear to have been processed.")
-         # Optional: Handle resetting the index file or sending a notification
-    exit() # Exit if no items in this batch
 
-print(f"Processing {len(sujets_to_process)} entries (Batch from index {start_index} to {end_index-1}).")
-print("Generating enrichment suggestions with OpenAI...")
+# --- Batch Processing Logic ---
+def print_cache_stats(cache):
+    stats = cache.stats()
+    print(f"Enrichment cache {cache.path}: {stats['entries']} entries ({stats['expired']} expired), "
+          f"{stats['lifetime_hits']} hits overall, oldest {stats['oldest_days']} days; "
+          f"this run {stats['hits']} hits, {stats['misses']} misses.")
+
+
+def print_queue_status(queue):
+    counts = queue.counts()
+    print("Enrichment jobs: " + ', '.join(f"{count} {state}" for state, count in counts.items()))
+    for sujet_id, attempts, error in queue.failures():
+        print(f"  sujet {sujet_id} failed after {attempts} attempts: {error}")
+
+
+def enqueue_source(queue, sink, source):
+    """Adds jobs for the sujets still to enrich from `source`. Returns how many were new."""
+    if source == 'db':
+        return queue.enqueue_unenriched()
+    # Sheet rows are matched to sujets by title (new titles become sujets) so
+    # their jobs can be keyed by sujet id like the rest
+    return queue.enqueue(sink.resolve_titles(fetch_sujets(open_worksheet())))
+
+
+def run_batch(queue, sink, cache, batch_size, refresh=False, **options):
+    """Claims one batch, enriches it and writes it. Returns the claimed count (0: queue empty)."""
+    items = queue.claim(batch_size)
+    if not items:
+        return 0
+    print(f"Claimed {len(items)} sujets ({items[0][0]}..{items[-1][0]}) as {queue.owner}.")
+
+    def report(result):
+        if result['suggestion']:
+            print(f"Sujet {result['key']} done: '{result['text']}'")
+            sink.add(result['key'], result['text'], result['suggestion'])
+        else:
+            print(f"Sujet {result['key']} failed: {result['error']}: '{result['text']}'")
+            queue.fail(result['key'], result['error'])
 
-# --- Load existing results if the CSV file exists ---
-output_csv_path = 'sujet_enrichments.csv' # Using a consistent output file name
-existing_df = pd.DataFrame(columns=['Original Sujet', 'Suggested Enrichment'])
-if os.path.exists(output_csv_path):
     try:
-        existing_df = pd.read_csv(output_csv_path)
-        print(f"Loaded {len(existing_df)} existing results from {output_csv_path}.")
-    except Exception as e:
-        print(f"Warning: Could not read existing CSV file {output_csv_path}: {e}")
-        existing_df = pd.DataFrame(columns=['Original Sujet', 'Suggested Enrichment']) # Start fresh if read fails
-
-# Prepare to collect results for the current batch
-current_batch_results = []
-
-# Process the selected batch
-for i, sujet in enumerate(sujets_to_process):
-    # Display index relative to the overall list and the current batch
-    overall_index = start_index + i
-    print(f"\nProcessing entry {overall_index + 1}/{len(sujets_full)} (Batch index {i+1}/{len(sujets_to_process)}): '{sujet}'")
-
-    suggestion = get_enrichment_suggestion(sujet)
-    current_batch_results.append(
-        {'Original Sujet': sujet, 'Suggested Enrichment': suggestion}
-    )
-
-    # Add a small delay to avoid hitting API rate limits
-    # Consider a slightly longer delay if processing many items quickly
-    time.sleep(0.5)
-
-# Convert current batch results to DataFrame
-current_batch_df = pd.DataFrame(current_batch_results)
-
-# --- Combine existing results with the current batch results ---
-# Append new results. The combined DataFrame will contain all processed entries.
-# This handles cases where the script might be rerun on an index already in the CSV
-# (e.g., if a previous run failed mid-batch), though the index file usually prevents this.
-# A more robust approach might involve checking if the sujet is already in existing_df
-# before processing, but for simplicity, we just append. This assumes unique 'Original Sujet'
-# or that you don't mind duplicates if you rerun on the same start_index.
-combined_df = pd.concat([existing_df, current_batch_df], ignore_index=True)
-
-# Optional: Remove potential duplicates if the same entry was processed multiple times
-# combined_df = combined_df.drop_duplicates(subset=['Original Sujet']).reset_index(drop=True)
-
-
-# Only show results if we processed at least one entry in this batch
-if not current_batch_df.empty:
-    print("\n--- Enrichment Suggestions (Batch) ---")
-    # Display results for the current batch only for clarity
-    with pd.option_context('display.max_colwidth', None):
-        print(current_batch_df.to_string(index=False))
-
-    # --- Save the combined results (all processed entries) to the CSV file ---
-    # This overwrites the file each time, ensuring it contains all data processed SO FAR
+        results, stats = enrichment.run_enrichment(items, on_result=report, cache=cache, refresh=refresh, **options)
+    finally:
+        # Whatever finished is written (and its jobs done), even if the run was interrupted
+        sink.flush()
+    print(f"\n{len(results)} entries in {stats['seconds']:.1f}s: {stats['cached']} cached, "
+          f"{stats['duplicates']} duplicates, {stats['requests']} requests, "
+          f"{stats['rate_limited']} rate-limited, {stats['retries']} retries, {stats['items_resent']} re-sent, "
+          f"{stats['failed']} failed, "
+          f"{stats['prompt_tokens'] + stats['completion_tokens']} tokens.")
+    return len(items)
+
+
+def main(batch_size=BATCH_SIZE, concurrency=None, rpm=None, tpm=None, pack_size=None,
+         use_cache=True, refresh=False, source='sheet', csv_path=None, until_done=False, retry_failed=False):
+    check_configuration(source)
+    queue = enrichment_queue.JobQueue()
+    sink = enrichment_sink.EnrichmentSink(csv_path=csv_path, queue=queue)
+    cache = enrichment.EnrichmentCache() if use_cache else None
     try:
-        combined_df.to_csv(output_csv_path, index=False)
-        print(f"\nSaved combined enrichments (total {len(combined_df)} entries) to {output_csv_path}")
-    except Exception as e:
-        print(f"Error saving results to {output_csv_path}: {e}")
-else:
-     print("\nNo entries processed in this run.")
-
-# --- Save the index for the NEXT batch ---
-# This index marks the start of the *next* batch
-next_start_index = end_index
-try:
-    with open(LAST_INDEX_FILE, 'w') as f:
-        f.write(str(next_start_index))
-    print(f"Saved next start index ({next_start_index}) to {LAST_INDEX_FILE}.")
-except Exception as e:
-    print(f"Error writing {LAST_INDEX_FILE}: {e}.")
-
-print("\nBatch processing finished.")
-
+        if retry_failed:
+            print(f"Re-queued {queue.retry_failed()} failed jobs.")
+        print(f"Queued {enqueue_source(queue, sink, source)} new sujets in {db_operations.DATABASE_PATH}.")
+        print_queue_status(queue)
+        print("Generating enrichment suggestions with OpenAI...")
+        while run_batch(queue, sink, cache, batch_size, refresh=refresh,
+                        concurrency=concurrency, rpm=rpm, tpm=tpm, pack_size=pack_size) and until_done:
+            pass
+    finally:
+        sink.close()
+        print(f"Saved to {sink.db_path}: {sink.stats['updated']} updated, {sink.stats['inserted']} added "
+              f"in {sink.stats['transactions']} transactions" + (f"; appended to {csv_path}." if csv_path else "."))
+        if cache:
+            evicted = cache.evict()
+            if evicted:
+                print(f"Evicted {evicted} old cache entries.")
+            print_cache_stats(cache)
+            cache.close()
+        print_queue_status(queue)
+        queue.close()
+
+    print("\nBatch processing finished.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help=f'requests in flight (default: ENRICH_CONCURRENCY={enrichment.ENRICH_CONCURRENCY})')
+    parser.add_argument('--rpm', type=float, default=None, help='requests per minute limit (default: ENRICH_RPM)')
+    parser.add_argument('--tpm', type=float, default=None, help='tokens per minute limit (default: ENRICH_TPM)')
+    parser.add_argument('--pack-size', type=int, default=None,
+                        help=f'sujets per request (default: ENRICH_PACK_SIZE={enrichment.ENRICH_PACK_SIZE})')
+    parser.add_argument('--refresh', action='store_true', help='ignore cached suggestions (and replace them)')
+    parser.add_argument('--no-cache', action='store_true', help='neither read nor write the cache')
+    parser.add_argument('--cache-stats', action='store_true', help='print cache statistics and exit')
+    parser.add_argument('--source', choices=['sheet', 'db'], default='sheet',
+                        help='queue the Google Sheet rows, or the sujets in DATABASE_PATH that have no suggestion')
+    parser.add_argument('--until-done', action='store_true', help='keep claiming batches until the queue is empty')
+    parser.add_argument('--retry-failed', action='store_true', help='re-queue jobs that used up their attempts')
+    parser.add_argument('--status', action='store_true', help='print the job queue and exit')
+    parser.add_argument('--csv', nargs='?', const=OUTPUT_CSV_PATH, default=None, metavar='PATH',
+                        help=f'also append results to a CSV file (default path: {OUTPUT_CSV_PATH})')
+    args = parser.parse_args()
+    if args.cache_stats:
+        print_cache_stats(enrichment.EnrichmentCache())
+    elif args.status:
+        print_queue_status(enrichment_queue.JobQueue())
+    else:
+        main(args.batch_size, args.concurrency, args.rpm, args.tpm, args.pack_size,
+             use_cache=not args.no_cache, refresh=args.refresh, source=args.source, csv_path=args.csv,
+             until_done=args.until_done, retry_failed=args.retry_failed)